@@ -0,0 +1,523 @@
+import asyncio
+import contextvars
+import itertools
+import time
+
+import aiohttp
+
+import scraping
+import event
+import parsing
+import response_cache
+
+
+class AsyncScrapper(scraping.Scrapper):
+
+    def __init__(self, min_delay=334, max_delay=500, timeout=3.03, max_connections=100):
+        super().__init__(min_delay, max_delay, timeout)
+
+        self.local = ContextLocal()
+        self.max_connections = max_connections
+        self.client_session = None
+
+    @property
+    def max_connections(self):
+        return self.__max_connections
+
+    @max_connections.setter
+    def max_connections(self, max_connections):
+        if max_connections < 0:
+            self.__max_connections = 0
+        else:
+            self.__max_connections = max_connections
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self.client_session is not None:
+            await self.client_session.close()
+            self.client_session = None
+
+        self.session_pool.close()
+
+    def get_client_session(self):
+        if self.client_session is None or self.client_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.client_session = aiohttp.ClientSession(connector=connector)
+
+        return self.client_session
+
+    def client_timeout(self):
+        return aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+
+    async def scrape(self, url, parser=parsing.HTML_PARSER, lazy=False):
+        parsing.validate_parser(parser)
+        self.local.fork()
+
+        cached_response = self.cached_response(url)
+        if self.is_fresh(cached_response):
+            return self.parse(cached_response.content, parser, lazy)
+
+        await self.delay(url)
+        request_start_time = self.start_request(url)
+        try:
+            source = await self.get_source(url, parser, lazy, cached_response)
+        except Exception:
+            self.finish_request(request_start_time, 'failure')
+            raise
+        self.finish_request(request_start_time, 'success')
+        self.update_delay_times(url)
+
+        return source
+
+    async def scrape_many(self, urls, max_concurrency=100, parser=parsing.HTML_PARSER, lazy=False):
+        urls = iter(urls)
+        pending = {asyncio.ensure_future(self.scrape(url, parser, lazy)): url
+                   for url in itertools.islice(urls, max_concurrency)}
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    url = pending.pop(task)
+                    try:
+                        yield url, task.result(), None
+                    except scraping.ScrapingException as exception:
+                        yield url, None, exception
+
+                for url in itertools.islice(urls, len(done)):
+                    pending[asyncio.ensure_future(self.scrape(url, parser, lazy))] = url
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def delay(self, url):
+        await asyncio.sleep(self.reserve_delay(url))
+
+    async def wait_before_retry(self, url, retry_state):
+        await asyncio.sleep(self.retry_delay(url, retry_state))
+
+    async def get_source(self, url, parser=parsing.HTML_PARSER, lazy=False, cached_response=None):
+        headers = response_cache.ResponseCache.conditional_headers(cached_response)
+        retry_state = self.start_retries()
+
+        while True:
+            request_start_time = time.monotonic()
+
+            try:
+                async with self.get_client_session().get(url, timeout=self.client_timeout(),
+                                                         headers=headers) as source:
+                    time_to_first_byte = time.monotonic() - request_start_time
+                    body = await source.read()
+                    self.record_response(url, source.status, source.headers, request_start_time, time_to_first_byte)
+                    self.store_page(url, source.status, source.headers, body)
+                    content = self.source_content(url, source.status, source.headers, body, cached_response)
+                    self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter',
+                                              'connection_error_counter', 'chunked_encoding_error_counter')
+                    return self.parse(content, parser, lazy)
+            except aiohttp.ConnectionTimeoutError:
+                await self.handle_connect_timeout()
+            except asyncio.TimeoutError:
+                await self.handle_read_timeout()
+            except aiohttp.ClientSSLError:
+                self.handle_ssl_error(url)
+            except aiohttp.ClientPayloadError:
+                await self.handle_chunked_encoding_error()
+            except aiohttp.ClientConnectionError:
+                await self.handle_connection_error()
+            except aiohttp.ClientError as e:
+                raise scraping.NormalScrapingException(f'Undefined aiohttp error: {str(e)}')
+
+            await self.wait_before_retry(url, retry_state)
+
+    async def handle_connect_timeout(self):
+        self.connect_timeout_counter += 1
+        await self.connect_timeout(f'{self.connect_timeout_counter}/{self.max_connect_timeout}')
+
+        if self.connect_timeout_counter >= self.max_connect_timeout:
+            self.reset_error_counters('connect_timeout_counter')
+            raise scraping.ConnectTimeout()
+
+    async def handle_read_timeout(self):
+        self.read_timeout_counter += 1
+        await self.read_timeout(f'{self.read_timeout_counter}/{self.max_read_timeout}')
+
+        if self.read_timeout_counter >= self.max_read_timeout:
+            self.reset_error_counters('read_timeout_counter')
+            raise scraping.ReadTimeout()
+
+    async def handle_connection_error(self):
+        self.connection_error_counter += 1
+        await self.connection_error(f'{self.connection_error_counter}/{self.max_connection_error}')
+
+        if self.connection_error_counter >= self.max_connection_error:
+            self.reset_error_counters('connection_error_counter')
+            raise scraping.ConnectionErrorOccurred()
+
+    async def handle_chunked_encoding_error(self):
+        self.chunked_encoding_error_counter += 1
+        await self.chunked_encoding_error(f'{self.chunked_encoding_error_counter}/{self.max_chunked_encoding_error}')
+
+        if self.chunked_encoding_error_counter >= self.max_chunked_encoding_error:
+            self.reset_error_counters('chunked_encoding_error_counter')
+            raise scraping.ChunkedEncodingError()
+
+    @event.async_signal
+    def connect_timeout(self, timeout_info):
+        pass
+
+    @event.async_signal
+    def read_timeout(self, timeout_info):
+        pass
+
+    @event.async_signal
+    def connection_error(self, error_info):
+        pass
+
+    @event.async_signal
+    def chunked_encoding_error(self, error_info):
+        pass
+
+
+class AsyncStealthScrapper(AsyncScrapper, scraping.StealthScrapper):
+
+    def __init__(self, min_delay=334, max_delay=500, timeout=3.03, proxy_from_file=False, max_connections=100):
+        super().__init__(min_delay, max_delay, timeout, max_connections)
+
+        self.proxy_from_file = proxy_from_file
+        self.renew_lock = None
+        self.identity_sessions = {}
+        self.retired_sessions = []
+
+    async def scrape(self, url, parser=parsing.HTML_PARSER, lazy=False):
+        parsing.validate_parser(parser)
+        self.local.fork()
+
+        cached_response = self.cached_response(url)
+        if self.is_fresh(cached_response):
+            return self.parse(cached_response.content, parser, lazy)
+
+        protocol = url[0:url.find(':')]
+        await self.renew_stealth(protocol)
+        await self.delay(url)
+        self.prepare_stealth(protocol, url)
+
+        request_start_time = self.start_request(url)
+        try:
+            source = await self.get_stealth_source(url, protocol, parser, lazy, cached_response)
+        except Exception:
+            self.finish_request(request_start_time, 'failure')
+            raise
+        finally:
+            self.release_identity()
+        self.finish_request(request_start_time, 'success')
+        self.update_delay_times(url)
+
+        return source
+
+    async def close(self):
+        self.stop_proxy_refresher()
+        self.retired_sessions += self.identity_sessions.values()
+        self.identity_sessions.clear()
+        await self.close_retired_sessions()
+        await super().close()
+
+    # A client session of an identity has its own cookies and shares connections of the client session.
+    def identity_client_session(self, identity_id):
+        if identity_id is None:
+            return self.get_client_session()
+
+        client_session = self.identity_sessions.get(identity_id)
+        if client_session is None or client_session.closed:
+            client_session = aiohttp.ClientSession(connector=self.get_client_session().connector,
+                                                   connector_owner=False)
+            self.identity_sessions[identity_id] = client_session
+
+        return client_session
+
+    # Identities are retired in synchronous code, their client sessions are closed before the next request.
+    def close_identity(self, identity):
+        client_session = self.identity_sessions.pop(identity.id, None)
+
+        if client_session is not None:
+            self.retired_sessions.append(client_session)
+
+    async def close_retired_sessions(self):
+        retired_sessions, self.retired_sessions = self.retired_sessions, []
+
+        for client_session in retired_sessions:
+            await client_session.close()
+
+    async def renew_stealth(self, protocol=None):
+        if self.proxy_refresher is not None and protocol is not None:
+            if not await asyncio.to_thread(self.proxy_refresher.wait_for_proxy, protocol, self.proxy_wait_timeout):
+                raise scraping.LackOfProxy(protocol)
+
+        if self.renew_lock is None:
+            self.renew_lock = asyncio.Lock()
+
+        async with self.renew_lock:
+            if self.proxy_refresher is None and len(self.proxy) == 0:
+                await self.refresh_proxy()
+            if len(self.user_agents) == 0:
+                self.refresh_user_agents()
+
+    async def refresh_stealth(self):
+        await self.refresh_proxy()
+        self.refresh_user_agents()
+
+    async def refresh_proxy(self):
+        self.used_proxy = None
+        await self.provide_proxy()
+
+    async def provide_proxy(self):
+        if self.proxy_provider is not None:
+            proxies = self.proxy_provider()
+        elif self.proxy_from_file:
+            proxies = self.harvest_proxy_from_file()
+        else:
+            proxies = await self.scrape_proxy_from_web()
+
+        self.proxy.clear()
+        self.proxy.add_many(proxies)
+
+    async def scrape_proxy_from_web(self):
+        proxies = {}
+        error = None
+
+        for proxy_site in self.harvested_proxy_sites():
+            try:
+                proxy_source = await AsyncScrapper.scrape(self, proxy_site.url, proxy_site.parser)
+                proxies.update(dict.fromkeys(self.extract_proxy_from_site(proxy_source, proxy_site)))
+            except scraping.ScrapingException as e:
+                error = e
+
+        return self.harvested_proxies(proxies, error)
+
+    @staticmethod
+    def proxy_address(proxy):
+        return f'http://{proxy.ip}:{proxy.port}'
+
+    async def get_stealth_source(self, url, protocol, parser=parsing.HTML_PARSER, lazy=False, cached_response=None):
+        headers = response_cache.ResponseCache.conditional_headers(cached_response)
+        retry_state = self.start_retries()
+
+        while True:
+            proxy = self.used_proxy
+            client_session = self.identity_client_session(self.session_identity())
+            await self.close_retired_sessions()
+            request_start_time = time.monotonic()
+
+            try:
+                async with client_session.get(url, timeout=self.client_timeout(), proxy=self.proxy_address(proxy),
+                                              headers={'User-Agent': self.used_user_agent, **headers}) as source:
+                    latency = time.monotonic() - request_start_time
+                    body = await source.read()
+            except aiohttp.ClientSSLError:
+                await self.handle_proxy_ssl_error(url, protocol)
+            except aiohttp.ConnectionTimeoutError:
+                await self.handle_proxy_connect_timeout(protocol)
+            except (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError):
+                await self.handle_proxy_error(protocol)
+            except asyncio.TimeoutError:
+                await self.handle_proxy_read_timeout(protocol)
+            except aiohttp.ClientPayloadError:
+                await self.handle_proxy_chunked_encoding_error(protocol)
+            except aiohttp.ClientConnectionError:
+                await self.handle_proxy_connection_error(protocol)
+            except aiohttp.ClientError as e:
+                raise scraping.StealthScrapingException(f'Undefined aiohttp error: {str(e)}')
+            except ValueError:
+                # Some aiohttp errors (certificate errors, invalid urls) are value errors too, they are handled
+                # above. aiohttp refuses to send an invalid header value with a bare ValueError.
+                await self.handle_invalid_header()
+            else:
+                self.record_response(url, source.status, source.headers, request_start_time, latency)
+                self.store_page(url, source.status, source.headers, body)
+                content = self.source_content(url, source.status, source.headers, body, cached_response)
+                self.report_stealth_success(proxy, latency)
+                self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                          'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+                return self.parse(content, parser, lazy)
+
+            await self.wait_before_retry(url, retry_state)
+
+    async def handle_proxy_connect_timeout(self, protocol):
+        self.connect_timeout_counter += 1
+        await self.proxy_connect_timeout(f'{str(self.used_proxy)} '
+                                         f'{self.connect_timeout_counter}/{self.max_connect_timeout}')
+
+        if self.connect_timeout_counter >= self.max_connect_timeout:
+            self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                      'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+            await self.penalize_proxy(self.used_proxy, protocol)
+            self.draw_proxy(protocol)
+
+    async def handle_proxy_error(self, protocol):
+        self.count_error('proxy_error')
+        await self.proxy_error(str(self.used_proxy))
+        await self.penalize_proxy(self.used_proxy, protocol)
+        self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                  'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+        self.draw_proxy(protocol)
+
+    async def handle_invalid_header(self):
+        self.count_error('invalid_user_agent')
+        self.count_stealth('user_agent_requests_total', 'invalid', user_agent=self.used_user_agent)
+        await self.invalid_user_agent(self.used_user_agent)
+        await self.remove_user_agent(self.used_user_agent)
+        self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                  'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+        self.draw_user_agent()
+
+    async def handle_proxy_read_timeout(self, protocol):
+        self.read_timeout_counter += 1
+        await self.proxy_read_timeout(f'{self.read_timeout_counter}/{self.max_read_timeout}')
+
+        if self.read_timeout_counter >= self.max_read_timeout:
+            self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                      'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+            raise scraping.ProxyReadTimeout()
+
+        self.reset_error_counters('connect_timeout_counter', 'connection_error_counter', 'proxy_ssl_error_counter',
+                                  'chunked_encoding_error_counter')
+        await self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
+
+    async def handle_proxy_ssl_error(self, url, protocol):
+        self.proxy_ssl_error_counter += 1
+        await self.proxy_ssl_error(f'{str(self.used_proxy)} {self.proxy_ssl_error_counter}/'
+                                   f'{self.max_proxy_ssl_error}', url)
+
+        if self.proxy_ssl_error_counter >= self.max_proxy_ssl_error:
+            self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                      'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+            raise scraping.ProxySSLError()
+
+        self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                  'chunked_encoding_error_counter')
+        await self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
+
+    async def handle_proxy_connection_error(self, protocol):
+        self.connection_error_counter += 1
+        await self.proxy_connection_error(f'{self.connection_error_counter}/{self.max_connection_error}')
+
+        if self.connection_error_counter >= self.max_connection_error:
+            self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                      'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+            raise scraping.ProxyConnectionError()
+
+        self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'proxy_ssl_error_counter',
+                                  'chunked_encoding_error_counter')
+        await self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
+
+    async def handle_proxy_chunked_encoding_error(self, protocol):
+        self.chunked_encoding_error_counter += 1
+        await self.proxy_chunked_encoding_error(f'{self.chunked_encoding_error_counter}/'
+                                                f'{self.max_chunked_encoding_error}')
+
+        if self.chunked_encoding_error_counter >= self.max_chunked_encoding_error:
+            self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                                      'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
+            raise scraping.ProxyChunkedEncodingError()
+
+        self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'proxy_ssl_error_counter',
+                                  'connection_error_counter')
+        self.draw_proxy(protocol)
+
+    async def penalize_proxy(self, proxy, protocol):
+        self.count_stealth('proxy_requests_total', 'failure', proxy=proxy.address())
+        self.proxy.report_failure(proxy)
+
+        if self.proxy_refresher is not None:
+            self.proxy_refresher.wake()
+
+        if self.proxy.count(protocol) == 0:
+            await self.proxy_exhausted(protocol)
+
+    async def remove_proxy(self, proxy, protocol):
+        self.proxy.remove(proxy)
+
+        if self.proxy_refresher is not None:
+            self.proxy_refresher.wake()
+
+        if self.proxy.count(protocol) == 0:
+            await self.proxy_exhausted(protocol)
+
+    async def remove_user_agent(self, user_agent):
+        if user_agent == self.used_user_agent:
+            self.local.used_user_agent = None
+
+        if self.user_agents.remove(user_agent) and len(self.user_agents) == 0:
+            await self.user_agents_exhausted()
+
+    @event.async_signal
+    def proxy_connect_timeout(self, proxy_info):
+        pass
+
+    @event.async_signal
+    def proxy_error(self, proxy_info):
+        pass
+
+    @event.async_signal
+    def invalid_user_agent(self, user_agent_info):
+        pass
+
+    @event.async_signal
+    def proxy_read_timeout(self, info):
+        pass
+
+    @event.async_signal
+    def proxy_ssl_error(self, proxy_info, url):
+        pass
+
+    @event.async_signal
+    def proxy_connection_error(self, info):
+        pass
+
+    @event.async_signal
+    def proxy_chunked_encoding_error(self, info):
+        pass
+
+    @event.async_signal
+    def proxy_exhausted(self, protocol):
+        pass
+
+    @event.async_signal
+    def user_agents_exhausted(self):
+        pass
+
+
+class ContextLocal:
+    # Like threading.local, but per asyncio task. fork() gives the current task its own copy of the values,
+    # so concurrent scrapes don't share error counters or the drawn proxy.
+
+    def __init__(self):
+        object.__setattr__(self, 'context', contextvars.ContextVar(f'context_local_{id(self)}', default=None))
+
+    def __getattr__(self, name):
+        values = self.context.get()
+
+        if values is None or name not in values:
+            raise AttributeError(name)
+
+        return values[name]
+
+    def __setattr__(self, name, value):
+        values = self.context.get()
+
+        if values is None:
+            values = {}
+            self.context.set(values)
+
+        values[name] = value
+
+    def fork(self):
+        self.context.set(dict(self.context.get() or {}))
@@ -0,0 +1,119 @@
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import distributed
+import scraping
+from mock_server import MockServer
+from forwarding_proxy import ForwardingProxy
+
+BACKENDS = ('sqlite', 'server')
+USER_AGENTS = [f'Mozilla/5.0 (X11; Linux x86_64) Benchmark/{number}' for number in range(20)]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Crawl of a local mock server by worker processes sharing a backend.')
+    parser.add_argument('--processes', default='1,2,4', help='comma separated numbers of worker processes')
+    parser.add_argument('--workers', type=int, default=4, help='threads of every worker process')
+    parser.add_argument('--seeds', type=int, default=20)
+    parser.add_argument('--max-depth', type=int, default=1, help='every page links to 20 other pages')
+    parser.add_argument('--latency', type=float, default=0.1, help='server latency in seconds')
+    parser.add_argument('--body-size', type=int, default=4 * 1024)
+    parser.add_argument('--delay', type=int, default=0, help='delay between requests to the host in milliseconds')
+    parser.add_argument('--backend', default='sqlite', choices=BACKENDS)
+    parser.add_argument('--proxies', type=int, default=0, help='forwarding proxies shared by workers, stealth '
+                                                                'scrappers are used when there are any')
+    parser.add_argument('--parser', default='html.parser')
+
+    return parser.parse_args()
+
+
+def make_scrapper(stealth, delay):
+    if not stealth:
+        return scraping.Scrapper(min_delay=delay, max_delay=delay)
+
+    scrapper = scraping.StealthScrapper(min_delay=delay, max_delay=delay)
+    scrapper.user_agents = USER_AGENTS
+
+    return scrapper
+
+
+def crawl(server, processes, proxies, arguments):
+    with tempfile.TemporaryDirectory() as directory:
+        backend_server = None
+
+        if arguments.backend == 'sqlite':
+            path = os.path.join(directory, 'distributed.sqlite')
+            backend = distributed.SQLiteBackend(path, arguments.max_depth)
+            backend_factory = functools.partial(distributed.SQLiteBackend, path, arguments.max_depth)
+        else:
+            backend_server = distributed.BackendServer(distributed.MemoryBackend(arguments.max_depth))
+            backend_server.start()
+            backend = backend_server.backend
+            backend_factory = functools.partial(distributed.connect_backend, backend_server.address)
+
+        try:
+            backend.add_many(server.url(f'/page/seed-{number}') for number in range(arguments.seeds))
+            backend.add_proxies(proxies)
+
+            with server.lock:
+                server.requests.clear()
+
+            coordinator = distributed.Coordinator(backend_factory, functools.partial(make_scrapper, bool(proxies),
+                                                                                     arguments.delay),
+                                                  processes, max_workers=arguments.workers, parser=arguments.parser,
+                                                  proxies_per_worker=max(len(proxies) // processes, 1))
+            start_time = time.perf_counter()
+            coordinator.start()
+            statistics = coordinator.join()
+            elapsed = time.perf_counter() - start_time
+        finally:
+            backend.close()
+
+            if backend_server is not None:
+                backend_server.stop()
+
+    with server.lock:
+        fetched = len(server.requests)
+        repeated = sum(count - 1 for count in server.requests.values())
+
+    scraped = sum(scraped for _, scraped, _ in statistics)
+    failed = sum(failed for _, _, failed in statistics)
+
+    return elapsed, scraped, failed, fetched, repeated
+
+
+def main():
+    arguments = parse_arguments()
+    forwarding_proxies = [ForwardingProxy(seed=number) for number in range(arguments.proxies)]
+    proxies = [scraping.Proxy(scraping.Proxy.HTTP, '127.0.0.1', forwarding_proxy.port)
+               for forwarding_proxy in forwarding_proxies]
+
+    for forwarding_proxy in forwarding_proxies:
+        forwarding_proxy.start()
+
+    try:
+        with MockServer(arguments.latency, arguments.body_size) as server:
+            print(f'{"processes":>9} {"seconds":>8} {"pages/s":>8} {"speedup":>8} {"scraped":>8} {"failed":>7} '
+                  f'{"repeated":>9}')
+            baseline = None
+
+            for processes in [int(processes) for processes in arguments.processes.split(',')]:
+                elapsed, scraped, failed, fetched, repeated = crawl(server, processes, proxies, arguments)
+                pages_per_second = fetched / elapsed
+                baseline = baseline or pages_per_second
+
+                print(f'{processes:>9} {elapsed:>8.2f} {pages_per_second:>8.1f} {pages_per_second / baseline:>7.2f}x '
+                      f'{scraped:>8} {failed:>7} {repeated:>9}')
+    finally:
+        for forwarding_proxy in forwarding_proxies:
+            forwarding_proxy.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import event
+
+SIGNAL_COUNTS = (1, 10, 100, 1000)
+OBSERVER_COUNTS = (0, 1, 10)
+EMITS = 20000
+
+
+def make_subject(number_of_signals, number_of_observers):
+    namespace = {}
+
+    for index in range(number_of_signals):
+        namespace[f'signal_{index}'] = event.signal(make_signal(f'signal_{index}'))
+
+    subject_class = type('BenchmarkSubject', (event.Subject,), namespace)
+    subject = subject_class()
+
+    for index in range(number_of_signals):
+        event_signal = getattr(subject, f'signal_{index}')
+
+        for _ in range(number_of_observers):
+            event.connect(subject, event_signal, make_observer())
+
+    return subject
+
+
+def make_signal(name):
+    def event_signal(self, info):
+        pass
+
+    event_signal.__name__ = name
+    return event_signal
+
+
+def make_observer():
+    def observer(info):
+        pass
+
+    return observer
+
+
+# Emit cost per observer call should stay the same no matter how many signals a subject has.
+def main():
+    print(f'{"signals":>8} {"observers":>10} {"ns/emit":>10}')
+
+    for number_of_signals in SIGNAL_COUNTS:
+        for number_of_observers in OBSERVER_COUNTS:
+            subject = make_subject(number_of_signals, number_of_observers)
+            emit = getattr(subject, f'signal_{number_of_signals - 1}')
+            seconds = min(timeit.repeat(lambda: emit('info'), number=EMITS, repeat=5))
+
+            print(f'{number_of_signals:>8} {number_of_observers:>10} {seconds / EMITS * 1e9:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import http.client
+import random
+import select
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from mock_server import QuietHTTPServer
+
+
+class ForwardingProxy:
+    # Local HTTP proxy forwarding plain requests and tunnelling CONNECT. With failure_rate some connections
+    # are closed without an answer, which requests reports as a proxy error.
+
+    def __init__(self, failure_rate=0.0, seed=0):
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.forwarded = 0
+        self.failed = 0
+        self.server = QuietHTTPServer(('127.0.0.1', 0), ForwardingRequestHandler)
+        self.server.proxy = self
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='ForwardingProxy', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail(self):
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+            self.failed += failed
+            self.forwarded += not failed
+
+            return failed
+
+
+class ForwardingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, with Nagle's algorithm a kept alive connection waits for a delayed ACK
+    # between them.
+    disable_nagle_algorithm = True
+    HOP_BY_HOP_HEADERS = ('connection', 'keep-alive', 'proxy-connection', 'proxy-authorization', 'te', 'trailer',
+                          'transfer-encoding', 'upgrade')
+
+    def do_GET(self):
+        if self.server.proxy.fail():
+            self.close_connection = True
+            return
+
+        target = urlsplit(self.path)
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in ForwardingRequestHandler.HOP_BY_HOP_HEADERS}
+        path = target.path + (f'?{target.query}' if target.query else '')
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+
+        try:
+            connection.request('GET', path or '/', headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.send_error(502)
+            return
+        finally:
+            connection.close()
+
+        self.send_response(response.status)
+        for name, value in response.getheaders():
+            if name.lower() not in ForwardingRequestHandler.HOP_BY_HOP_HEADERS + ('content-length',):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_CONNECT(self):
+        if self.server.proxy.fail():
+            self.close_connection = True
+            return
+
+        host, port = self.path.rsplit(':', 1)
+
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=30)
+        except OSError:
+            self.send_error(502)
+            return
+
+        self.send_response(200, 'Connection established')
+        self.end_headers()
+        self.tunnel(upstream)
+        self.close_connection = True
+
+    def tunnel(self, upstream):
+        sockets = [self.connection, upstream]
+
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    return
+
+                for readable_socket in readable:
+                    data = readable_socket.recv(64 * 1024)
+                    if not data:
+                        return
+
+                    (upstream if readable_socket is self.connection else self.connection).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,205 @@
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+READ_TIMEOUT = 'read_timeout'
+CHUNKED_ENCODING = 'chunked_encoding'
+SERVER_FAILURES = (READ_TIMEOUT, CHUNKED_ENCODING)
+
+
+class MockServer:
+    # Local HTTP(S) server serving generated pages with links. Failures are drawn from a generator seeded
+    # with the seed, the path and the number of the request to that path, so every run fails the same way.
+
+    def __init__(self, latency=0.0, body_size=16 * 1024, failure_rate=0.0, failures=SERVER_FAILURES, stall_time=2.0,
+                 seed=0, certfile=None, keyfile=None):
+        self.latency = latency
+        self.body_size = body_size
+        self.failure_rate = failure_rate
+        self.failures = tuple(failures)
+        self.stall_time = stall_time
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.served = 0
+        self.failed = 0
+        self.proxy_list = b''
+        self.server = QuietHTTPServer(('127.0.0.1', 0), MockRequestHandler)
+        self.server.mock = self
+
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # Handshakes are made in request threads, not in the one that accepts connections.
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True,
+                                                     do_handshake_on_connect=False)
+
+        self.scheme = 'https' if certfile is not None else 'http'
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def url(self, path='/'):
+        return f'{self.scheme}://127.0.0.1:{self.port}{path}'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='MockServer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def draw_failure(self, path):
+        with self.lock:
+            number = self.requests.get(path, 0)
+            self.requests[path] = number + 1
+
+        generator = random.Random(f'{self.seed}:{path}:{number}')
+
+        if self.failures and generator.random() < self.failure_rate:
+            return generator.choice(self.failures)
+
+        return None
+
+    def page(self, path):
+        generator = random.Random(f'{self.seed}:{path}')
+        links = ''.join(f'<li><a href="/page/{generator.randrange(1000000)}">link</a></li>' for _ in range(20))
+        head = f'<html><head><title>{path}</title></head><body><ul>{links}</ul>'
+        paragraph = '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>'
+        paragraphs = paragraph * max((self.body_size - len(head)) // len(paragraph), 0)
+
+        return f'{head}{paragraphs}</body></html>'.encode()
+
+    # Proxy list in the same format as the one on free-proxy-list.net, so StealthScrapper can harvest it.
+    def set_proxy_list(self, proxies):
+        rows = ''.join(f'<tr><td>{proxy.ip}</td><td>{proxy.port}</td><td>PL</td><td>Poland</td><td>elite</td>'
+                       f'<td>no</td><td>{"yes" if proxy.protocol == "https" else "no"}</td><td>1 min</td></tr>'
+                       for proxy in proxies)
+        self.proxy_list = f'<html><body><table><tbody>{rows}</tbody></table></body></html>'.encode()
+
+    def count(self, failed=False):
+        with self.lock:
+            self.served += 1
+            self.failed += failed
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    # Clients drop connections on purpose (timeouts, broken streams), so these errors aren't printed.
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError, socket.timeout)):
+            super().handle_error(request, client_address)
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, with Nagle's algorithm a kept alive connection waits for a delayed ACK
+    # between them.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        mock = self.server.mock
+        time.sleep(mock.latency)
+
+        if self.path == '/proxies':
+            return self.send_body(mock.proxy_list)
+
+        failure = mock.draw_failure(self.path)
+        mock.count(failure is not None)
+
+        if failure == READ_TIMEOUT:
+            time.sleep(mock.stall_time)
+            self.close_connection = True
+            return self.send_body(b'')
+
+        body = mock.page(self.path)
+
+        if failure == CHUNKED_ENCODING:
+            return self.send_broken_chunks(body)
+
+        self.send_body(body)
+
+    def send_body(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_broken_chunks(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        chunk = body[:len(body) // 2]
+        self.wfile.write(f'{len(chunk) * 2:x}\r\n'.encode() + chunk)
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BlackHole:
+    # Listening socket that never accepts, its backlog is filled up at once, so next connections
+    # aren't answered and end with a connect timeout.
+
+    def __init__(self, backlog_fillers=4):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(0)
+        self.fillers = []
+
+        for _ in range(backlog_fillers):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex(self.socket.getsockname())
+            self.fillers.append(filler)
+
+    @property
+    def port(self):
+        return self.socket.getsockname()[1]
+
+    def url(self, path='/'):
+        return f'http://127.0.0.1:{self.port}{path}'
+
+    def close(self):
+        for filler in self.fillers:
+            filler.close()
+
+        self.socket.close()
+
+
+def closed_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as closed_socket:
+        closed_socket.bind(('127.0.0.1', 0))
+        return closed_socket.getsockname()[1]
+
+
+# Self-signed certificate for HTTPS runs, made with openssl command line tool.
+def make_certificate(directory):
+    certfile = f'{directory}/mock_server.crt'
+    keyfile = f'{directory}/mock_server.key'
+
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', keyfile, '-out', certfile],
+                   check=True, capture_output=True)
+
+    return certfile, keyfile
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import parsing
+import proxy_sites
+import scraping
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'free_proxy_list.html')
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Proxy list extraction on a saved free-proxy-list.net page.')
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--number', type=int, default=20, help='extractions per measurement')
+    parser.add_argument('--repeat', type=int, default=5)
+
+    return parser.parse_args()
+
+
+# The way proxies were extracted before proxy sites: a whole soup and a CSS selection for every cell.
+def soup_extract(content, features):
+    proxies = []
+
+    for item in parsing.parse(content, features).select('tbody tr'):
+        if len(item.select('td')) > 6:
+            ip = item.select('td')[0].text
+            port = item.select('td')[1].text
+            protocol = scraping.Proxy.HTTP if item.select('td')[6].text == 'no' else scraping.Proxy.HTTPS
+
+            if scraping.Proxy.is_valid(protocol, ip, int(port)):
+                proxies.append(scraping.Proxy(protocol, ip, int(port)))
+
+    return proxies
+
+
+def main():
+    arguments = parse_arguments()
+
+    with open(arguments.fixture, 'rb') as fixture_file:
+        content = fixture_file.read()
+
+    scrapper = scraping.StealthScrapper()
+    table_site = proxy_sites.ProxyTableSite(scraping.StealthScrapper.PROXY_URL)
+    text_site = proxy_sites.PlainTextSite(scraping.StealthScrapper.PROXY_URL)
+    extractors = {'soup html.parser': lambda: soup_extract(content, parsing.HTML_PARSER),
+                  'table site': lambda: scrapper.extract_proxies(parsing.decode(content), table_site),
+                  'plain text site': lambda: scrapper.extract_proxies(parsing.decode(content), text_site)}
+
+    try:
+        import lxml
+        extractors['soup lxml'] = lambda: soup_extract(content, parsing.LXML)
+    except ImportError:
+        pass
+
+    expected = soup_extract(content, parsing.HTML_PARSER)
+    print(f'{len(content) / 1024:.0f} KiB page, {len(expected)} proxies')
+    print(f'{"extractor":<18} {"ms/page":>9} {"speedup":>8} {"proxies":>8}')
+    baseline = None
+
+    for name, extractor in extractors.items():
+        seconds = min(timeit.repeat(extractor, number=arguments.number, repeat=arguments.repeat)) / arguments.number
+        baseline = baseline or seconds
+
+        print(f'{name:<18} {seconds * 1000:>9.2f} {baseline / seconds:>7.1f}x {len(extractor()):>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import identity_pool
+import metrics
+import scraping
+import session_pool
+import transport
+from mock_server import MockServer, BlackHole, closed_port, make_certificate
+from forwarding_proxy import ForwardingProxy
+
+SCENARIOS = ('plain', 'faults', 'stealth', 'https')
+TRANSPORTS = ('requests', 'httpx', 'http2')
+LATENCY_BUCKETS = tuple(0.0005 * 1.25 ** exponent for exponent in range(60))
+USER_AGENTS = [f'Mozilla/5.0 (X11; Linux x86_64) Benchmark/{number}' for number in range(20)]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Scrapper benchmarks against a local mock server, fully offline.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.01, help='server latency in seconds')
+    parser.add_argument('--body-size', type=int, default=32 * 1024)
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='server and proxy failure rate in faults '
+                                                                        'and stealth scenarios')
+    parser.add_argument('--proxies', type=int, default=4, help='forwarding proxies in stealth scenario')
+    parser.add_argument('--dead-proxies', type=int, default=2, help='proxies at closed ports in stealth scenario')
+    parser.add_argument('--identity-requests', type=int, default=0, help='requests per sticky identity in stealth '
+                                                                         'scenario, 0 draws a proxy and a user agent '
+                                                                         'for every request')
+    parser.add_argument('--parser', default='html.parser')
+    parser.add_argument('--transport', default='requests', choices=TRANSPORTS, help='http2 is used only where TLS '
+                                                                                  'server offers it')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help='trace peak memory (slows scraping down)')
+    parser.add_argument('--json', action='store_true')
+
+    return parser.parse_args()
+
+
+def make_scrapper(scrapper_class, arguments, timeout=3.03):
+    scrapper = scrapper_class(min_delay=1, max_delay=2, timeout=timeout)
+    scrapper.session_pool = session_pool.SessionPool(transport=make_transport(arguments.transport))
+    scrapper.metrics = metrics.Metrics(buckets={'request_seconds': LATENCY_BUCKETS, 'parse_seconds': LATENCY_BUCKETS})
+
+    return scrapper
+
+
+# https scenario trusts its certificate through REQUESTS_CA_BUNDLE, httpx is given the same file.
+def make_transport(transport_name):
+    if transport_name == 'requests':
+        return transport.RequestsTransport()
+
+    return transport.HttpxTransport(http2=transport_name == 'http2', verify=os.environ.get('REQUESTS_CA_BUNDLE', True))
+
+
+def run(scrapper, urls, arguments):
+    if arguments.memory:
+        tracemalloc.start()
+
+    pages = 0
+    errors = {}
+    start_time = time.perf_counter()
+
+    for url, source, exception in scrapper.scrape_many(urls, arguments.workers, arguments.parser):
+        if exception is None:
+            pages += 1
+        else:
+            errors[type(exception).__name__] = errors.get(type(exception).__name__, 0) + 1
+
+    elapsed_time = time.perf_counter() - start_time
+    peak_memory = None
+
+    if arguments.memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    request_seconds = scrapper.metrics.histogram('request_seconds')
+    parse_seconds = scrapper.metrics.histogram('parse_seconds', parser=arguments.parser)
+    snapshot = scrapper.metrics.snapshot()
+
+    return {'pages': pages, 'urls': len(urls), 'seconds': elapsed_time, 'pages_per_second': pages / elapsed_time,
+            'p50_ms': milliseconds(request_seconds.quantile(0.5)),
+            'p99_ms': milliseconds(request_seconds.quantile(0.99)),
+            'parse_ms': milliseconds(parse_seconds.sum / parse_seconds.count) if parse_seconds else None,
+            'peak_memory_mb': peak_memory / 1024 / 1024 if peak_memory is not None else None,
+            'errors': errors, 'retried_errors': snapshot['counters'].get('errors_total', {})}
+
+
+def page_urls(server, arguments):
+    return [server.url(f'/page/{number}') for number in range(arguments.pages)]
+
+
+def plain_scenario(arguments):
+    with MockServer(arguments.latency, arguments.body_size, seed=arguments.seed) as server:
+        with make_scrapper(scraping.Scrapper, arguments) as scrapper:
+            return run(scrapper, page_urls(server, arguments), arguments)
+
+
+# Server side failures are retried by the scrapper, every 50th url is an SSL error (https to a plain HTTP port)
+# and every 50th a connect timeout (a port that doesn't accept connections).
+def faults_scenario(arguments):
+    black_hole = BlackHole()
+
+    try:
+        with MockServer(arguments.latency, arguments.body_size, arguments.failure_rate, stall_time=1.0,
+                        seed=arguments.seed) as server:
+            urls = page_urls(server, arguments)
+
+            for number in range(0, len(urls), 50):
+                urls[number] = server.url(f'/page/{number}').replace('http://', 'https://')
+            for number in range(25, len(urls), 50):
+                urls[number] = black_hole.url(f'/page/{number}')
+
+            with make_scrapper(scraping.Scrapper, arguments, timeout=0.5) as scrapper:
+                return run(scrapper, urls, arguments)
+    finally:
+        black_hole.close()
+
+
+# Proxies are harvested from the mock server, so even refreshing the proxy list stays offline.
+def stealth_scenario(arguments):
+    forwarding_proxies = [ForwardingProxy(arguments.failure_rate, arguments.seed + number)
+                          for number in range(arguments.proxies)]
+    proxies = [scraping.Proxy(scraping.Proxy.HTTP, '127.0.0.1', forwarding_proxy.port)
+               for forwarding_proxy in forwarding_proxies]
+    proxies += [scraping.Proxy(scraping.Proxy.HTTP, '127.0.0.1', closed_port()) for _ in range(arguments.dead_proxies)]
+    proxy_url = scraping.StealthScrapper.PROXY_URL
+
+    for forwarding_proxy in forwarding_proxies:
+        forwarding_proxy.start()
+
+    try:
+        with MockServer(arguments.latency, arguments.body_size, seed=arguments.seed) as server:
+            server.set_proxy_list(proxies)
+            scraping.StealthScrapper.PROXY_URL = server.url('/proxies')
+
+            with make_scrapper(scraping.StealthScrapper, arguments) as scrapper:
+                scrapper.user_agents = list(USER_AGENTS)
+                for proxy in proxies:
+                    scrapper.proxy.add(proxy)
+                if arguments.identity_requests > 0:
+                    scrapper.identity_pool = identity_pool.IdentityPool(max_requests=arguments.identity_requests)
+
+                return run(scrapper, page_urls(server, arguments), arguments)
+    finally:
+        scraping.StealthScrapper.PROXY_URL = proxy_url
+
+        for forwarding_proxy in forwarding_proxies:
+            forwarding_proxy.stop()
+
+
+# Needs openssl command line tool to make a self-signed certificate, requests trusts it through REQUESTS_CA_BUNDLE.
+def https_scenario(arguments):
+    if shutil.which('openssl') is None:
+        return None
+
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = make_certificate(directory)
+        ca_bundle = os.environ.get('REQUESTS_CA_BUNDLE')
+        os.environ['REQUESTS_CA_BUNDLE'] = certfile
+
+        try:
+            with MockServer(arguments.latency, arguments.body_size, seed=arguments.seed, certfile=certfile,
+                            keyfile=keyfile) as server:
+                with make_scrapper(scraping.Scrapper, arguments) as scrapper:
+                    return run(scrapper, page_urls(server, arguments), arguments)
+        finally:
+            if ca_bundle is None:
+                del os.environ['REQUESTS_CA_BUNDLE']
+            else:
+                os.environ['REQUESTS_CA_BUNDLE'] = ca_bundle
+
+
+def milliseconds(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def print_results(results):
+    print(f'{"scenario":<10} {"pages":>11} {"pages/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"parse ms":>9} {"peak MB":>8}  '
+          f'errors')
+
+    for scenario, result in results.items():
+        if result is None:
+            print(f'{scenario:<10} skipped')
+            continue
+
+        peak_memory = f'{result["peak_memory_mb"]:.1f}' if result['peak_memory_mb'] is not None else '-'
+        parse_time = f'{result["parse_ms"]:.2f}' if result['parse_ms'] is not None else '-'
+        errors = ', '.join(f'{name}: {count}' for name, count in {**result['retried_errors'],
+                                                                  **result['errors']}.items())
+
+        print(f'{scenario:<10} {result["pages"]:>5}/{result["urls"]:<5} {result["pages_per_second"]:>9.1f} '
+              f'{result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {parse_time:>9} {peak_memory:>8}  {errors}')
+
+
+def main():
+    arguments = parse_arguments()
+    scenarios = {'plain': plain_scenario, 'faults': faults_scenario, 'stealth': stealth_scenario,
+                 'https': https_scenario}
+    results = {}
+
+    for scenario in arguments.scenarios.split(','):
+        results[scenario] = scenarios[scenario](arguments)
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
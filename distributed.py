@@ -0,0 +1,738 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from multiprocessing import managers
+
+import frontier
+import pacing
+import parsing
+import scraping
+
+PROTOCOLS = (scraping.Proxy.HTTP, scraping.Proxy.HTTPS)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def proxy_entry(proxy):
+    if isinstance(proxy, tuple):
+        return proxy
+
+    return proxy.protocol, proxy.ip, proxy.port
+
+
+class Backend(ABC):
+    # State shared by workers of one crawl: the url queue, proxies and delays of hosts. Claimed urls and leased
+    # proxies belong to a worker until their lease ends, so urls of a worker that died are claimed again by
+    # other workers and none of the live ones fetches an url or uses a proxy that another one has.
+
+    @abstractmethod
+    def add_many(self, urls, priority=0, depth=0):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker_id, count, lease_time):
+        raise NotImplementedError
+
+    # With worker_id only the worker that holds the lease of the item finishes or retries it. A worker whose lease
+    # ended and was claimed by another worker is ignored, the url is scraped by the other one.
+    @abstractmethod
+    def done(self, item, worker_id=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def retry(self, item, priority=None, attempts=None, worker_id=None):
+        raise NotImplementedError
+
+    # Extends leases of urls and proxies of the worker.
+    @abstractmethod
+    def renew(self, worker_id, lease_time):
+        raise NotImplementedError
+
+    # Claimed urls of the worker are queued again and its proxies can be leased by others.
+    @abstractmethod
+    def release(self, worker_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def pending_count(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def in_progress_count(self):
+        raise NotImplementedError
+
+    # Same as reserve and update of pacing.HostRateLimiter, but for all workers.
+    @abstractmethod
+    def reserve_host(self, host_name, next_delay):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_host(self, host_name, next_delay):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_proxies(self, proxies):
+        raise NotImplementedError
+
+    # Returns up to count (protocol, ip, port) entries of proxies that nobody holds.
+    @abstractmethod
+    def lease_proxies(self, worker_id, protocol, count, lease_time):
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_proxies(self, proxies):
+        raise NotImplementedError
+
+    @abstractmethod
+    def proxy_count(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(frontier.Frontier, Backend):
+    # Frontier database shared by processes of one machine. Every claim, lease and reservation is a single
+    # BEGIN IMMEDIATE transaction, so processes see them in one order. Times are wall clock times,
+    # monotonic clocks of processes can't be compared.
+    PATH = r'files/distributed.sqlite'
+    CLEANUP_INTERVAL = 1024
+
+    def __init__(self, path=PATH, max_depth=None):
+        self.reservations = 0
+
+        super().__init__(path, max_depth, link_extractors=())
+
+    def create_tables(self):
+        super().create_tables()
+
+        self.connection.execute('CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY, worker TEXT NOT NULL, '
+                                'lease_until REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS leases_worker ON leases (worker)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS leases_until ON leases (lease_until)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, '
+                                'previous_tick_time REAL NOT NULL, next_delay REAL NOT NULL) WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS proxies (protocol TEXT NOT NULL, ip TEXT NOT NULL, '
+                                'port INTEGER NOT NULL, worker TEXT, lease_until REAL NOT NULL DEFAULT 0, '
+                                'PRIMARY KEY (protocol, ip, port)) WITHOUT ROWID')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS proxies_lease ON proxies (protocol, lease_until)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS proxies_worker ON proxies (worker)')
+
+    # Only urls without a lease are queued again, the other ones are being scraped by running workers.
+    def resume(self):
+        with self.lock:
+            self.connection.execute('UPDATE queue SET state = ? WHERE state = ? AND id NOT IN (SELECT id FROM leases)',
+                                    (frontier.PENDING, frontier.IN_PROGRESS))
+
+    # Urls whose lease has ended are queued again before anything is claimed.
+    def claim(self, worker_id, count, lease_time):
+        now = time.time()
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                self.connection.execute('UPDATE queue SET state = ? WHERE id IN '
+                                        '(SELECT id FROM leases WHERE lease_until < ?)', (frontier.PENDING, now))
+                self.connection.execute('DELETE FROM leases WHERE lease_until < ?', (now,))
+                rows = self.connection.execute('SELECT id, url, priority, depth, attempts FROM queue WHERE state = ? '
+                                               'ORDER BY priority DESC, id LIMIT ?',
+                                               (frontier.PENDING, count)).fetchall()
+                self.connection.executemany('UPDATE queue SET state = ? WHERE id = ?',
+                                            [(frontier.IN_PROGRESS, row[0]) for row in rows])
+                self.connection.executemany('INSERT INTO leases VALUES (?, ?, ?)',
+                                            [(row[0], worker_id, now + lease_time) for row in rows])
+
+        return [frontier.FrontierItem(*row) for row in rows]
+
+    def done(self, item, worker_id=None):
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+
+                if self.delete_lease(item, worker_id):
+                    self.connection.execute('DELETE FROM queue WHERE id = ?', (item.id,))
+
+    def retry(self, item, priority=None, attempts=None, worker_id=None):
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+
+                if not self.delete_lease(item, worker_id):
+                    return
+
+                self.connection.execute('UPDATE queue SET state = ?, priority = ?, attempts = ? '
+                                        'WHERE id = ? AND state = ?',
+                                        (frontier.PENDING, item.priority if priority is None else priority,
+                                         item.attempts if attempts is None else attempts, item.id,
+                                         frontier.IN_PROGRESS))
+
+    def delete_lease(self, item, worker_id):
+        if worker_id is None:
+            self.connection.execute('DELETE FROM leases WHERE id = ?', (item.id,))
+            return True
+
+        return self.connection.execute('DELETE FROM leases WHERE id = ? AND worker = ?',
+                                       (item.id, worker_id)).rowcount > 0
+
+    def renew(self, worker_id, lease_time):
+        lease_until = time.time() + lease_time
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.execute('UPDATE leases SET lease_until = ? WHERE worker = ?', (lease_until, worker_id))
+                self.connection.execute('UPDATE proxies SET lease_until = ? WHERE worker = ?', (lease_until, worker_id))
+
+    def release(self, worker_id):
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                self.connection.execute('UPDATE queue SET state = ? WHERE id IN '
+                                        '(SELECT id FROM leases WHERE worker = ?)',
+                                        (frontier.PENDING, worker_id))
+                self.connection.execute('DELETE FROM leases WHERE worker = ?', (worker_id,))
+                self.connection.execute('UPDATE proxies SET worker = NULL, lease_until = 0 WHERE worker = ?',
+                                        (worker_id,))
+
+    def in_progress_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM queue WHERE state = ?',
+                                           (frontier.IN_PROGRESS,)).fetchone()[0]
+
+    def reserve_host(self, host_name, next_delay):
+        now = time.time()
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                row = self.connection.execute('SELECT previous_tick_time, next_delay FROM hosts WHERE host = ?',
+                                              (host_name,)).fetchone()
+                previous_tick_time, delay = row if row is not None else (now, 0.0)
+                remaining_delay = max(previous_tick_time + delay - now, 0.0)
+                self.connection.execute('INSERT OR REPLACE INTO hosts VALUES (?, ?, ?)',
+                                        (host_name, now + remaining_delay, next_delay))
+
+                self.reservations += 1
+                if self.reservations % SQLiteBackend.CLEANUP_INTERVAL == 0:
+                    self.connection.execute('DELETE FROM hosts WHERE previous_tick_time + next_delay < ?', (now,))
+
+        return remaining_delay
+
+    def update_host(self, host_name, next_delay):
+        with self.lock:
+            self.connection.execute('INSERT INTO hosts VALUES (?, ?, ?) ON CONFLICT (host) DO UPDATE SET '
+                                    'previous_tick_time = MAX(previous_tick_time, excluded.previous_tick_time), '
+                                    'next_delay = excluded.next_delay', (host_name, time.time(), next_delay))
+
+    def add_proxies(self, proxies):
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+                changes = self.connection.total_changes
+                self.connection.executemany('INSERT OR IGNORE INTO proxies (protocol, ip, port) VALUES (?, ?, ?)',
+                                            [proxy_entry(proxy) for proxy in proxies])
+
+                return self.connection.total_changes - changes
+
+    def lease_proxies(self, worker_id, protocol, count, lease_time):
+        now = time.time()
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                rows = self.connection.execute('SELECT protocol, ip, port FROM proxies WHERE protocol = ? AND '
+                                               'lease_until < ? LIMIT ?', (protocol, now, count)).fetchall()
+                self.connection.executemany('UPDATE proxies SET worker = ?, lease_until = ? '
+                                            'WHERE protocol = ? AND ip = ? AND port = ?',
+                                            [(worker_id, now + lease_time) + row for row in rows])
+
+        return rows
+
+    def remove_proxies(self, proxies):
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.executemany('DELETE FROM proxies WHERE protocol = ? AND ip = ? AND port = ?',
+                                            [proxy_entry(proxy) for proxy in proxies])
+
+    def proxy_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM proxies').fetchone()[0]
+
+
+class MemoryBackend(Backend):
+    # Backend kept in memory of one process, for threads of that process or for processes and machines
+    # connected to a BackendServer. Pending urls are a heap ordered like the frontier queue.
+
+    def __init__(self, max_depth=None):
+        self.lock = threading.Lock()
+        self.max_depth = max_depth
+        self.seen = set()
+        self.queue = []
+        self.items = {}
+        self.leases = {}
+        self.ids = itertools.count(1)
+        self.rate_limiter = pacing.HostRateLimiter()
+        self.proxies = {}
+
+    def add_many(self, urls, priority=0, depth=0):
+        if self.max_depth is not None and depth > self.max_depth:
+            return 0
+
+        added = 0
+
+        with self.lock:
+            for url in urls:
+                if isinstance(url, tuple):
+                    url, url_priority = url
+                else:
+                    url_priority = priority
+
+                url_fingerprint = frontier.fingerprint(url)
+                if url_fingerprint in self.seen:
+                    continue
+
+                self.seen.add(url_fingerprint)
+                item = frontier.FrontierItem(next(self.ids), url, url_priority, depth)
+                self.items[item.id] = item
+                heapq.heappush(self.queue, (-item.priority, item.id))
+                added += 1
+
+        return added
+
+    def claim(self, worker_id, count, lease_time):
+        now = time.time()
+        claimed = []
+
+        with self.lock:
+            for item_id, (_, lease_until) in list(self.leases.items()):
+                if lease_until < now:
+                    del self.leases[item_id]
+                    heapq.heappush(self.queue, (-self.items[item_id].priority, item_id))
+
+            while self.queue and len(claimed) < count:
+                _, item_id = heapq.heappop(self.queue)
+                item = self.items.get(item_id)
+
+                # Ids of urls that were finished without a lease, or queued twice, are left in the heap.
+                if item is None or item_id in self.leases:
+                    continue
+
+                self.leases[item_id] = (worker_id, now + lease_time)
+                claimed.append(frontier.FrontierItem(item.id, item.url, item.priority, item.depth, item.attempts))
+
+        return claimed
+
+    def done(self, item, worker_id=None):
+        with self.lock:
+            if worker_id is not None and not self.holds_lease(item.id, worker_id):
+                return
+
+            self.items.pop(item.id, None)
+            self.leases.pop(item.id, None)
+
+    def retry(self, item, priority=None, attempts=None, worker_id=None):
+        with self.lock:
+            if worker_id is not None and not self.holds_lease(item.id, worker_id):
+                return
+
+            if self.leases.pop(item.id, None) is None or item.id not in self.items:
+                return
+
+            stored_item = self.items[item.id]
+            stored_item.priority = item.priority if priority is None else priority
+            stored_item.attempts = item.attempts if attempts is None else attempts
+            heapq.heappush(self.queue, (-stored_item.priority, item.id))
+
+    def holds_lease(self, item_id, worker_id):
+        lease = self.leases.get(item_id)
+
+        return lease is not None and lease[0] == worker_id
+
+    def renew(self, worker_id, lease_time):
+        lease_until = time.time() + lease_time
+
+        with self.lock:
+            for item_id, (lease_worker_id, _) in self.leases.items():
+                if lease_worker_id == worker_id:
+                    self.leases[item_id] = (worker_id, lease_until)
+
+            for lease in self.proxies.values():
+                if lease[0] == worker_id:
+                    lease[1] = lease_until
+
+    def release(self, worker_id):
+        with self.lock:
+            for item_id, (lease_worker_id, _) in list(self.leases.items()):
+                if lease_worker_id == worker_id:
+                    del self.leases[item_id]
+                    heapq.heappush(self.queue, (-self.items[item_id].priority, item_id))
+
+            for lease in self.proxies.values():
+                if lease[0] == worker_id:
+                    lease[0], lease[1] = None, 0.0
+
+    # The heap can hold ids of urls that were finished or claimed meanwhile, only the ones still waiting count.
+    def pending_count(self):
+        with self.lock:
+            return len({item_id for _, item_id in self.queue if item_id in self.items and item_id not in self.leases})
+
+    def in_progress_count(self):
+        with self.lock:
+            return len(self.leases)
+
+    def seen_count(self):
+        with self.lock:
+            return len(self.seen)
+
+    # A single process keeps the delays, so its monotonic clock can be used.
+    def reserve_host(self, host_name, next_delay):
+        return self.rate_limiter.reserve(host_name, next_delay)
+
+    def update_host(self, host_name, next_delay):
+        self.rate_limiter.update(host_name, next_delay)
+
+    def add_proxies(self, proxies):
+        added = 0
+
+        with self.lock:
+            for proxy in proxies:
+                entry = proxy_entry(proxy)
+
+                if entry not in self.proxies:
+                    self.proxies[entry] = [None, 0.0]
+                    added += 1
+
+        return added
+
+    def lease_proxies(self, worker_id, protocol, count, lease_time):
+        now = time.time()
+        leased = []
+
+        with self.lock:
+            for entry, lease in self.proxies.items():
+                if len(leased) == count:
+                    break
+
+                if entry[0] == protocol and lease[1] < now:
+                    lease[0], lease[1] = worker_id, now + lease_time
+                    leased.append(entry)
+
+        return leased
+
+    def remove_proxies(self, proxies):
+        with self.lock:
+            for proxy in proxies:
+                self.proxies.pop(proxy_entry(proxy), None)
+
+    def proxy_count(self):
+        with self.lock:
+            return len(self.proxies)
+
+
+class BackendManager(managers.BaseManager):
+    pass
+
+
+BackendManager.register('backend')
+
+
+class BackendServer:
+    # Serves a backend (a MemoryBackend by default) to other processes and machines with a multiprocessing
+    # manager. authkey has to be the same on both sides, by default it is the authkey of this process, which
+    # processes started by it inherit.
+
+    def __init__(self, backend=None, address=('127.0.0.1', 0), authkey=None):
+        self.backend = MemoryBackend() if backend is None else backend
+
+        class ServedBackendManager(BackendManager):
+            pass
+
+        ServedBackendManager.register('backend', callable=lambda: self.backend)
+        self.server = ServedBackendManager(address=address, authkey=authkey).get_server()
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.address
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve, name='BackendServer', daemon=True)
+        self.thread.start()
+
+    # serve_forever of a manager server is meant to be a whole process: it ends with sys.exit and puts back
+    # the original sys.stdout and sys.stderr. Here it is a thread, so both are kept from leaking out of it.
+    def serve(self):
+        stdout, stderr = sys.stdout, sys.stderr
+
+        try:
+            self.server.serve_forever()
+        except SystemExit:
+            pass
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def stop(self):
+        self.server.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.server.listener.close()
+
+
+def connect_backend(address, authkey=None):
+    manager = BackendManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+
+    return manager.backend()
+
+
+class SharedRateLimiter:
+    # Stands in for pacing.HostRateLimiter of a scrapper, delays of hosts are kept by the backend.
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def reserve(self, host_name, next_delay):
+        return self.backend.reserve_host(host_name, next_delay)
+
+    def update(self, host_name, next_delay):
+        self.backend.update_host(host_name, next_delay)
+
+
+class Worker:
+    # Crawls urls claimed from a backend with a scrapper of its own process. The scrapper keeps delays of hosts
+    # in the backend and a stealth scrapper uses proxies leased to this worker: proxies it dropped after failures
+    # are removed from the backend and more are leased when it runs low. Leases are renewed every third
+    # of lease_time, which has to be longer than scraping of a batch of urls takes. Leased proxies are topped up
+    # by scrape threads and by the crawl thread, proxy_lock keeps them from doing it at once.
+
+    def __init__(self, backend, scrapper, worker_id=None, lease_time=60.0, batch_size=None, proxies_per_worker=20,
+                 link_extractors=(frontier.extract_links,), idle_wait=0.5):
+        self.backend = backend
+        self.scrapper = scrapper
+        self.worker_id = worker_name() if worker_id is None else worker_id
+        self.lease_time = lease_time
+        self.batch_size = batch_size
+        self.proxies_per_worker = proxies_per_worker
+        self.link_extractors = list(link_extractors)
+        self.idle_wait = idle_wait
+        self.proxy_lock = threading.Lock()
+        self.leased_proxies = set()
+        self.renewal_time = time.monotonic()
+
+        scrapper.rate_limiter = SharedRateLimiter(backend)
+
+        if isinstance(scrapper, scraping.StealthScrapper):
+            scrapper.proxy_provider = self.provide_proxies
+
+    def extract_links(self, item, source):
+        return [link for link_extractor in self.link_extractors for link in link_extractor(item.url, source)]
+
+    # Same as frontier.Frontier.crawl. The worker stops when no url is pending and no other worker scrapes any,
+    # until then it waits for links found by other workers and for leases of stopped workers to end.
+    def crawl(self, max_workers=1, parser=parsing.HTML_PARSER, lazy=False, max_attempts=1):
+        batch_size = self.batch_size or max_workers * 2
+
+        try:
+            while True:
+                items = self.backend.claim(self.worker_id, batch_size, self.lease_time)
+
+                if items:
+                    yield from self.crawl_items(items, max_workers, parser, lazy, max_attempts)
+                elif self.backend.pending_count() or self.backend.in_progress_count():
+                    time.sleep(self.idle_wait)
+                    self.renew_leases()
+                else:
+                    return
+        finally:
+            self.backend.release(self.worker_id)
+
+            with self.proxy_lock:
+                self.leased_proxies.clear()
+
+    def crawl_items(self, items, max_workers, parser, lazy, max_attempts):
+        in_flight = {item.url: item for item in items}
+        results = self.scrapper.scrape_many(list(in_flight), max_workers, parser, lazy)
+
+        try:
+            for url, source, exception in results:
+                item = in_flight.pop(url)
+
+                if exception is None:
+                    self.backend.add_many(self.extract_links(item, source), item.priority, item.depth + 1)
+                    self.backend.done(item, worker_id=self.worker_id)
+                elif item.attempts + 1 < max_attempts:
+                    self.backend.retry(item, item.priority - 1, item.attempts + 1, worker_id=self.worker_id)
+                else:
+                    self.backend.done(item, worker_id=self.worker_id)
+
+                self.renew_leases()
+                yield url, source, exception
+        finally:
+            results.close()
+
+            for item in in_flight.values():
+                self.backend.retry(item, worker_id=self.worker_id)
+
+    def renew_leases(self):
+        if time.monotonic() - self.renewal_time < self.lease_time / 3:
+            return
+
+        self.renewal_time = time.monotonic()
+        self.backend.renew(self.worker_id, self.lease_time)
+
+        if isinstance(self.scrapper, scraping.StealthScrapper):
+            self.refill_proxies()
+
+    # Proxies are given to the scrapper once it has none, and topped up when it keeps less than half of them.
+    def provide_proxies(self):
+        with self.proxy_lock:
+            self.drop_removed_proxies()
+
+            for protocol in PROTOCOLS:
+                self.lease_proxies(protocol, self.proxies_per_worker - self.leased_count(protocol))
+
+            return list(self.leased_proxies)
+
+    def refill_proxies(self):
+        with self.proxy_lock:
+            self.drop_removed_proxies()
+
+            for protocol in PROTOCOLS:
+                leased_count = self.leased_count(protocol)
+
+                if leased_count < self.proxies_per_worker // 2:
+                    self.scrapper.proxy.add_many(self.lease_proxies(protocol, self.proxies_per_worker - leased_count))
+
+    def lease_proxies(self, protocol, count):
+        if count <= 0:
+            return []
+
+        proxies = [scraping.Proxy(*entry)
+                   for entry in self.backend.lease_proxies(self.worker_id, protocol, count, self.lease_time)]
+        self.leased_proxies.update(proxies)
+
+        return proxies
+
+    def drop_removed_proxies(self):
+        removed_proxies = [proxy for proxy in self.leased_proxies if proxy not in self.scrapper.proxy]
+
+        if removed_proxies:
+            self.backend.remove_proxies([proxy_entry(proxy) for proxy in removed_proxies])
+            self.leased_proxies.difference_update(removed_proxies)
+
+    def leased_count(self, protocol):
+        return sum(1 for proxy in self.leased_proxies if proxy.protocol == protocol)
+
+
+def run_worker(backend_factory, scrapper_factory, result_handler, worker_options, crawl_options, statistics):
+    worker_id = None
+    scraped = failed = 0
+    backend = backend_factory()
+
+    try:
+        worker = Worker(backend, scrapper_factory(), **worker_options)
+        worker_id = worker.worker_id
+
+        for url, source, exception in worker.crawl(**crawl_options):
+            if exception is None:
+                scraped += 1
+            else:
+                failed += 1
+
+            if result_handler is not None:
+                result_handler(url, source, exception)
+    finally:
+        statistics.put((worker_id, scraped, failed))
+        backend.close()
+
+
+class Coordinator:
+    # Runs number_of_workers worker processes of one crawl. Factories and result_handler are called in worker
+    # processes, so they have to be picklable: functions of a module or functools.partial of classes.
+    # The backend has to be seeded with urls (and proxies for stealth scrappers) before workers start.
+
+    def __init__(self, backend_factory, scrapper_factory, number_of_workers=4, result_handler=None, max_workers=1,
+                 parser=parsing.HTML_PARSER, lazy=False, max_attempts=1, **worker_options):
+        self.backend_factory = backend_factory
+        self.scrapper_factory = scrapper_factory
+        self.number_of_workers = number_of_workers
+        self.result_handler = result_handler
+        self.crawl_options = {'max_workers': max_workers, 'parser': parser, 'lazy': lazy,
+                              'max_attempts': max_attempts}
+        self.worker_options = worker_options
+        self.statistics = multiprocessing.Queue()
+        self.processes = []
+
+    @property
+    def number_of_workers(self):
+        return self.__number_of_workers
+
+    @number_of_workers.setter
+    def number_of_workers(self, number_of_workers):
+        if number_of_workers < 1:
+            self.__number_of_workers = 1
+        else:
+            self.__number_of_workers = number_of_workers
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.join()
+        else:
+            self.stop()
+
+    def start(self):
+        for number in range(self.number_of_workers):
+            process = multiprocessing.Process(target=run_worker, name=f'Worker-{number}',
+                                              args=(self.backend_factory, self.scrapper_factory, self.result_handler,
+                                                    self.worker_options, self.crawl_options, self.statistics))
+            process.start()
+            self.processes.append(process)
+
+    # Returns (worker id, scraped urls, failed urls) of every worker that wasn't killed.
+    def join(self):
+        for process in self.processes:
+            process.join()
+
+        self.processes = []
+        statistics = []
+
+        while True:
+            try:
+                statistics.append(self.statistics.get(timeout=0.1))
+            except queue.Empty:
+                return statistics
+
+    # Urls claimed by stopped workers are scraped by others once their leases end.
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+
+        for process in self.processes:
+            process.join()
+
+        self.processes = []
@@ -1,9 +1,36 @@
+import asyncio
 import functools
-from inspect import signature
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import deque
+from inspect import signature, isawaitable, ismethod, iscoroutinefunction
 
+SYNC = 'sync'
+QUEUED = 'queued'
+ASYNCIO = 'asyncio'
+DELIVERIES = (SYNC, QUEUED, ASYNCIO)
 
-def connect(subject, event_signal, observer):
-    subject.add_event_observer(event_signal, observer)
+DROP = 'drop'
+BLOCK = 'block'
+COALESCE = 'coalesce'
+OVERFLOW_POLICIES = (DROP, BLOCK, COALESCE)
+
+
+# Weak observers don't keep their objects alive, they are disconnected when their objects are collected.
+# Queued and asyncio observers are called later by a dispatcher, so they never hold back the code that emits a signal.
+# Without a given dispatcher, queued observers share one dispatcher thread and asyncio observers share a dispatcher
+# of the event loop that is running when they are connected.
+def connect(subject, event_signal, observer, weak=False, delivery=SYNC, dispatcher=None):
+    if delivery not in DELIVERIES:
+        raise UnknownDelivery(f'Delivery "{delivery}" is not one of: {", ".join(DELIVERIES)}')
+
+    if dispatcher is None and delivery == QUEUED:
+        dispatcher = QueuedDispatcher.default()
+    elif dispatcher is None and delivery == ASYNCIO:
+        dispatcher = AsyncioDispatcher.default()
+
+    subject.add_event_observer(event_signal, observer, weak, dispatcher)
 
 
 def disconnect(subject, event_signal, observer):
@@ -13,90 +40,415 @@ def disconnect(subject, event_signal, observer):
 def signal(event_signal):
     @functools.wraps(event_signal)
     def wrapper(*args, **kwargs):
-        subject = args[0]
-        signal_args = args[1:]
-        event_signal_method = subject.__getattribute__(event_signal.__name__)
+        # Events are found by signal name, so the function itself can be passed instead of a bound method.
+        args[0].notify(event_signal, args[1:], kwargs)
+
+    return wrapper
 
-        subject.notify(event_signal_method, signal_args, kwargs)
+
+def async_signal(event_signal):
+    @functools.wraps(event_signal)
+    async def wrapper(*args, **kwargs):
+        await args[0].async_notify(event_signal, args[1:], kwargs)
 
     return wrapper
 
 
 class Subject:
+    # Events are kept by signal name, so notifying doesn't depend on how many signals are connected.
+    # Observers are kept in tuples that are replaced, never changed, so notify doesn't need a lock.
 
     def __init__(self):
-        self.events = []
+        self.events = {}
+        self.events_lock = threading.Lock()
 
     def remove_event(self, event_signal):
-        self.events[:] = [event for event in self.events if not event.signal == event_signal]
-
-    def add_event_observer(self, event_signal, observer):
-        event_exists = self.append_observer_to_event(event_signal, observer)
-
-        if not event_exists:
-            self.add_new_event(event_signal, observer)
+        with self.events_lock:
+            self.events.pop(event_signal.__name__, None)
 
-    def append_observer_to_event(self, event_signal, observer):
-        for event in self.events:
-            if event.signal == event_signal:
-                event.add_observer(observer)
-                return True
+    def add_event_observer(self, event_signal, observer, weak=False, dispatcher=None):
+        with self.events_lock:
+            event = self.events.get(event_signal.__name__)
 
-        return False
+            if event is None:
+                event = Event(event_signal)
+                self.events[event_signal.__name__] = event
 
-    def add_new_event(self, event_signal, observer):
-        event = Event(event_signal)
-        event.add_observer(observer)
-        self.events.append(event)
+            event.add_observer(observer, weak, dispatcher)
 
     def remove_event_observer(self, event_signal, observer):
-        for event in self.events:
-            if event.signal == event_signal:
+        with self.events_lock:
+            event = self.events.get(event_signal.__name__)
+
+            if event is not None:
                 event.remove_observer(observer)
-                break
 
     def notify(self, event_signal, signal_args, signal_kwargs):
-        self.clean_events()
+        event = self.events.get(event_signal.__name__)
+
+        if event is not None:
+            event.execute(signal_args, signal_kwargs)
 
-        for event in self.events:
-            if event.signal == event_signal:
-                event.clean_observers()
-                event.execute(signal_args, signal_kwargs)
+    async def async_notify(self, event_signal, signal_args, signal_kwargs):
+        event = self.events.get(event_signal.__name__)
 
-    def clean_events(self):
-        self.events[:] = [event for event in self.events if event.signal is not None]
+        if event is not None:
+            await event.async_execute(signal_args, signal_kwargs)
 
 
 class Event:
 
     def __init__(self, event_signal=None):
+        self.lock = threading.Lock()
         self.signal = event_signal
-        self.observers = []
+        self.observers = ()
+        self.dead_observers = False
 
-    def add_observer(self, observer):
-        if observer in self.observers:
-            raise DuplicateObserver(f'Duplicate observer "{observer.__name__}" of signal "{self.signal.__name__}"')
-        else:
-            self.observers.append(observer)
+    # Coroutines of observers are awaited only by async signals and by asyncio dispatchers, otherwise
+    # they would be created and never run.
+    def add_observer(self, observer, weak=False, dispatcher=None):
+        if iscoroutinefunction(observer) and not self.awaits_observers(dispatcher):
+            raise AsyncObserverNotAwaited(f'Observer "{observer.__name__}" of signal "{self.signal.__name__}" needs '
+                                          f'an async signal or asyncio delivery')
+
+        with self.lock:
+            self.clean_observers()
+
+            if any(call_plan.observer == observer for call_plan in self.observers):
+                raise DuplicateObserver(f'Duplicate observer "{observer.__name__}" of signal "{self.signal.__name__}"')
+            else:
+                self.observers = self.observers + (CallPlan(observer, weak, self.observer_died, dispatcher),)
 
     def remove_observer(self, observer):
-        self.observers.remove(observer)
+        with self.lock:
+            self.clean_observers()
+
+            for index, call_plan in enumerate(self.observers):
+                if call_plan.observer == observer:
+                    self.observers = self.observers[:index] + self.observers[index + 1:]
+                    return
+
+        raise ValueError(f'Observer "{observer.__name__}" is not connected to signal "{self.signal.__name__}"')
+
+    def awaits_observers(self, dispatcher):
+        if dispatcher is not None:
+            return dispatcher.awaits_observers
+
+        return iscoroutinefunction(self.signal)
 
     def execute(self, signal_args, signal_kwargs):
-        for observer in self.observers:
-            observer_signature = signature(observer)
-            number_of_non_kw_parameters = len(observer_signature.parameters) - len(signal_kwargs)
+        if self.dead_observers:
+            with self.lock:
+                self.clean_observers()
+
+        for call_plan in self.observers:
+            call_plan(signal_args, signal_kwargs)
 
-            if number_of_non_kw_parameters < 0:
-                raise MoreKwargsThanAccepted(f'Observer: "{observer.__name__}')
+    async def async_execute(self, signal_args, signal_kwargs):
+        if self.dead_observers:
+            with self.lock:
+                self.clean_observers()
 
-            if len(signal_args) < number_of_non_kw_parameters:
-                raise TooMuchParametersInObserver(f'Observer: "{observer.__name__}')
+        for call_plan in self.observers:
+            result = call_plan(signal_args, signal_kwargs)
 
-            observer(*signal_args[0:number_of_non_kw_parameters], **signal_kwargs)
+            if isawaitable(result):
+                await result
+
+    # Weak reference callbacks can run in any thread in the middle of anything, even while the lock is held,
+    # so they only mark that there are dead observers and they are removed with the lock next time.
+    def observer_died(self):
+        self.dead_observers = True
 
     def clean_observers(self):
-        self.observers[:] = [observer for observer in self.observers if observer is not None]
+        self.dead_observers = False
+        self.observers = tuple(call_plan for call_plan in self.observers if call_plan.observer is not None)
+
+
+class CallPlan:
+    # Observer's signature is inspected once, when it is connected, instead of every time a signal is emitted.
+    # Observer takes as many of signal's positional arguments as it has parameters left after keyword arguments.
+
+    def __init__(self, observer, weak=False, death_callback=None, dispatcher=None):
+        self.name = getattr(observer, '__name__', repr(observer))
+        self.number_of_parameters = len(signature(observer).parameters)
+        self.dispatcher = dispatcher
+
+        if not weak:
+            self.reference = lambda: observer
+        else:
+            callback = None if death_callback is None else lambda reference: death_callback()
+            reference_type = weakref.WeakMethod if ismethod(observer) else weakref.ref
+            self.reference = reference_type(observer, callback)
+
+    @property
+    def observer(self):
+        return self.reference()
+
+    def __call__(self, signal_args, signal_kwargs):
+        if self.dispatcher is not None:
+            self.dispatcher.submit(self, signal_args, signal_kwargs)
+            return None
+
+        return self.invoke(signal_args, signal_kwargs)
+
+    def invoke(self, signal_args, signal_kwargs):
+        observer = self.reference()
+
+        if observer is None:
+            return None
+
+        number_of_non_kw_parameters = self.number_of_parameters - len(signal_kwargs)
+
+        if number_of_non_kw_parameters < 0:
+            raise MoreKwargsThanAccepted(f'Observer: "{self.name}')
+
+        if len(signal_args) < number_of_non_kw_parameters:
+            raise TooMuchParametersInObserver(f'Observer: "{self.name}')
+
+        if number_of_non_kw_parameters == len(signal_args):
+            return observer(*signal_args, **signal_kwargs)
+
+        return observer(*signal_args[0:number_of_non_kw_parameters], **signal_kwargs)
+
+
+class Dispatcher(ABC):
+    # Emissions wait in a bounded queue. When it is full, a new emission is dropped (drop), waits for a free place
+    # (block) or, with coalesce, every observer has at most one emission waiting - a new one replaces its arguments.
+    # The dispatcher can't wait for itself, so an emission that would block in the dispatching thread is dropped.
+    awaits_observers = False
+
+    def __init__(self, max_size=1024, overflow=DROP):
+        if overflow not in OVERFLOW_POLICIES:
+            raise UnknownOverflowPolicy(f'Overflow policy "{overflow}" is not one of: {", ".join(OVERFLOW_POLICIES)}')
+
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.pending = deque()
+        self.waiting_deliveries = {}
+        self.max_size = max_size
+        self.overflow = overflow
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.last_error = None
+
+    @property
+    def max_size(self):
+        return self.__max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        if max_size < 1:
+            self.__max_size = 1
+        else:
+            self.__max_size = max_size
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, call_plan, signal_args, signal_kwargs):
+        with self.lock:
+            self.submitted += 1
+
+            if self.overflow == COALESCE:
+                delivery = self.waiting_deliveries.get(call_plan)
+
+                if delivery is not None:
+                    delivery.signal_args = signal_args
+                    delivery.signal_kwargs = signal_kwargs
+                    self.coalesced += 1
+                    return
+
+            while len(self.pending) >= self.max_size:
+                if self.overflow != BLOCK or self.in_dispatching_thread():
+                    self.dropped += 1
+                    return
+
+                self.not_full.wait()
+
+            delivery = Delivery(call_plan, signal_args, signal_kwargs)
+            self.pending.append(delivery)
+
+            if self.overflow == COALESCE:
+                self.waiting_deliveries[call_plan] = delivery
+
+        self.wake()
+
+    def take(self):
+        with self.lock:
+            if not self.pending:
+                return None
+
+            delivery = self.pending.popleft()
+            self.waiting_deliveries.pop(delivery.call_plan, None)
+            self.not_full.notify()
+
+            return delivery
+
+    def delivered_one(self, error=None):
+        with self.lock:
+            if error is None:
+                self.delivered += 1
+            else:
+                self.failed += 1
+                self.last_error = error
+
+    def stats(self):
+        with self.lock:
+            return {'pending': len(self.pending), 'submitted': self.submitted, 'delivered': self.delivered,
+                    'dropped': self.dropped, 'coalesced': self.coalesced, 'failed': self.failed}
+
+    @abstractmethod
+    def wake(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def in_dispatching_thread(self):
+        raise NotImplementedError
+
+
+class QueuedDispatcher(Dispatcher):
+    # Observers are called one by one in a daemon thread that is started with the first emission.
+    default_dispatcher = None
+    default_lock = threading.Lock()
+
+    def __init__(self, max_size=1024, overflow=DROP):
+        super().__init__(max_size, overflow)
+        self.not_empty = threading.Condition(self.lock)
+        self.thread = None
+        self.stopped = False
+
+    @classmethod
+    def default(cls):
+        with cls.default_lock:
+            if cls.default_dispatcher is None:
+                cls.default_dispatcher = cls()
+
+            return cls.default_dispatcher
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None and not self.stopped:
+                self.thread = threading.Thread(target=self.run, name='QueuedDispatcher', daemon=True)
+                self.thread.start()
+
+            self.not_empty.notify()
+
+    def in_dispatching_thread(self):
+        return self.thread is threading.current_thread()
+
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopped:
+                    self.not_empty.wait()
+
+                if not self.pending:
+                    return
+
+            delivery = self.take()
+
+            try:
+                delivery.call_plan.invoke(delivery.signal_args, delivery.signal_kwargs)
+                self.delivered_one()
+            except Exception as e:
+                self.delivered_one(e)
+
+    # Emissions that are already queued are delivered before the thread ends. The dispatcher can be used again,
+    # a later emission starts a new thread.
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.not_empty.notify()
+            thread = self.thread
+
+        if thread is not None:
+            thread.join()
+
+        with self.lock:
+            if self.thread is thread:
+                self.thread = None
+                self.stopped = False
+            restart = bool(self.pending)
+
+        if restart:
+            self.wake()
+
+
+class AsyncioDispatcher(Dispatcher):
+    # Observers are called in a task on the event loop, coroutines are awaited. Emissions can come from any thread.
+    awaits_observers = True
+    default_dispatchers = weakref.WeakKeyDictionary()
+    default_lock = threading.Lock()
+
+    def __init__(self, loop=None, max_size=1024, overflow=DROP):
+        super().__init__(max_size, overflow)
+        self.loop = loop if loop is not None else running_loop()
+        self.task = None
+
+    @classmethod
+    def default(cls):
+        loop = running_loop()
+
+        with cls.default_lock:
+            dispatcher = cls.default_dispatchers.get(loop)
+
+            if dispatcher is None:
+                dispatcher = cls(loop)
+                cls.default_dispatchers[loop] = dispatcher
+
+            return dispatcher
+
+    def wake(self):
+        if self.in_dispatching_thread():
+            self.start_task()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.start_task)
+
+    def in_dispatching_thread(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def start_task(self):
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self.run())
+
+    async def run(self):
+        while True:
+            delivery = self.take()
+
+            if delivery is None:
+                return
+
+            try:
+                result = delivery.call_plan.invoke(delivery.signal_args, delivery.signal_kwargs)
+
+                if isawaitable(result):
+                    await result
+
+                self.delivered_one()
+            except Exception as e:
+                self.delivered_one(e)
+
+
+class Delivery:
+
+    def __init__(self, call_plan, signal_args, signal_kwargs):
+        self.call_plan = call_plan
+        self.signal_args = signal_args
+        self.signal_kwargs = signal_kwargs
+
+
+def running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        raise NoEventLoop('Asyncio delivery needs a running event loop or a dispatcher with a loop') from None
 
 
 class DuplicateObserver(Exception):
@@ -109,3 +461,19 @@ class TooMuchParametersInObserver(Exception):
 
 class MoreKwargsThanAccepted(Exception):
     pass
+
+
+class UnknownDelivery(Exception):
+    pass
+
+
+class UnknownOverflowPolicy(Exception):
+    pass
+
+
+class NoEventLoop(Exception):
+    pass
+
+
+class AsyncObserverNotAwaited(Exception):
+    pass
@@ -0,0 +1,212 @@
+import csv
+import ipaddress
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+
+SEMICOLON = 'semicolon'
+CSV = 'csv'
+JSON_LINES = 'jsonl'
+HOST_PORT = 'host:port'
+FORMATS = (SEMICOLON, CSV, JSON_LINES, HOST_PORT)
+EXTENSIONS = {'.csv': CSV, '.jsonl': JSON_LINES, '.ndjson': JSON_LINES}
+
+IPV4_PATTERN = re.compile(r'(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)')
+MIN_PORT = 0
+MAX_PORT = 65535
+
+
+# IPv4 addresses are checked with a precompiled pattern, everything else goes through ipaddress.
+def ip_valid(ip):
+    if IPV4_PATTERN.fullmatch(ip):
+        return True
+
+    try:
+        ipaddress.ip_address(ip)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_port(port):
+    try:
+        port = int(port)
+    except (TypeError, ValueError):
+        return None
+
+    return port if MIN_PORT <= port <= MAX_PORT else None
+
+
+class FileLoader(ABC):
+    # Files are read line by line and what was loaded from them is kept until their modification time or size
+    # changes, so loading an unchanged file again costs one stat call.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache = {}
+
+    def load(self, path):
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            cached = self.cache.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        with open(path, 'r', newline='') as loaded_file:
+            items = tuple(self.parse(loaded_file, path))
+
+        with self.lock:
+            self.cache[path] = (version, items)
+
+        return items
+
+    @abstractmethod
+    def parse(self, loaded_file, path):
+        raise NotImplementedError
+
+    def forget(self, path=None):
+        with self.lock:
+            if path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(path, None)
+
+
+class UserAgentLoader(FileLoader):
+    # One user agent per line, blank lines and repeated user agents are skipped.
+
+    def parse(self, loaded_file, path):
+        seen = set()
+
+        for line in loaded_file:
+            user_agent = line.strip()
+
+            if user_agent and user_agent not in seen:
+                seen.add(user_agent)
+                yield user_agent
+
+
+class ProxyLoader(FileLoader):
+    # Formats:
+    # - semicolon - protocol;ip;port (files/proxy.txt),
+    # - csv - protocol,ip,port with an optional header naming the columns,
+    # - jsonl - {"protocol": "https", "ip": "1.2.3.4", "port": 8080} on every line,
+    # - host:port - ip:port or protocol://ip:port, default_protocol is used when there is no protocol.
+    # Without a format it is told by the file extension or by the first line. Invalid and repeated proxies
+    # are skipped.
+
+    def __init__(self, make_proxy, proxy_format=None, protocols=('http', 'https'), default_protocol='http'):
+        if proxy_format is not None and proxy_format not in FORMATS:
+            raise UnknownFormat(f'Format "{proxy_format}" is not one of: {", ".join(FORMATS)}')
+
+        super().__init__()
+
+        self.make_proxy = make_proxy
+        self.proxy_format = proxy_format
+        self.protocols = frozenset(protocols)
+        self.default_protocol = default_protocol
+
+    def parse(self, loaded_file, path):
+        proxy_format = self.proxy_format or self.detect_format(loaded_file, path)
+        seen = set()
+
+        for protocol, ip, port in self.entries(loaded_file, proxy_format):
+            protocol = protocol.strip().lower()
+            ip = ip.strip()
+            port = parse_port(port)
+
+            if port is None or protocol not in self.protocols or (protocol, ip, port) in seen or not ip_valid(ip):
+                continue
+
+            seen.add((protocol, ip, port))
+            yield self.make_proxy(protocol, ip, port)
+
+    def detect_format(self, loaded_file, path):
+        proxy_format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if proxy_format is not None:
+            return proxy_format
+
+        position = loaded_file.tell()
+        first_line = ''
+
+        while not first_line:
+            line = loaded_file.readline()
+            if not line:
+                break
+            first_line = line.strip()
+
+        loaded_file.seek(position)
+
+        if first_line.startswith('{'):
+            return JSON_LINES
+        elif ';' in first_line:
+            return SEMICOLON
+        elif ',' in first_line:
+            return CSV
+
+        return HOST_PORT
+
+    def entries(self, loaded_file, proxy_format):
+        if proxy_format == CSV:
+            return self.csv_entries(loaded_file)
+        elif proxy_format == JSON_LINES:
+            return self.json_lines_entries(loaded_file)
+        elif proxy_format == HOST_PORT:
+            return self.host_port_entries(loaded_file)
+
+        return self.semicolon_entries(loaded_file)
+
+    def semicolon_entries(self, loaded_file):
+        for line in loaded_file:
+            proxy_data = line.rstrip('\r\n').split(';')
+
+            if len(proxy_data) >= 3:
+                yield proxy_data[0], proxy_data[1], proxy_data[2]
+
+    def csv_entries(self, loaded_file):
+        columns = (0, 1, 2)
+        row_length = 3
+
+        for row in csv.reader(loaded_file):
+            names = [value.strip().lower() for value in row]
+            if 'ip' in names and 'port' in names:
+                columns = (names.index('protocol') if 'protocol' in names else None, names.index('ip'),
+                           names.index('port'))
+                row_length = max(column for column in columns if column is not None) + 1
+                continue
+
+            if len(row) < row_length:
+                continue
+
+            protocol = row[columns[0]] if columns[0] is not None else self.default_protocol
+            yield protocol, row[columns[1]], row[columns[2]]
+
+    def json_lines_entries(self, loaded_file):
+        for line in loaded_file:
+            try:
+                proxy_data = json.loads(line)
+            except ValueError:
+                continue
+
+            if isinstance(proxy_data, dict):
+                yield str(proxy_data.get('protocol', self.default_protocol)), \
+                      str(proxy_data.get('ip', proxy_data.get('host', ''))), proxy_data.get('port')
+
+    def host_port_entries(self, loaded_file):
+        for line in loaded_file:
+            line = line.strip()
+            protocol, separator, address = line.partition('://')
+
+            if not separator:
+                protocol, address = self.default_protocol, line
+
+            ip, _, port = address.rstrip('/').rpartition(':')
+            yield protocol, ip.strip('[]'), port
+
+
+class UnknownFormat(Exception):
+    pass
@@ -0,0 +1,226 @@
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+from concurrent import futures
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import parsing
+import scraping
+
+PENDING = 0
+IN_PROGRESS = 1
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    path = parts.path or '/'
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+# 8 bytes of blake2b are enough to tell apart billions of urls with a negligible chance of a collision,
+# a seen url costs 8 bytes of a key instead of a whole url.
+def fingerprint(url):
+    return hashlib.blake2b(canonical_url(url).encode(), digest_size=8).digest()
+
+
+def extract_links(url, source):
+    if isinstance(source, (bytes, str)):
+        return []
+
+    links = []
+
+    for anchor in source.find_all('a', href=True):
+        link = urljoin(url, anchor['href'])
+
+        if urlsplit(link).scheme in ('http', 'https'):
+            links.append(link)
+
+    return links
+
+
+class Frontier:
+    PATH = r'files/frontier.sqlite'
+
+    def __init__(self, path=PATH, max_depth=None, link_extractors=(extract_links,)):
+        self.lock = threading.Lock()
+        self.path = path
+        self.max_depth = max_depth
+        self.link_extractors = list(link_extractors)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.create_tables()
+        self.resume()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+    def __contains__(self, url):
+        with self.lock:
+            return self.connection.execute('SELECT 1 FROM seen WHERE fingerprint = ?',
+                                           (fingerprint(url),)).fetchone() is not None
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def create_tables(self):
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen (fingerprint BLOB PRIMARY KEY) WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY, url TEXT NOT NULL, '
+                                'priority INTEGER NOT NULL, depth INTEGER NOT NULL, '
+                                'attempts INTEGER NOT NULL DEFAULT 0, state INTEGER NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS queue_order ON queue (state, priority DESC, id)')
+
+    # Urls that were being scraped when the process stopped are queued again.
+    def resume(self):
+        with self.lock:
+            self.connection.execute('UPDATE queue SET state = ? WHERE state = ?', (PENDING, IN_PROGRESS))
+
+    def add(self, url, priority=0, depth=0):
+        return self.add_many([url], priority, depth) == 1
+
+    # Returns the number of urls that weren't seen before. All urls are added in one transaction.
+    def add_many(self, urls, priority=0, depth=0):
+        if self.max_depth is not None and depth > self.max_depth:
+            return 0
+
+        added = 0
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+
+                for url in urls:
+                    if isinstance(url, tuple):
+                        url, url_priority = url
+                    else:
+                        url_priority = priority
+
+                    cursor = self.connection.execute('INSERT OR IGNORE INTO seen VALUES (?)', (fingerprint(url),))
+
+                    if cursor.rowcount == 1:
+                        self.connection.execute('INSERT INTO queue (url, priority, depth, state) VALUES (?, ?, ?, ?)',
+                                                (url, url_priority, depth, PENDING))
+                        added += 1
+
+        return added
+
+    # Urls with higher priority are taken first, urls with the same priority in order they were added.
+    def pop(self):
+        items = self.pop_many(1)
+        return items[0] if items else None
+
+    def pop_many(self, count):
+        if count <= 0:
+            return []
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                rows = self.connection.execute('SELECT id, url, priority, depth, attempts FROM queue WHERE state = ? '
+                                               'ORDER BY priority DESC, id LIMIT ?', (PENDING, count)).fetchall()
+                self.connection.executemany('UPDATE queue SET state = ? WHERE id = ?',
+                                            [(IN_PROGRESS, row[0]) for row in rows])
+
+        return [FrontierItem(*row) for row in rows]
+
+    def done(self, item):
+        with self.lock:
+            self.connection.execute('DELETE FROM queue WHERE id = ?', (item.id,))
+
+    def retry(self, item, priority=None, attempts=None):
+        with self.lock:
+            self.connection.execute('UPDATE queue SET state = ?, priority = ?, attempts = ? WHERE id = ?',
+                                    (PENDING, item.priority if priority is None else priority,
+                                     item.attempts if attempts is None else attempts, item.id))
+
+    def add_link_extractor(self, link_extractor):
+        self.link_extractors.append(link_extractor)
+
+    def remove_link_extractor(self, link_extractor):
+        self.link_extractors.remove(link_extractor)
+
+    # Link extractors take an url and its parsed page and return urls or (url, priority) tuples.
+    def extract_links(self, item, source):
+        links = itertools.chain.from_iterable(link_extractor(item.url, source)
+                                              for link_extractor in self.link_extractors)
+        return self.add_many(links, item.priority, item.depth + 1)
+
+    # Feeds a scrapper with queued urls and queues links found on scraped pages. Yields (url, source, exception)
+    # tuples like scrape_many. Up to max_workers * 2 urls are in flight and the queue is topped up after every
+    # scraped page, so links are scraped as soon as they are found, while other pages are still being scraped.
+    # A failed url is queued again with a lower priority until it was tried max_attempts times. Urls that were
+    # in flight when the generator was closed stay queued.
+    def crawl(self, scrapper, max_workers=1, parser=parsing.HTML_PARSER, lazy=False, max_attempts=1):
+        in_flight = {}
+
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while True:
+                    for item in self.pop_many(max_workers * 2 - len(in_flight)):
+                        in_flight[executor.submit(scrapper.scrape, item.url, parser, lazy)] = item
+
+                    if not in_flight:
+                        return
+
+                    done, _ = futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+
+                    for future in done:
+                        item = in_flight[future]
+
+                        try:
+                            source, exception = future.result(), None
+                        except scraping.ScrapingException as e:
+                            source, exception = None, e
+
+                        del in_flight[future]
+
+                        if exception is None:
+                            self.extract_links(item, source)
+                            self.done(item)
+                        elif item.attempts + 1 < max_attempts:
+                            self.retry(item, item.priority - 1, item.attempts + 1)
+                        else:
+                            self.done(item)
+
+                        yield item.url, source, exception
+            finally:
+                for future, item in in_flight.items():
+                    future.cancel()
+                    self.retry(item)
+
+    def pending_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM queue WHERE state = ?', (PENDING,)).fetchone()[0]
+
+    def seen_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+
+class FrontierItem:
+
+    def __init__(self, id, url, priority, depth, attempts=0):
+        self.id = id
+        self.url = url
+        self.priority = priority
+        self.depth = depth
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f'{self.url} (priority: {self.priority}, depth: {self.depth})'
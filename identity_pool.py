@@ -0,0 +1,146 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdentityPool:
+    # Sticky identities: a proxy and a user agent kept for a key (protocol and host) for max_requests requests
+    # or max_age seconds, whichever comes first. Scrappers keep a session for every identity, so its connections
+    # and cookies live as long as the identity. At most max_identities are kept, identities are kept in least
+    # recently used order, so both surplus and used up ones are at the front of the dictionary. Identities are
+    # checked out by acquire and lease until they are released, an identity that was retired meanwhile is
+    # returned for closing by its last release.
+
+    def __init__(self, max_requests=20, max_age=300.0, max_identities=1024):
+        self.lock = threading.Lock()
+        self.identities = OrderedDict()
+        self.ids = itertools.count(1)
+        self.max_requests = max_requests
+        self.max_age = max_age
+        self.max_identities = max_identities
+
+    @property
+    def max_requests(self):
+        return self.__max_requests
+
+    @max_requests.setter
+    def max_requests(self, max_requests):
+        if max_requests < 1:
+            self.__max_requests = 1
+        else:
+            self.__max_requests = max_requests
+
+    @property
+    def max_age(self):
+        return self.__max_age
+
+    @max_age.setter
+    def max_age(self, max_age):
+        if max_age <= 0.0:
+            self.__max_age = 0.0
+        else:
+            self.__max_age = max_age
+
+    @property
+    def max_identities(self):
+        return self.__max_identities
+
+    @max_identities.setter
+    def max_identities(self, max_identities):
+        if max_identities < 1:
+            self.__max_identities = 1
+        else:
+            self.__max_identities = max_identities
+
+    def __len__(self):
+        return len(self.identities)
+
+    # Returns the identity of the key with one more request counted, or None when there is none or it is used up.
+    def acquire(self, key):
+        with self.lock:
+            identity = self.identities.get(key)
+
+            if identity is None or self.used_up(identity, time.monotonic()):
+                return None
+
+            identity.requests += 1
+            identity.users += 1
+            self.identities.move_to_end(key)
+            return identity
+
+    # The new identity takes place of the one of the key. Returns it and the retired identities that nobody
+    # uses: the replaced one and the ones evicted to make room for it.
+    def lease(self, key, proxy, user_agent):
+        with self.lock:
+            now = time.monotonic()
+            identity = Identity(next(self.ids), key, proxy, user_agent, now)
+            retired_identities = []
+
+            previous_identity = self.identities.pop(key, None)
+            if previous_identity is not None:
+                retired_identities.append(previous_identity)
+
+            retired_identities += self.evict_identities(now)
+            self.identities[key] = identity
+
+            return identity, self.retire(retired_identities)
+
+    # Returns True when the identity was retired and this was its last user, so it can be closed.
+    def release(self, identity):
+        with self.lock:
+            identity.users -= 1
+
+            return identity.retired and identity.users == 0
+
+    def clear(self):
+        with self.lock:
+            identities = list(self.identities.values())
+            self.identities.clear()
+
+            return self.retire(identities)
+
+    @staticmethod
+    def retire(identities):
+        for identity in identities:
+            identity.retired = True
+
+        return [identity for identity in identities if identity.users == 0]
+
+    def evict_identities(self, now):
+        evicted_identities = []
+
+        while self.identities:
+            key, identity = next(iter(self.identities.items()))
+
+            if len(self.identities) < self.max_identities and not self.used_up(identity, now):
+                break
+
+            del self.identities[key]
+            evicted_identities.append(identity)
+
+        return evicted_identities
+
+    def used_up(self, identity, now):
+        return identity.requests >= self.max_requests or now - identity.created_time >= self.max_age
+
+
+class Identity:
+    __slots__ = ('id', 'key', 'proxy', 'user_agent', 'created_time', 'requests', 'users', 'retired')
+
+    def __init__(self, id, key, proxy, user_agent, created_time):
+        self.id = id
+        self.key = key
+        self.proxy = proxy
+        self.user_agent = user_agent
+        self.created_time = created_time
+        self.requests = 1
+        self.users = 1
+        self.retired = False
+
+    @property
+    def protocol(self):
+        return self.key[0]
+
+    def __repr__(self):
+        return f'{self.key[1]} #{self.id} ({self.proxy}, requests: {self.requests})'
@@ -0,0 +1,202 @@
+import bisect
+import math
+import threading
+import time
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20)
+
+
+class Metrics:
+    # Counters and histograms are kept by name and labels. Histograms whose name ends with _seconds
+    # get seconds buckets, the other ones get count buckets, unless buckets are given for a name.
+
+    def __init__(self, buckets=None):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.buckets = dict(buckets or {})
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, labels_key(labels))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, labels_key(labels))
+
+        with self.lock:
+            histogram = self.histograms.get(key)
+
+            if histogram is None:
+                histogram = Histogram(self.buckets.get(name, default_buckets(name)))
+                self.histograms[key] = histogram
+
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, labels_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        with self.lock:
+            histogram = self.histograms.get((name, labels_key(labels)))
+            return None if histogram is None else histogram.copy()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self.lock:
+            counters = {}
+            histograms = {}
+
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[format_labels(labels)] = value
+
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                histograms.setdefault(name, {})[format_labels(labels)] = histogram.snapshot()
+
+            return {'counters': counters, 'histograms': histograms}
+
+    # Text exposition format of Prometheus, see https://prometheus.io/docs/instrumenting/exposition_formats/
+    def prometheus(self, prefix='scrapper'):
+        lines = []
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+            for index, ((name, labels), value) in enumerate(counters):
+                metric_name = f'{prefix}_{name}'
+
+                if index == 0 or counters[index - 1][0][0] != name:
+                    lines.append(f'# TYPE {metric_name} counter')
+
+                lines.append(f'{metric_name}{prometheus_labels(labels)} {value}')
+
+            for index, ((name, labels), histogram) in enumerate(histograms):
+                metric_name = f'{prefix}_{name}'
+
+                if index == 0 or histograms[index - 1][0][0] != name:
+                    lines.append(f'# TYPE {metric_name} histogram')
+
+                cumulative_count = 0
+                for upper_bound, count in zip(histogram.upper_bounds, histogram.counts):
+                    cumulative_count += count
+                    bucket_labels = labels + (('le', format_number(upper_bound)),)
+                    lines.append(f'{metric_name}_bucket{prometheus_labels(bucket_labels)} {cumulative_count}')
+
+                bucket_labels = labels + (('le', '+Inf'),)
+                lines.append(f'{metric_name}_bucket{prometheus_labels(bucket_labels)} {histogram.count}')
+                lines.append(f'{metric_name}_sum{prometheus_labels(labels)} {format_number(histogram.sum)}')
+                lines.append(f'{metric_name}_count{prometheus_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class Histogram:
+    # The last count is for values above the highest bucket.
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = tuple(upper_bounds)
+        self.counts = [0] * (len(self.upper_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    # Quantiles are estimated by linear interpolation inside the bucket they fall into.
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        cumulative_count = 0
+
+        for index, count in enumerate(self.counts):
+            if count and cumulative_count + count >= rank:
+                lower_bound = self.upper_bounds[index - 1] if index > 0 else 0.0
+                upper_bound = self.upper_bounds[index] if index < len(self.upper_bounds) else self.max
+
+                return lower_bound + (upper_bound - lower_bound) * (rank - cumulative_count) / count
+
+            cumulative_count += count
+
+        return self.max
+
+    def copy(self):
+        histogram = Histogram(self.upper_bounds)
+        histogram.counts = self.counts[:]
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.max = self.max
+
+        return histogram
+
+    def snapshot(self):
+        buckets = {format_number(upper_bound): count for upper_bound, count in zip(self.upper_bounds, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+                'max': self.max, 'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': buckets}
+
+
+class Timer:
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.name, time.monotonic() - self.start_time, **self.labels)
+
+
+def default_buckets(name):
+    return SECONDS_BUCKETS if name.endswith('_seconds') else COUNT_BUCKETS
+
+
+def labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(labels):
+    return ','.join(f'{name}={value}' for name, value in labels)
+
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def escape_label_value(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_number(number):
+    if math.isinf(number):
+        return '+Inf' if number > 0 else '-Inf'
+
+    return repr(float(number))
@@ -0,0 +1,220 @@
+import datetime
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def host(url):
+    return urlsplit(url).netloc.lower()
+
+
+class HostRateLimiter:
+    # Hosts whose delay has already elapsed are forgotten every CLEANUP_INTERVAL reservations,
+    # a new entry for such host wouldn't make anyone wait anyway.
+    CLEANUP_INTERVAL = 1024
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.reservations = 0
+
+    # next_delay is the gap that requests reserved after this one have to keep, so a burst of concurrent
+    # requests is spaced out before any of them is finished.
+    def reserve(self, host_name, next_delay):
+        with self.lock:
+            now = time.monotonic()
+            tick = self.hosts.get(host_name)
+
+            if tick is None:
+                tick = HostTick(now)
+                self.hosts[host_name] = tick
+
+            remaining_delay = max(tick.previous_tick_time + tick.next_delay - now, 0.0)
+            tick.previous_tick_time = now + remaining_delay
+            tick.next_delay = next_delay
+
+            self.reservations += 1
+            if self.reservations % HostRateLimiter.CLEANUP_INTERVAL == 0:
+                self.evict_idle_hosts(now)
+
+            return remaining_delay
+
+    def update(self, host_name, next_delay):
+        with self.lock:
+            now = time.monotonic()
+            tick = self.hosts.get(host_name)
+
+            if tick is None:
+                tick = HostTick(now)
+                self.hosts[host_name] = tick
+
+            tick.previous_tick_time = max(tick.previous_tick_time, now)
+            tick.next_delay = next_delay
+
+    def evict_idle_hosts(self, now):
+        self.hosts = {host_name: tick for host_name, tick in self.hosts.items()
+                      if tick.previous_tick_time + tick.next_delay > now}
+
+
+class HostTick:
+
+    def __init__(self, previous_tick_time, next_delay=0.0):
+        self.previous_tick_time = previous_tick_time
+        self.next_delay = next_delay
+
+
+class AdaptiveDelay:
+    # AIMD delay per host: every fast, clean response takes decrease_step off the delay, every error
+    # or 429/503 response multiplies it by increase_factor. A response slower than slow_latency_factor
+    # times the usual latency of the host leaves the delay as it is. Retry-After is kept as a lower bound
+    # of the delay until it passes. Hosts that weren't used for idle_time seconds are forgotten every
+    # CLEANUP_INTERVAL calls, like in HostRateLimiter, they start from initial_delay when they come back.
+    CLEANUP_INTERVAL = 1024
+    BACKOFF_ERRORS = ('connect_timeout', 'read_timeout', 'connection_error', 'chunked_encoding_error')
+    BACKOFF_STATUS_CODES = (429, 503)
+
+    def __init__(self, min_delay=0.05, max_delay=60.0, initial_delay=0.5, decrease_step=0.02, increase_factor=2.0,
+                 slow_latency_factor=2.0, latency_smoothing=0.2, max_retry_after=600.0, idle_time=600.0):
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.calls = 0
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.decrease_step = decrease_step
+        self.increase_factor = increase_factor
+        self.slow_latency_factor = slow_latency_factor
+        self.latency_smoothing = latency_smoothing
+        self.max_retry_after = max_retry_after
+        self.idle_time = idle_time
+
+    @property
+    def min_delay(self):
+        return self.__min_delay
+
+    @min_delay.setter
+    def min_delay(self, min_delay):
+        if min_delay < 0.0:
+            self.__min_delay = 0.0
+        else:
+            self.__min_delay = min_delay
+
+    @property
+    def max_delay(self):
+        return self.__max_delay
+
+    @max_delay.setter
+    def max_delay(self, max_delay):
+        if max_delay < self.min_delay:
+            self.__max_delay = self.min_delay
+        else:
+            self.__max_delay = max_delay
+
+    @property
+    def increase_factor(self):
+        return self.__increase_factor
+
+    @increase_factor.setter
+    def increase_factor(self, increase_factor):
+        if increase_factor < 1.0:
+            self.__increase_factor = 1.0
+        else:
+            self.__increase_factor = increase_factor
+
+    def host_delay(self, host_name):
+        now = time.monotonic()
+        host_delay = self.hosts.get(host_name)
+
+        if host_delay is None:
+            host_delay = HostDelay(min(max(self.initial_delay, self.min_delay), self.max_delay))
+            self.hosts[host_name] = host_delay
+
+        host_delay.last_used_time = now
+
+        self.calls += 1
+        if self.calls % AdaptiveDelay.CLEANUP_INTERVAL == 0:
+            self.evict_idle_hosts(now)
+
+        return host_delay
+
+    def evict_idle_hosts(self, now):
+        self.hosts = {host_name: host_delay for host_name, host_delay in self.hosts.items()
+                      if now - host_delay.last_used_time < self.idle_time or host_delay.retry_after_time > now}
+
+    def delay(self, host_name):
+        with self.lock:
+            host_delay = self.host_delay(host_name)
+            return max(host_delay.delay, host_delay.retry_after_time - time.monotonic())
+
+    def current_delays(self):
+        with self.lock:
+            return {host_name: host_delay.delay for host_name, host_delay in self.hosts.items()}
+
+    # Both report methods return the new delay if it changed, None otherwise.
+    def report_response(self, host_name, status_code, latency, retry_after=None):
+        with self.lock:
+            host_delay = self.host_delay(host_name)
+            previous_delay = host_delay.delay
+
+            if retry_after is not None:
+                host_delay.retry_after_time = time.monotonic() + min(retry_after, self.max_retry_after)
+
+            if status_code in AdaptiveDelay.BACKOFF_STATUS_CODES:
+                self.back_off(host_delay)
+            else:
+                slow = host_delay.latency is not None and latency > self.slow_latency_factor * host_delay.latency
+
+                if host_delay.latency is None:
+                    host_delay.latency = latency
+                else:
+                    host_delay.latency += self.latency_smoothing * (latency - host_delay.latency)
+
+                if not slow:
+                    host_delay.delay = max(host_delay.delay - self.decrease_step, self.min_delay)
+
+            return None if host_delay.delay == previous_delay else host_delay.delay
+
+    def report_error(self, host_name, error):
+        if error not in AdaptiveDelay.BACKOFF_ERRORS:
+            return None
+
+        with self.lock:
+            host_delay = self.host_delay(host_name)
+            previous_delay = host_delay.delay
+            self.back_off(host_delay)
+
+            return None if host_delay.delay == previous_delay else host_delay.delay
+
+    def back_off(self, host_delay):
+        host_delay.delay = min(max(host_delay.delay, self.min_delay, self.decrease_step) * self.increase_factor,
+                               self.max_delay)
+
+
+class HostDelay:
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.latency = None
+        self.retry_after_time = 0.0
+        self.last_used_time = 0.0
+
+
+# Retry-After is either a number of seconds or an HTTP date.
+def retry_after(value):
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=datetime.timezone.utc)
+
+    return max((retry_time - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
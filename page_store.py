@@ -0,0 +1,296 @@
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NONE = 'none'
+GZIP = 'gzip'
+ZSTD = 'zstd'
+COMPRESSIONS = (NONE, GZIP, ZSTD)
+
+# Record: magic, compression, status code, url length, headers length, body length, time of storing,
+# then url, headers as JSON list of [name, value] pairs (repeated headers like Set-Cookie are all kept) and body.
+RECORD_HEADER = struct.Struct('<4sBHIIQd')
+RECORD_MAGIC = b'PGS1'
+# Index entry: url hash, segment number, record offset, record length.
+INDEX_ENTRY = struct.Struct('<8sIQI')
+
+
+def url_hash(url):
+    return hashlib.blake2b(url.encode(), digest_size=8).digest()
+
+
+class PageStore:
+    # Append-only store of raw responses. Records are appended to segment files and an offset index
+    # keyed by url hash points at the latest record of every url. Index entries are written after records
+    # and flushed when a segment is full, records that made it to a segment but not to the index are indexed again
+    # when the store is opened.
+    # Reads go through mmap, an uncompressed body is a memoryview of the segment, not a copy.
+    DIRECTORY = r'files/pages/'
+    SEGMENT_EXTENSION = '.pages'
+    INDEX_FILE = 'index'
+
+    def __init__(self, directory=DIRECTORY, compression=GZIP, max_segment_size=256 * 1024 * 1024):
+        if compression not in COMPRESSIONS:
+            raise UnknownCompression(f'Compression "{compression}" is not one of: {", ".join(COMPRESSIONS)}')
+        if compression == ZSTD and zstandard is None:
+            raise CompressionUnavailable('zstd compression needs zstandard package')
+
+        self.lock = threading.RLock()
+        self.directory = directory
+        self.compression = compression
+        self.max_segment_size = max_segment_size
+        self.index = {}
+        self.segments = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment_numbers = sorted(int(name[:-len(PageStore.SEGMENT_EXTENSION)])
+                                      for name in os.listdir(self.directory)
+                                      if name.endswith(PageStore.SEGMENT_EXTENSION))
+        if not self.segment_numbers:
+            self.segment_numbers.append(1)
+
+        self.load_index()
+        self.index_file = open(os.path.join(self.directory, PageStore.INDEX_FILE), 'ab')
+        self.recover()
+        self.segment_file = open(self.segment_path(self.segment_numbers[-1]), 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def __iter__(self):
+        return self.iterate()
+
+    def segment_path(self, segment_number):
+        return os.path.join(self.directory, f'{segment_number:06d}{PageStore.SEGMENT_EXTENSION}')
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.directory, PageStore.INDEX_FILE), 'rb') as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            return
+
+        usable_size = len(data) - len(data) % INDEX_ENTRY.size
+
+        for hash_value, segment_number, offset, length in INDEX_ENTRY.iter_unpack(data[:usable_size]):
+            self.index[hash_value] = (segment_number, offset, length)
+
+    # Records of every segment that are behind its last indexed one are indexed again, a record cut off by a crash
+    # is truncated. Records are appended, so a record found again replaces an index entry only when it comes later.
+    def recover(self):
+        indexed_ends = {}
+
+        for segment_number, offset, length in self.index.values():
+            indexed_ends[segment_number] = max(indexed_ends.get(segment_number, 0), offset + length)
+
+        for segment_number in self.segment_numbers:
+            self.recover_segment(segment_number, indexed_ends.get(segment_number, 0))
+
+        self.index_file.flush()
+
+    def recover_segment(self, segment_number, offset):
+        path = self.segment_path(segment_number)
+
+        if not os.path.exists(path) or os.path.getsize(path) <= offset:
+            return
+
+        with open(path, 'r+b') as segment_file:
+            segment_size = os.fstat(segment_file.fileno()).st_size
+            segment_file.seek(offset)
+
+            while offset + RECORD_HEADER.size <= segment_size:
+                record_header = RECORD_HEADER.unpack(segment_file.read(RECORD_HEADER.size))
+                magic, _, _, url_length, headers_length, body_length, _ = record_header
+                length = RECORD_HEADER.size + url_length + headers_length + body_length
+
+                if magic != RECORD_MAGIC or offset + length > segment_size:
+                    break
+
+                url = segment_file.read(url_length).decode()
+                segment_file.seek(headers_length + body_length, os.SEEK_CUR)
+                location = self.index.get(url_hash(url))
+
+                if location is None or location[:2] < (segment_number, offset):
+                    self.add_to_index(url, segment_number, offset, length)
+
+                offset += length
+
+            if offset < segment_size:
+                segment_file.truncate(offset)
+
+    def add_to_index(self, url, segment_number, offset, length):
+        hash_value = url_hash(url)
+        self.index[hash_value] = (segment_number, offset, length)
+        self.index_file.write(INDEX_ENTRY.pack(hash_value, segment_number, offset, length))
+
+    def put(self, url, status_code, headers, content):
+        record = self.make_record(url, status_code, headers, content)
+
+        with self.lock:
+            offset = self.segment_file.tell()
+
+            if offset > 0 and offset + len(record) > self.max_segment_size:
+                self.index_file.flush()
+                self.segment_file.close()
+                self.segment_numbers.append(self.segment_numbers[-1] + 1)
+                self.segment_file = open(self.segment_path(self.segment_numbers[-1]), 'ab')
+                offset = 0
+
+            self.segment_file.write(record)
+            self.segment_file.flush()
+            self.add_to_index(url, self.segment_numbers[-1], offset, len(record))
+
+    def make_record(self, url, status_code, headers, content):
+        url_bytes = url.encode()
+        headers_bytes = json.dumps(list(headers.items())).encode()
+        body = self.compress(bytes(content))
+        record_header = RECORD_HEADER.pack(RECORD_MAGIC, COMPRESSIONS.index(self.compression), status_code,
+                                           len(url_bytes), len(headers_bytes), len(body), time.time())
+
+        return b''.join((record_header, url_bytes, headers_bytes, body))
+
+    def compress(self, content):
+        if self.compression == GZIP:
+            return gzip.compress(content, compresslevel=6)
+        elif self.compression == ZSTD:
+            return zstandard.ZstdCompressor().compress(content)
+
+        return content
+
+    def get(self, url):
+        with self.lock:
+            location = self.index.get(url_hash(url))
+
+            if location is None:
+                return None
+
+            page = self.read(*location)
+
+        return page if page.url == url else None
+
+    def read(self, segment_number, offset, length):
+        segment = self.segment(segment_number, offset + length)
+        magic, compression, status_code, url_length, headers_length, body_length, stored_at = \
+            RECORD_HEADER.unpack_from(segment, offset)
+
+        if magic != RECORD_MAGIC:
+            raise CorruptedRecord(f'Segment {segment_number}, offset {offset}')
+
+        url_offset = offset + RECORD_HEADER.size
+        headers_offset = url_offset + url_length
+        body_offset = headers_offset + headers_length
+        view = memoryview(segment)
+
+        url = str(view[url_offset:headers_offset], 'utf-8')
+        headers = stored_headers(json.loads(str(view[headers_offset:body_offset], 'utf-8')))
+        content = decompress(COMPRESSIONS[compression], view[body_offset:body_offset + body_length])
+
+        return StoredPage(url, status_code, headers, content, stored_at)
+
+    # Segments are mapped once, the last one is mapped again when it grew past the mapped part.
+    def segment(self, segment_number, end):
+        with self.lock:
+            segment = self.segments.get(segment_number)
+
+            if segment is None or len(segment) < end:
+                with open(self.segment_path(segment_number), 'rb') as segment_file:
+                    segment = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+                self.segments[segment_number] = segment
+
+            return segment
+
+    # Pages are read in order they were stored, also the ones that were stored again later. Nothing is fetched,
+    # so a crawl can be processed again offline.
+    def iterate(self, since=None, until=None):
+        with self.lock:
+            self.segment_file.flush()
+            segment_numbers = list(self.segment_numbers)
+
+        for segment_number in segment_numbers:
+            path = self.segment_path(segment_number)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+
+            offset = 0
+            segment_size = os.path.getsize(path)
+
+            while offset + RECORD_HEADER.size <= segment_size:
+                segment = self.segment(segment_number, offset + RECORD_HEADER.size)
+                record_header = RECORD_HEADER.unpack_from(segment, offset)
+                length = RECORD_HEADER.size + sum(record_header[3:6])
+                stored_at = record_header[6]
+
+                if (since is None or stored_at >= since) and (until is None or stored_at < until):
+                    yield self.read(segment_number, offset, length)
+
+                offset += length
+
+    def close(self):
+        with self.lock:
+            self.segment_file.close()
+            self.index_file.close()
+            self.segments.clear()
+
+
+class StoredPage:
+
+    def __init__(self, url, status_code, headers, content, stored_at):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.stored_at = stored_at
+
+    def __repr__(self):
+        return f'{self.url} ({self.status_code}, {len(self.content)} bytes)'
+
+
+# Records written before headers were stored as pairs have them as a JSON object.
+def stored_headers(headers):
+    if isinstance(headers, dict):
+        return list(headers.items())
+
+    return [(name, value) for name, value in headers]
+
+
+def decompress(compression, content):
+    if compression == GZIP:
+        return gzip.decompress(content)
+    elif compression == ZSTD:
+        if zstandard is None:
+            raise CompressionUnavailable('zstd compressed record needs zstandard package')
+        return zstandard.ZstdDecompressor().decompress(content)
+
+    return content
+
+
+class UnknownCompression(Exception):
+    pass
+
+
+class CompressionUnavailable(Exception):
+    pass
+
+
+class CorruptedRecord(Exception):
+    pass
@@ -0,0 +1,79 @@
+from bs4 import BeautifulSoup
+
+RAW = 'raw'
+TEXT = 'text'
+HTML_PARSER = 'html.parser'
+LXML = 'lxml'
+PARSERS = (RAW, TEXT, HTML_PARSER, LXML)
+SOUP_PARSERS = (HTML_PARSER, LXML)
+ENCODING = 'utf-8'
+
+
+def validate_parser(parser):
+    if parser not in PARSERS:
+        raise UnknownParser(f'Parser "{parser}" is not one of: {", ".join(PARSERS)}')
+
+
+def parse(content, parser=HTML_PARSER, lazy=False):
+    validate_parser(parser)
+
+    if parser == RAW:
+        return content
+    elif parser == TEXT:
+        return decode(content)
+    elif lazy:
+        return LazySoup(content, parser)
+    else:
+        return BeautifulSoup(decode(content), features=parser)
+
+
+def decode(content):
+    return str(content, ENCODING, errors='replace')
+
+
+class LazySoup:
+    # Keeps raw content and builds BeautifulSoup only when the page is used for the first time.
+
+    def __init__(self, content, features=HTML_PARSER):
+        self.content = content
+        self.features = features
+        self.__soup = None
+
+    @property
+    def soup(self):
+        if self.__soup is None:
+            self.__soup = BeautifulSoup(decode(self.content), features=self.features)
+
+        return self.__soup
+
+    def is_parsed(self):
+        return self.__soup is not None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return getattr(self.soup, name)
+
+    def __getitem__(self, key):
+        return self.soup[key]
+
+    def __iter__(self):
+        return iter(self.soup)
+
+    # A page is always true, without this truth testing would fall back to __len__ and parse the page.
+    def __bool__(self):
+        return True
+
+    def __len__(self):
+        return len(self.soup)
+
+    def __str__(self):
+        return str(self.soup)
+
+    def __repr__(self):
+        return repr(self.soup)
+
+
+class UnknownParser(Exception):
+    pass
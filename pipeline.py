@@ -0,0 +1,105 @@
+import os
+import time
+from concurrent import futures
+
+import parsing
+import scraping
+
+
+# Runs in a parse process. Only the extracted result is sent back, soup trees never leave the process.
+def parse_and_extract(url, content, parser, extract):
+    parse_start_time = time.monotonic()
+    result = extract(url, parsing.parse(content, parser))
+
+    return time.monotonic() - parse_start_time, result
+
+
+class ParsePipeline:
+    # Fetch threads download raw pages and parse processes turn them into results of extract(url, page),
+    # so parsing isn't held back by the GIL. extract has to be picklable (a module level function) and so does
+    # its result - return plain values like str(tag.string), not BeautifulSoup objects. At most max_pending urls
+    # are between the stages at once - fetching waits for parsing to catch up, so raw pages don't pile up in memory.
+
+    def __init__(self, scrapper, extract, parser=parsing.HTML_PARSER, max_fetch_workers=8, max_parse_workers=None,
+                 max_pending=None):
+        parsing.validate_parser(parser)
+
+        self.scrapper = scrapper
+        self.extract = extract
+        self.parser = parser
+        max_parse_workers = max_parse_workers or os.cpu_count() or 1
+        self.fetch_executor = futures.ThreadPoolExecutor(max_workers=max_fetch_workers)
+        self.parse_executor = futures.ProcessPoolExecutor(max_workers=max_parse_workers)
+        self.max_pending = max_pending if max_pending is not None else max_fetch_workers + 2 * max_parse_workers
+
+    @property
+    def max_pending(self):
+        return self.__max_pending
+
+    @max_pending.setter
+    def max_pending(self, max_pending):
+        if max_pending < 1:
+            self.__max_pending = 1
+        else:
+            self.__max_pending = max_pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.fetch_executor.shutdown(cancel_futures=True)
+        self.parse_executor.shutdown(cancel_futures=True)
+
+    # Yields (url, result, exception) tuples as soon as results are extracted, like Scrapper.scrape_many.
+    def run(self, urls):
+        urls = iter(urls)
+        fetches = {}
+        parses = {}
+
+        try:
+            while True:
+                while len(fetches) + len(parses) < self.max_pending:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+
+                    fetches[self.fetch_executor.submit(self.scrapper.scrape, url, parsing.RAW)] = url
+
+                if not fetches and not parses:
+                    return
+
+                done, _ = futures.wait(list(fetches) + list(parses), return_when=futures.FIRST_COMPLETED)
+
+                for future in done:
+                    if future in fetches:
+                        url = fetches.pop(future)
+
+                        try:
+                            content = future.result()
+                        except scraping.ScrapingException as exception:
+                            yield url, None, exception
+                        else:
+                            parses[self.parse_executor.submit(parse_and_extract, url, content, self.parser,
+                                                              self.extract)] = url
+                    else:
+                        url = parses.pop(future)
+
+                        try:
+                            parse_time, result = future.result()
+                        except Exception as e:
+                            exception = ExtractionError(f'{url}: {repr(e)}')
+                            exception.__cause__ = e
+                            yield url, None, exception
+                        else:
+                            self.scrapper.metrics.observe('parse_seconds', parse_time, parser=self.parser)
+                            yield url, result, None
+        finally:
+            for future in list(fetches) + list(parses):
+                future.cancel()
+
+
+class ExtractionError(scraping.ScrapingException):
+    pass
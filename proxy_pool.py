@@ -0,0 +1,319 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class ProxyPool:
+    MIN_LATENCY = 0.05
+
+    def __init__(self, max_failures=5, base_cooldown=30.0, max_cooldown=600.0, latency_smoothing=0.3,
+                 default_latency=1.0):
+        self.lock = threading.RLock()
+        self.buckets = {}
+        self.cooldowns = {}
+        self.health = {}
+        self.sequence = itertools.count()
+        self.max_failures = max_failures
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_smoothing = latency_smoothing
+        self.default_latency = default_latency
+
+    @property
+    def max_failures(self):
+        return self.__max_failures
+
+    @max_failures.setter
+    def max_failures(self, max_failures):
+        if max_failures < 1:
+            self.__max_failures = 1
+        else:
+            self.__max_failures = max_failures
+
+    @property
+    def latency_smoothing(self):
+        return self.__latency_smoothing
+
+    @latency_smoothing.setter
+    def latency_smoothing(self, latency_smoothing):
+        self.__latency_smoothing = min(max(latency_smoothing, 0.0), 1.0)
+
+    def __len__(self):
+        return len(self.health)
+
+    def __contains__(self, proxy):
+        return proxy in self.health
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.health))
+
+    def count(self, protocol):
+        bucket = self.buckets.get(protocol)
+        return 0 if bucket is None else len(bucket)
+
+    def add(self, proxy):
+        with self.lock:
+            if proxy in self.health:
+                return
+
+            health = ProxyHealth()
+            self.health[proxy] = health
+            self.buckets.setdefault(proxy.protocol, WeightedBucket()).add(proxy, self.weight(health))
+            self.cooldowns.setdefault(proxy.protocol, [])
+
+    # Proxies are appended to buckets and every bucket is rebuilt once, which is O(n) instead of O(n log n).
+    def add_many(self, proxies):
+        with self.lock:
+            new_items = {}
+            weight = self.weight(ProxyHealth())
+
+            for proxy in proxies:
+                if proxy in self.health:
+                    continue
+
+                self.health[proxy] = ProxyHealth()
+                new_items.setdefault(proxy.protocol, []).append((proxy, weight))
+
+            for protocol, items in new_items.items():
+                self.buckets.setdefault(protocol, WeightedBucket()).extend(items)
+                self.cooldowns.setdefault(protocol, [])
+
+    def remove(self, proxy):
+        with self.lock:
+            if self.health.pop(proxy, None) is not None:
+                self.buckets[proxy.protocol].remove(proxy)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.cooldowns.clear()
+            self.health.clear()
+
+    def proxy_health(self, proxy):
+        return self.health.get(proxy)
+
+    # Proxies are drawn with probability proportional to their weight, the previous proxy is skipped
+    # if there is any other to choose from. Proxies in cooldown have no weight, but when all of them are
+    # in cooldown, the one that would be released first is released early.
+    def draw(self, protocol, previous_proxy=None):
+        with self.lock:
+            bucket = self.buckets.get(protocol)
+
+            if bucket is None or len(bucket) == 0:
+                return None
+
+            self.release_cooldowns(protocol, time.monotonic())
+            if bucket.total() <= 0.0:
+                self.release_earliest_cooldown(protocol)
+
+            total = bucket.total()
+            previous_weight = bucket.weight(previous_proxy) if previous_proxy in bucket else 0.0
+
+            if previous_weight <= 0.0 or total - previous_weight <= 0.0:
+                return bucket.find(random.random() * total)
+
+            value = random.random() * (total - previous_weight)
+            if value >= bucket.prefix_sum(bucket.position(previous_proxy)):
+                value += previous_weight
+
+            return bucket.find(value)
+
+    def report_success(self, proxy, latency):
+        with self.lock:
+            health = self.health.get(proxy)
+
+            if health is None:
+                return
+
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.cooldown_until = None
+
+            if health.latency is None:
+                health.latency = latency
+            else:
+                health.latency = self.latency_smoothing * latency + (1 - self.latency_smoothing) * health.latency
+
+            self.buckets[proxy.protocol].update(proxy, self.weight(health))
+
+    # Returns True when the proxy failed too many times in a row and was removed from the pool.
+    def report_failure(self, proxy):
+        with self.lock:
+            health = self.health.get(proxy)
+
+            if health is None:
+                return False
+
+            now = time.monotonic()
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_failure_time = now
+
+            if health.consecutive_failures >= self.max_failures:
+                self.remove(proxy)
+                return True
+
+            cooldown = min(self.base_cooldown * 2 ** (health.consecutive_failures - 1), self.max_cooldown)
+            health.cooldown_until = now + cooldown
+            heapq.heappush(self.cooldowns[proxy.protocol], (health.cooldown_until, next(self.sequence), proxy))
+            self.buckets[proxy.protocol].update(proxy, 0.0)
+
+            return False
+
+    def release_cooldowns(self, protocol, now):
+        cooldowns = self.cooldowns[protocol]
+
+        while cooldowns and cooldowns[0][0] <= now:
+            self.release(*heapq.heappop(cooldowns))
+
+    def release_earliest_cooldown(self, protocol):
+        cooldowns = self.cooldowns[protocol]
+
+        while cooldowns:
+            if self.release(*heapq.heappop(cooldowns)):
+                return
+
+    def release(self, cooldown_until, _, proxy):
+        health = self.health.get(proxy)
+
+        if health is None or health.cooldown_until != cooldown_until:
+            return False
+
+        health.cooldown_until = None
+        self.buckets[proxy.protocol].update(proxy, self.weight(health))
+        return True
+
+    def weight(self, health):
+        success_ratio = (health.successes + 1) / (health.successes + health.failures + 2)
+        latency = health.latency if health.latency is not None else self.default_latency
+
+        return success_ratio / max(latency, ProxyPool.MIN_LATENCY)
+
+
+class ProxyHealth:
+    __slots__ = ('successes', 'failures', 'consecutive_failures', 'latency', 'last_failure_time', 'cooldown_until')
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.last_failure_time = None
+        self.cooldown_until = None
+
+    def __repr__(self):
+        return f'successes: {self.successes}, failures: {self.failures}, latency: {self.latency}'
+
+
+class WeightedBucket:
+    # Items with weights kept in a Fenwick tree, so weighted drawing, changing a weight, adding
+    # and removing (the last item takes place of the removed one) are all O(log n).
+    REBUILD_INTERVAL = 1 << 20
+
+    def __init__(self):
+        self.items = []
+        self.weights = []
+        self.tree = [0.0]
+        self.positions = {}
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def position(self, item):
+        return self.positions[item]
+
+    def weight(self, item):
+        return self.weights[self.positions[item]]
+
+    def total(self):
+        return self.prefix_sum(len(self.items))
+
+    def prefix_sum(self, end):
+        total = 0.0
+
+        while end > 0:
+            total += self.tree[end]
+            end -= end & -end
+
+        return total
+
+    def add(self, item, weight):
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+        self.weights.append(weight)
+
+        index = len(self.items)
+        self.tree.append(self.prefix_sum(index - 1) - self.prefix_sum(index - (index & -index)) + weight)
+
+    def extend(self, items):
+        for item, weight in items:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+            self.weights.append(weight)
+
+        self.rebuild()
+
+    def update(self, item, weight):
+        self.update_position(self.positions[item], weight)
+
+    def update_position(self, position, weight):
+        delta = weight - self.weights[position]
+        self.weights[position] = weight
+
+        index = position + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+        self.updates += 1
+        if self.updates >= WeightedBucket.REBUILD_INTERVAL:
+            self.rebuild()
+
+    def remove(self, item):
+        position = self.positions.pop(item)
+        last_position = len(self.items) - 1
+
+        if position != last_position:
+            last_item = self.items[last_position]
+            self.update_position(position, self.weights[last_position])
+            self.items[position] = last_item
+            self.positions[last_item] = position
+
+        self.update_position(last_position, 0.0)
+        self.items.pop()
+        self.weights.pop()
+        self.tree.pop()
+
+    def find(self, value):
+        position = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+
+        while step:
+            next_position = position + step
+
+            if next_position < len(self.tree) and self.tree[next_position] <= value:
+                position = next_position
+                value -= self.tree[position]
+
+            step >>= 1
+
+        return self.items[min(position, len(self.items) - 1)]
+
+    # Float errors pile up with every update, so the tree is recalculated from weights from time to time.
+    def rebuild(self):
+        self.tree = [0.0] + self.weights[:]
+
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+        self.updates = 0
@@ -0,0 +1,172 @@
+import threading
+import time
+from concurrent import futures
+
+import requests
+
+from session_pool import SessionPool
+
+
+class ProxyRefresher:
+    # Checks go through a session pool, a scrapper passes its own one, so connections to proxies that passed
+    # are already open when they are drawn.
+    CHECK_URLS = {'http': 'http://www.google.com/', 'https': 'https://www.google.com/'}
+
+    def __init__(self, harvest, pool, check_urls=None, check_timeout=2.0, low_water_mark=10, max_checks=32,
+                 refresh_interval=60.0, rejection_time=600.0, session_pool=None):
+        self.harvest = harvest
+        self.pool = pool
+        self.check_urls = dict(check_urls or ProxyRefresher.CHECK_URLS)
+        self.check_timeout = check_timeout
+        self.low_water_mark = low_water_mark
+        self.max_checks = max_checks
+        self.refresh_interval = refresh_interval
+        self.rejection_time = rejection_time
+        self.rejected = {}
+        self.session_pool = session_pool if session_pool is not None else SessionPool()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.refilled = threading.Condition()
+        self.generation = 0
+        self.refills = 0
+        self.waiting = 0
+        self.error = None
+
+    @property
+    def max_checks(self):
+        return self.__max_checks
+
+    @max_checks.setter
+    def max_checks(self, max_checks):
+        if max_checks < 1:
+            self.__max_checks = 1
+        else:
+            self.__max_checks = max_checks
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='ProxyRefresher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def wake(self):
+        self.wake_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.refill_required():
+                self.refill()
+
+            self.wake_event.wait(self.refresh_interval)
+            self.wake_event.clear()
+
+    def refill_required(self):
+        if self.waiting > 0:
+            return True
+
+        return any(self.pool.count(protocol) <= self.low_water_mark for protocol in self.check_urls)
+
+    # Candidates are probed concurrently and only the ones that answered are added to the pool,
+    # rejected candidates aren't probed again for rejection_time seconds.
+    def refill(self):
+        with self.refilled:
+            self.generation += 1
+
+        try:
+            candidates = self.candidates(self.harvest())
+            self.error = None
+        except Exception as e:
+            candidates = []
+            self.error = e
+
+        with futures.ThreadPoolExecutor(max_workers=self.max_checks) as executor:
+            checks = {executor.submit(self.check, proxy): proxy for proxy in candidates}
+
+            for check in futures.as_completed(checks):
+                proxy = checks[check]
+                latency = check.result()
+
+                if latency is None:
+                    self.rejected[proxy.address()] = time.monotonic()
+                else:
+                    self.pool.add(proxy)
+                    self.pool.report_success(proxy, latency)
+
+        with self.refilled:
+            self.refills += 1
+            self.refilled.notify_all()
+
+    def candidates(self, proxies):
+        now = time.monotonic()
+        self.rejected = {address: rejection_time for address, rejection_time in self.rejected.items()
+                         if now - rejection_time < self.rejection_time}
+        known_addresses = {proxy.address() for proxy in self.pool}
+        candidates = {}
+
+        for proxy in proxies:
+            address = proxy.address()
+
+            if proxy.protocol in self.check_urls and address not in known_addresses and address not in self.rejected:
+                candidates[address] = proxy
+
+        return list(candidates.values())
+
+    # Session of a rejected proxy is closed, the one of a proxy that answered is kept for scraping.
+    def check(self, proxy):
+        check_start_time = time.monotonic()
+
+        try:
+            with self.session_pool.get(self.check_urls[proxy.protocol], proxy.address(), proxy.protocol,
+                                       timeout=self.check_timeout) as response:
+                if response.status_code >= 400:
+                    response = None
+        except requests.exceptions.RequestException:
+            response = None
+
+        if response is None:
+            self.session_pool.remove(proxy.address(), proxy.protocol)
+            return None
+
+        return time.monotonic() - check_start_time
+
+    # Blocks until the pool has a proxy of a given protocol or until a refill started after the call ends without
+    # one. A refill that was already running when the call was made may have harvested before the proxies ran out,
+    # so it doesn't count.
+    def wait_for_proxy(self, protocol, timeout=None):
+        if self.pool.count(protocol) > 0:
+            return True
+        if protocol not in self.check_urls:
+            return False
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.refilled:
+            generation = self.generation
+            self.waiting += 1
+
+            try:
+                while self.pool.count(protocol) == 0:
+                    if self.refills > generation:
+                        return False
+
+                    self.wake()
+                    remaining_time = None if deadline is None else deadline - time.monotonic()
+                    if remaining_time is not None and remaining_time <= 0:
+                        return False
+
+                    self.refilled.wait(remaining_time)
+            finally:
+                self.waiting -= 1
+
+        return True
@@ -0,0 +1,135 @@
+import html
+import re
+from abc import ABC, abstractmethod
+
+import parsing
+
+HTTP = 'http'
+HTTPS = 'https'
+# Comments, scripts and styles are single tokens, so markup inside them isn't taken for table tags. Table tags are
+# told apart by name, any other tag is dropped.
+TOKEN_PATTERN = re.compile(r'<!--.*?(?:-->|\Z)|<(script|style)\b[^>]*>.*?(?:</\1\s*>|\Z)'
+                           r'|<(/?)(table|tbody|tr|td|th)\b[^>]*>|<[a-zA-Z/!?][^>]*>', re.IGNORECASE | re.DOTALL)
+
+
+# Texts of td cells of tbody rows, one list of strings per row, found in a single pass over tags of the page.
+# Nothing else of the page is built. Every table, nested ones too, has its own rows and cells, text of a nested
+# table isn't part of the cell it is in. Cells and rows that aren't closed end where the next one starts,
+# like in browsers.
+def table_rows(source):
+    tables = [Table()]
+    position = 0
+
+    for token in TOKEN_PATTERN.finditer(source):
+        table = tables[-1]
+
+        if table.cell is not None and token.start() > position:
+            table.cell.append(source[position:token.start()])
+
+        position = token.end()
+        name = token.group(3)
+
+        if name is None:
+            continue
+
+        name = name.lower()
+        closing = token.group(2) == '/'
+
+        if name == 'table':
+            if not closing:
+                tables.append(Table())
+            elif len(tables) > 1:
+                yield from tables.pop().finish_row()
+        elif name == 'tbody':
+            yield from table.finish_row()
+            table.body = not closing
+        elif name == 'tr':
+            yield from table.finish_row()
+
+            if not closing and table.body:
+                table.row = []
+        else:
+            table.finish_cell()
+
+            if not closing and name == 'td' and table.row is not None:
+                table.cell = []
+
+    if tables[-1].cell is not None:
+        tables[-1].cell.append(source[position:])
+
+    while tables:
+        yield from tables.pop().finish_row()
+
+
+def cell_text(cell):
+    if '&' in cell:
+        cell = html.unescape(cell)
+
+    return cell.strip()
+
+
+class Table:
+    __slots__ = ('body', 'row', 'cell')
+
+    def __init__(self):
+        self.body = False
+        self.row = None
+        self.cell = None
+
+    def finish_cell(self):
+        if self.cell is not None:
+            self.row.append(cell_text(''.join(self.cell)))
+            self.cell = None
+
+    def finish_row(self):
+        self.finish_cell()
+
+        if self.row is not None:
+            yield self.row
+            self.row = None
+
+
+class ProxySite(ABC):
+    # Site adapter: url of a proxy list and a way to get (protocol, ip, port) entries out of the page.
+    # Entries are validated by the scrapper.
+    parser = parsing.TEXT
+
+    def __init__(self, url):
+        self.url = url
+
+    @abstractmethod
+    def extract(self, source):
+        raise NotImplementedError
+
+
+class ProxyTableSite(ProxySite):
+    # Table like the one on free-proxy-list.net: ip, port and whether the proxy supports https ('yes'/'no')
+    # in given columns.
+
+    def __init__(self, url, ip_column=0, port_column=1, https_column=6):
+        super().__init__(url)
+
+        self.ip_column = ip_column
+        self.port_column = port_column
+        self.https_column = https_column
+        self.min_cells = max(ip_column, port_column, https_column) + 1
+
+    def extract(self, source):
+        for row in table_rows(source):
+            if len(row) >= self.min_cells:
+                protocol = HTTP if row[self.https_column] == 'no' else HTTPS
+                yield protocol, row[self.ip_column], row[self.port_column]
+
+
+class PlainTextSite(ProxySite):
+    # ip:port entries anywhere in the page, like in plain text lists served by proxy APIs.
+    ADDRESS_PATTERN = re.compile(r'\b(\d{1,3}(?:\.\d{1,3}){3}):(\d{1,5})\b')
+
+    def __init__(self, url, protocol=HTTP):
+        super().__init__(url)
+
+        self.protocol = protocol
+
+    def extract(self, source):
+        for match in PlainTextSite.ADDRESS_PATTERN.finditer(source):
+            yield self.protocol, match.group(1), match.group(2)
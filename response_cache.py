@@ -0,0 +1,362 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+UNCACHEABLE_DIRECTIVES = ('no-store', 'private')
+
+
+# Cache-Control directives by lower case name, directives without a value are empty strings.
+def cache_control(headers):
+    directives = {}
+
+    for directive in (headers.get('Cache-Control') or '').split(','):
+        name, _, value = directive.partition('=')
+        name = name.strip().lower()
+
+        if name:
+            directives[name] = value.strip().strip('"')
+
+    return directives
+
+
+# Seconds a response stays fresh by its Cache-Control, None when it doesn't say. no-cache means that it has
+# to be revalidated every time.
+def max_age(directives):
+    if 'no-cache' in directives:
+        return 0
+
+    try:
+        return max(int(directives['max-age']), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+class ResponseCache:
+    DIRECTORY = r'files/cache/'
+
+    def __init__(self, max_entries=1024, max_memory_size=64 * 1024 * 1024, directory=DIRECTORY,
+                 max_disk_size=1024 * 1024 * 1024, ttl=7 * 24 * 60 * 60, fresh_time=0):
+        self.lock = threading.Lock()
+        self.memory = MemoryTier(max_entries, max_memory_size)
+        self.disk = DiskTier(directory, max_disk_size, ttl) if directory is not None else None
+        self.ttl = ttl
+        self.fresh_time = fresh_time
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def get(self, url):
+        entry = self.memory.get(url)
+
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(url)
+
+            if entry is not None:
+                self.memory.put(entry)
+
+        if entry is not None and time.time() - entry.stored_at > self.ttl:
+            self.remove(url)
+            return None
+
+        return entry
+
+    def put(self, url, content, headers):
+        entry = CachedResponse(url, content, headers.get('ETag'), headers.get('Last-Modified'), time.time(),
+                               max_age(cache_control(headers)))
+        self.memory.put(entry)
+
+        if self.disk is not None:
+            self.disk.put(entry)
+
+        return entry
+
+    def remove(self, url):
+        self.memory.remove(url)
+
+        if self.disk is not None:
+            self.disk.remove(url)
+
+    def clear(self):
+        self.memory.clear()
+
+        if self.disk is not None:
+            self.disk.clear()
+
+    # max-age of the response takes place of fresh_time.
+    def is_fresh(self, entry):
+        if entry is None:
+            return False
+
+        fresh_time = self.fresh_time if entry.max_age is None else entry.max_age
+
+        return time.time() - entry.stored_at < fresh_time
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+
+        if entry is not None:
+            if entry.etag is not None:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified is not None:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    # Returns content that should be served for a response, stores new content and counts hits and misses.
+    # Responses with no-store or private aren't stored and drop what was cached for the url.
+    def resolve(self, url, entry, status_code, headers, content):
+        directives = cache_control(headers)
+
+        if status_code == 304 and entry is not None:
+            revalidated_max_age = max_age(directives)
+            rewritten = revalidated_max_age is not None and revalidated_max_age != entry.max_age
+            entry.stored_at = time.time()
+            entry.max_age = entry.max_age if revalidated_max_age is None else revalidated_max_age
+            self.memory.put(entry)
+            if self.disk is not None:
+                if rewritten:
+                    self.disk.put(entry)
+                else:
+                    self.disk.touch(entry)
+
+            self.count(hits=1, revalidations=1)
+            return entry.content
+
+        self.count(misses=1)
+
+        if status_code == 200:
+            if any(directive in directives for directive in UNCACHEABLE_DIRECTIVES):
+                if entry is not None:
+                    self.remove(url)
+            else:
+                self.put(url, content, headers)
+
+        return content
+
+    def count(self, hits=0, misses=0, revalidations=0):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.revalidations += revalidations
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations,
+                    'memory_entries': len(self.memory), 'memory_size': self.memory.size}
+
+
+class CachedResponse:
+
+    def __init__(self, url, content, etag, last_modified, stored_at, max_age=None):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.max_age = max_age
+
+    def __len__(self):
+        return len(self.content)
+
+
+class MemoryTier:
+
+    def __init__(self, max_entries, max_size):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+
+            if entry is not None:
+                self.entries.move_to_end(url)
+
+            return entry
+
+    def put(self, entry):
+        if len(entry) > self.max_size:
+            return
+
+        with self.lock:
+            previous_entry = self.entries.pop(entry.url, None)
+            if previous_entry is not None:
+                self.size -= len(previous_entry)
+
+            self.entries[entry.url] = entry
+            self.size += len(entry)
+
+            while len(self.entries) > self.max_entries or self.size > self.max_size:
+                _, evicted_entry = self.entries.popitem(last=False)
+                self.size -= len(evicted_entry)
+
+    def remove(self, url):
+        with self.lock:
+            entry = self.entries.pop(url, None)
+
+            if entry is not None:
+                self.size -= len(entry)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class DiskTier:
+    # Every entry is a small JSON file with the url, validators and a digest of the body, next to a file with
+    # the raw body. Time of storing is the modification time of the JSON file, so a revalidated entry is only
+    # touched, its body isn't written again.
+    EXTENSION = '.json'
+    BODY_EXTENSION = '.body'
+
+    def __init__(self, directory, max_size, ttl):
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.files = OrderedDict()
+        self.size = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_index()
+
+    # Entries are indexed from the oldest one, so they can be evicted in that order. Expired entries are removed
+    # here, the ones that expire later are removed when they are read.
+    def load_index(self):
+        entries = []
+        now = time.time()
+
+        for file in os.scandir(self.directory):
+            if file.name.endswith(DiskTier.EXTENSION):
+                path = file.path[:-len(DiskTier.EXTENSION)]
+                file_stat = file.stat()
+
+                if now - file_stat.st_mtime > self.ttl:
+                    self.delete_files(path)
+                else:
+                    entries.append((file_stat.st_mtime, path, file_stat.st_size + self.body_size(path)))
+
+        for _, path, size in sorted(entries):
+            self.files[path] = size
+            self.size += size
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest())
+
+    @staticmethod
+    def body_size(path):
+        try:
+            return os.path.getsize(path + DiskTier.BODY_EXTENSION)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def digest(content):
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    # Body of another write of the same url can be paired with the JSON file, the digest tells them apart.
+    def get(self, url):
+        path = self.path(url)
+
+        try:
+            with open(path + DiskTier.EXTENSION, 'rb') as headers_file:
+                stored_at = os.fstat(headers_file.fileno()).st_mtime
+                headers = json.load(headers_file)
+            with open(path + DiskTier.BODY_EXTENSION, 'rb') as body_file:
+                content = body_file.read()
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(headers, dict) or headers.get('url') != url or headers.get('digest') != self.digest(content):
+            return None
+
+        return CachedResponse(url, content, headers.get('etag'), headers.get('last_modified'), stored_at,
+                              headers.get('max_age'))
+
+    # Body is replaced before the JSON file, so a JSON file is never older than its body. Temporary files are
+    # named by process and thread, so writers sharing the directory don't write to the same file.
+    def put(self, entry):
+        path = self.path(entry.url)
+        headers = json.dumps({'url': entry.url, 'etag': entry.etag, 'last_modified': entry.last_modified,
+                              'max_age': entry.max_age, 'digest': self.digest(entry.content)}).encode()
+
+        self.write_file(path + DiskTier.BODY_EXTENSION, entry.content)
+        self.write_file(path + DiskTier.EXTENSION, headers)
+        os.utime(path + DiskTier.EXTENSION, (entry.stored_at, entry.stored_at))
+
+        with self.lock:
+            self.size -= self.files.pop(path, 0)
+            self.files[path] = len(headers) + len(entry.content)
+            self.size += self.files[path]
+            evicted_paths = self.evict()
+
+        for evicted_path in evicted_paths:
+            self.delete_files(evicted_path)
+
+    @staticmethod
+    def write_file(path, content):
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+        with open(temporary_path, 'wb') as cache_file:
+            cache_file.write(content)
+        os.replace(temporary_path, path)
+
+    # Revalidated entry is stored again by setting the modification time of its JSON file.
+    def touch(self, entry):
+        path = self.path(entry.url)
+
+        try:
+            os.utime(path + DiskTier.EXTENSION, (entry.stored_at, entry.stored_at))
+        except FileNotFoundError:
+            self.put(entry)
+            return
+
+        with self.lock:
+            if path in self.files:
+                self.files.move_to_end(path)
+
+    def evict(self):
+        evicted_paths = []
+
+        while self.size > self.max_size and self.files:
+            path, size = self.files.popitem(last=False)
+            self.size -= size
+            evicted_paths.append(path)
+
+        return evicted_paths
+
+    def remove(self, url):
+        path = self.path(url)
+
+        with self.lock:
+            self.size -= self.files.pop(path, 0)
+
+        self.delete_files(path)
+
+    def clear(self):
+        with self.lock:
+            paths = list(self.files)
+            self.files.clear()
+            self.size = 0
+
+        for path in paths:
+            self.delete_files(path)
+
+    @staticmethod
+    def delete_files(path):
+        for extension in (DiskTier.EXTENSION, DiskTier.BODY_EXTENSION):
+            try:
+                os.remove(path + extension)
+            except FileNotFoundError:
+                pass
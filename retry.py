@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+
+FULL_JITTER = 'full'
+EQUAL_JITTER = 'equal'
+NO_JITTER = 'none'
+JITTERS = (FULL_JITTER, EQUAL_JITTER, NO_JITTER)
+
+
+class RetryPolicy:
+    # max_attempts holds how many errors of every kind a url can survive, see Scrapper.max_* settings.
+    # Retries wait base_delay * multiplier ** (retry - 1) seconds (at most max_delay) with jitter, all retries
+    # of an url have to fit into deadline seconds and, with a budget, retries of all urls share a budget.
+
+    def __init__(self, max_attempts=None, base_delay=0.1, multiplier=2.0, max_delay=5.0, jitter=FULL_JITTER,
+                 deadline=None, budget=None):
+        if jitter not in JITTERS:
+            raise UnknownJitter(f'Jitter "{jitter}" is not one of: {", ".join(JITTERS)}')
+
+        self.max_attempts = dict(max_attempts or {})
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.budget = budget
+
+    @property
+    def base_delay(self):
+        return self.__base_delay
+
+    @base_delay.setter
+    def base_delay(self, base_delay):
+        if base_delay < 0.0:
+            self.__base_delay = 0.0
+        else:
+            self.__base_delay = base_delay
+
+    @property
+    def multiplier(self):
+        return self.__multiplier
+
+    @multiplier.setter
+    def multiplier(self, multiplier):
+        if multiplier < 1.0:
+            self.__multiplier = 1.0
+        else:
+            self.__multiplier = multiplier
+
+    def attempts(self, error, default=3):
+        return self.max_attempts.get(error, default)
+
+    def start(self):
+        if self.budget is not None:
+            self.budget.deposit()
+
+        return RetryState(time.monotonic())
+
+    def backoff(self, retry):
+        delay_time = min(self.base_delay * self.multiplier ** (retry - 1), self.max_delay)
+
+        if self.jitter == FULL_JITTER:
+            return random.uniform(0.0, delay_time)
+        elif self.jitter == EQUAL_JITTER:
+            return delay_time / 2 + random.uniform(0.0, delay_time / 2)
+
+        return delay_time
+
+    def deadline_exceeded(self, retry_state, delay_time):
+        return self.deadline is not None and \
+               time.monotonic() + delay_time - retry_state.start_time > self.deadline
+
+    def acquire_retry(self):
+        return self.budget is None or self.budget.withdraw()
+
+
+class RetryState:
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.retries = 0
+
+
+class RetryBudget:
+    # Token bucket shared by all urls: every request deposits ratio of a token and every retry takes a whole one,
+    # so retries can't be more than ratio of requests. min_retries_per_second tokens are added over time,
+    # so a few retries are possible even when there is little traffic.
+
+    def __init__(self, ratio=0.2, min_retries_per_second=1.0, max_tokens=100.0):
+        self.lock = threading.Lock()
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.refill_time = time.monotonic()
+        self.granted = 0
+        self.denied = 0
+
+    def refill(self, tokens):
+        now = time.monotonic()
+        tokens += (now - self.refill_time) * self.min_retries_per_second
+        self.refill_time = now
+        self.tokens = min(self.tokens + tokens, self.max_tokens)
+
+    def deposit(self):
+        with self.lock:
+            self.refill(self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            self.refill(0.0)
+
+            if self.tokens < 1.0:
+                self.denied += 1
+                return False
+
+            self.tokens -= 1.0
+            self.granted += 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {'tokens': self.tokens, 'granted': self.granted, 'denied': self.denied}
+
+
+class UnknownJitter(Exception):
+    pass
@@ -1,24 +1,46 @@
-import datetime
 import time
 import random
+import threading
+import itertools
+from concurrent import futures
 
 import requests
-from bs4 import BeautifulSoup
-import IPy
 
 import event
 import debug
+import file_loader
+import pacing
+import session_pool
+import parsing
+import response_cache
+import metrics
+import proxy_pool
+import user_agent_pool
+import proxy_refresher
+import proxy_sites
+import retry
 
 
 class Scrapper(event.Subject):
+    ERROR_COUNTERS = ('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
+                      'chunked_encoding_error_counter')
 
     def __init__(self, min_delay=334, max_delay=500, timeout=3.03):
         super().__init__()
 
+        self.local = threading.local()
+        self.rate_limiter = pacing.HostRateLimiter()
+        self.session_pool = session_pool.SessionPool()
+        self.response_cache = None
+        self.metrics = metrics.Metrics()
+        self.adaptive_delay = None
+        self.page_store = None
+        self.retry_policy = retry.RetryPolicy()
+        self.max_stream_bytes = None
+        self.stream_content_types = None
+        self.stream_chunk_size = 64 * 1024
         self.min_delay = min_delay
         self.max_delay = max_delay
-        self.previous_tick_time = datetime.datetime.now() - datetime.timedelta(milliseconds=self.max_delay)
-        self.next_delay = 0
         self.timeout = timeout
 
         self.max_connect_timeout = 3
@@ -63,76 +85,214 @@ class Scrapper(event.Subject):
         else:
             self.__timeout = timeout
 
+    @property
+    def max_stream_bytes(self):
+        return self.__max_stream_bytes
+
+    @max_stream_bytes.setter
+    def max_stream_bytes(self, max_stream_bytes):
+        if max_stream_bytes is not None and max_stream_bytes < 0:
+            self.__max_stream_bytes = 0
+        else:
+            self.__max_stream_bytes = max_stream_bytes
+
+    @property
+    def stream_chunk_size(self):
+        return self.__stream_chunk_size
+
+    @stream_chunk_size.setter
+    def stream_chunk_size(self, stream_chunk_size):
+        if stream_chunk_size < 1:
+            self.__stream_chunk_size = 1
+        else:
+            self.__stream_chunk_size = stream_chunk_size
+
+    # Limits of errors are kept by the retry policy, see retry.RetryPolicy.
     @property
     def max_connect_timeout(self):
-        return self.__max_connect_timeout
+        return self.retry_policy.attempts('connect_timeout')
 
     @max_connect_timeout.setter
     def max_connect_timeout(self, max_connect_timeout):
         if max_connect_timeout < 1:
-            self.__max_connect_timeout = 1
+            self.retry_policy.max_attempts['connect_timeout'] = 1
         else:
-            self.__max_connect_timeout = max_connect_timeout
+            self.retry_policy.max_attempts['connect_timeout'] = max_connect_timeout
 
     @property
     def max_read_timeout(self):
-        return self.__max_read_timeout
+        return self.retry_policy.attempts('read_timeout')
 
     @max_read_timeout.setter
     def max_read_timeout(self, max_read_timeout):
         if max_read_timeout < 1:
-            self.__max_read_timeout = 1
+            self.retry_policy.max_attempts['read_timeout'] = 1
         else:
-            self.__max_read_timeout = max_read_timeout
+            self.retry_policy.max_attempts['read_timeout'] = max_read_timeout
 
     @property
     def max_connection_error(self):
-        return self.__max_connection_error
+        return self.retry_policy.attempts('connection_error')
 
     @max_connection_error.setter
     def max_connection_error(self, max_connection_error):
         if max_connection_error < 1:
-            self.__max_connection_error = 1
+            self.retry_policy.max_attempts['connection_error'] = 1
         else:
-            self.__max_connection_error = max_connection_error
+            self.retry_policy.max_attempts['connection_error'] = max_connection_error
 
     @property
     def max_chunked_encoding_error(self):
-        return self.__max_chunked_encoding_error
+        return self.retry_policy.attempts('chunked_encoding_error')
 
     @max_chunked_encoding_error.setter
     def max_chunked_encoding_error(self, max_chunked_encoding_error):
         if max_chunked_encoding_error < 1:
-            self.__max_chunked_encoding_error = 1
+            self.retry_policy.max_attempts['chunked_encoding_error'] = 1
         else:
-            self.__max_chunked_encoding_error = max_chunked_encoding_error
+            self.retry_policy.max_attempts['chunked_encoding_error'] = max_chunked_encoding_error
+
+    @property
+    def connect_timeout_counter(self):
+        return getattr(self.local, 'connect_timeout_counter', 0)
+
+    @connect_timeout_counter.setter
+    def connect_timeout_counter(self, connect_timeout_counter):
+        self.count_error('connect_timeout', connect_timeout_counter)
+        self.local.connect_timeout_counter = connect_timeout_counter
+
+    @property
+    def read_timeout_counter(self):
+        return getattr(self.local, 'read_timeout_counter', 0)
+
+    @read_timeout_counter.setter
+    def read_timeout_counter(self, read_timeout_counter):
+        self.count_error('read_timeout', read_timeout_counter)
+        self.local.read_timeout_counter = read_timeout_counter
+
+    @property
+    def connection_error_counter(self):
+        return getattr(self.local, 'connection_error_counter', 0)
+
+    @connection_error_counter.setter
+    def connection_error_counter(self, connection_error_counter):
+        self.count_error('connection_error', connection_error_counter)
+        self.local.connection_error_counter = connection_error_counter
+
+    @property
+    def chunked_encoding_error_counter(self):
+        return getattr(self.local, 'chunked_encoding_error_counter', 0)
+
+    @chunked_encoding_error_counter.setter
+    def chunked_encoding_error_counter(self, chunked_encoding_error_counter):
+        self.count_error('chunked_encoding_error', chunked_encoding_error_counter)
+        self.local.chunked_encoding_error_counter = chunked_encoding_error_counter
+
+    def __enter__(self):
+        return self
 
-    def scrape(self, url):
-        self.delay()
-        source = self.get_source(url)
-        self.update_delay_times()
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.session_pool.close()
+
+    # With stream=True the page isn't parsed, scrape returns an iterator over chunks of bytes or, if a sink
+    # is given, writes the chunks to sink.write and returns the sink.
+    def scrape(self, url, parser=parsing.HTML_PARSER, lazy=False, stream=False, sink=None):
+        parsing.validate_parser(parser)
+
+        cached_response = None if stream else self.cached_response(url)
+        if self.is_fresh(cached_response):
+            return self.parse(cached_response.content, parser, lazy)
+
+        self.delay(url)
+        request_start_time = self.start_request(url)
+        try:
+            source = self.get_source(url, parser, lazy, cached_response, stream, sink)
+        except Exception:
+            self.finish_request(request_start_time, 'failure')
+            raise
+
+        if stream and sink is None:
+            return self.finish_stream(url, source, request_start_time)
+
+        self.finish_request(request_start_time, 'success')
+        self.update_delay_times(url)
 
         return source
 
-    def delay(self):
-        elapsed_time = int(round((datetime.datetime.now().timestamp() - self.previous_tick_time.timestamp()) * 1000))
+    def scrape_many(self, urls, max_workers=8, parser=parsing.HTML_PARSER, lazy=False):
+        # Error counters live in thread-local storage, so every worker keeps the same retry semantics
+        # as a single scrape call. At most max_workers * 2 urls are in flight, results come as they complete.
+        urls = iter(urls)
+
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self.scrape, url, parser, lazy): url
+                       for url in itertools.islice(urls, max_workers * 2)}
+
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+
+                for future in done:
+                    url = pending.pop(future)
+                    try:
+                        yield url, future.result(), None
+                    except ScrapingException as exception:
+                        yield url, None, exception
 
-        if elapsed_time < self.next_delay:
-            remaining_delay = self.next_delay - elapsed_time
-            time.sleep(remaining_delay / 1000)
+                for url in itertools.islice(urls, len(done)):
+                    pending[executor.submit(self.scrape, url, parser, lazy)] = url
 
-    def update_delay_times(self):
-        self.previous_tick_time = datetime.datetime.now()
-        self.next_delay = random.randint(self.min_delay, self.max_delay)
+    # Delays are kept per host, so scraping different hosts isn't slowed down by each other.
+    def delay(self, url):
+        time.sleep(self.reserve_delay(url))
+
+    def reserve_delay(self, url):
+        delay_time = self.rate_limiter.reserve(pacing.host(url), self.next_delay(url))
+        self.metrics.observe('delay_seconds', delay_time)
+
+        return delay_time
+
+    def update_delay_times(self, url):
+        self.rate_limiter.update(pacing.host(url), self.next_delay(url))
+
+    # With adaptive delay set, delays follow responses and errors of every host instead of being drawn.
+    def next_delay(self, url):
+        if self.adaptive_delay is None:
+            return self.draw_delay()
+
+        return self.adaptive_delay.delay(pacing.host(url))
+
+    def draw_delay(self):
+        return random.randint(self.min_delay, self.max_delay) / 1000
+
+    def get_source(self, url, parser=parsing.HTML_PARSER, lazy=False, cached_response=None, stream=False, sink=None):
+        headers = response_cache.ResponseCache.conditional_headers(cached_response)
+        retry_state = self.start_retries()
 
-    def get_source(self, url):
         while True:
             try:
-                with requests.get(url, timeout=self.timeout) as source:
-                    source.encoding = 'utf-8'
+                request_start_time = time.monotonic()
+                source = self.session_pool.get(url, timeout=self.timeout, headers=headers, stream=stream)
+
+                if stream:
+                    self.record_response(url, source.status_code, source.headers, request_start_time,
+                                         source.elapsed.total_seconds())
+                    self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter',
+                                              'connection_error_counter')
+                    return self.stream_source(source, sink, self.handle_chunked_encoding_error)
+
+                with source:
+                    body = source.content
+                    self.record_response(url, source.status_code, source.headers, request_start_time,
+                                         source.elapsed.total_seconds())
+                    self.record_transfer(source, body)
+                    self.store_page(url, source.status_code, source.headers, body)
+                    content = self.source_content(url, source.status_code, source.headers, body, cached_response)
                     self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter',
                                               'connection_error_counter', 'chunked_encoding_error_counter')
-                    return BeautifulSoup(source.text, features="html.parser")
+                    return self.parse(content, parser, lazy)
             except requests.exceptions.ConnectTimeout:
                 self.handle_connect_timeout()
             except requests.ReadTimeout:
@@ -146,6 +306,185 @@ class Scrapper(event.Subject):
             except requests.exceptions.RequestException as e:
                 raise NormalScrapingException(f'Undefined requests error: {str(e)}')
 
+            self.wait_before_retry(url, retry_state)
+
+    def stream_source(self, source, sink, handle_chunked_encoding_error):
+        try:
+            self.check_stream(source)
+        except ScrapingException:
+            source.close()
+            raise
+
+        chunks = self.iterate_stream(source, handle_chunked_encoding_error)
+
+        if sink is None:
+            return chunks
+
+        for chunk in chunks:
+            sink.write(chunk)
+
+        return sink
+
+    def check_stream(self, source):
+        content_type = source.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+        if self.stream_content_types is not None and not self.content_type_allowed(content_type):
+            raise ContentTypeNotAllowed(f'{source.url} has content type "{content_type}"')
+
+        content_length = source.headers.get('Content-Length', '')
+
+        if self.max_stream_bytes is not None and content_length.isdigit() and \
+                int(content_length) > self.max_stream_bytes:
+            raise ContentTooLarge(f'{source.url} has {content_length} bytes, limit is {self.max_stream_bytes}')
+
+    def content_type_allowed(self, content_type):
+        for allowed_content_type in self.stream_content_types:
+            if allowed_content_type.endswith('/*'):
+                if content_type.startswith(allowed_content_type[:-1]):
+                    return True
+            elif content_type == allowed_content_type:
+                return True
+
+        return False
+
+    # A stream that broke in the middle can't be resumed, so after counting the error it is always raised.
+    # Chunked encoding error counter is reset only when a whole stream was read.
+    def iterate_stream(self, source, handle_chunked_encoding_error):
+        streamed_bytes = 0
+
+        with source:
+            try:
+                for chunk in source.iter_content(self.stream_chunk_size):
+                    streamed_bytes += len(chunk)
+
+                    if self.max_stream_bytes is not None and streamed_bytes > self.max_stream_bytes:
+                        raise ContentTooLarge(f'{source.url} exceeded {self.max_stream_bytes} bytes')
+
+                    yield chunk
+
+                self.reset_error_counters('chunked_encoding_error_counter')
+            except requests.exceptions.ChunkedEncodingError as e:
+                handle_chunked_encoding_error()
+                raise StreamInterrupted(f'{source.url} after {streamed_bytes} bytes: {str(e)}')
+            except requests.exceptions.RequestException as e:
+                raise StreamInterrupted(f'{source.url} after {streamed_bytes} bytes: {str(e)}')
+
+    def cached_response(self, url):
+        if self.response_cache is None:
+            return None
+
+        return self.response_cache.get(url)
+
+    def is_fresh(self, cached_response):
+        if self.response_cache is None or not self.response_cache.is_fresh(cached_response):
+            return False
+
+        self.response_cache.count(hits=1)
+        return True
+
+    def source_content(self, url, status_code, headers, content, cached_response):
+        if self.response_cache is None:
+            return content
+
+        return self.response_cache.resolve(url, cached_response, status_code, headers, content)
+
+    # Raw responses are archived in a page store, if there is one. Not modified responses have nothing to archive.
+    def store_page(self, url, status_code, headers, content):
+        if self.page_store is not None and status_code != 304:
+            self.page_store.put(url, status_code, headers, content)
+
+    def parse(self, content, parser, lazy):
+        with self.metrics.timer('parse_seconds', parser=parser):
+            return parsing.parse(content, parser, lazy)
+
+    # Time to first byte is measured until response headers were received, network time until the body was read.
+    def record_response(self, url, status_code, headers, request_start_time, time_to_first_byte):
+        self.metrics.observe('time_to_first_byte_seconds', time_to_first_byte)
+        self.metrics.observe('network_seconds', time.monotonic() - request_start_time)
+        self.metrics.increment('responses_total', status=status_code)
+
+        if self.adaptive_delay is not None:
+            host_name = pacing.host(url)
+            delay_time = self.adaptive_delay.report_response(host_name, status_code, time_to_first_byte,
+                                                             pacing.retry_after(headers.get('Retry-After')))
+            if delay_time is not None:
+                self.delay_changed(host_name, delay_time)
+
+    # Bytes on the wire are counted before the body was decompressed, so they show what compression saves.
+    def record_transfer(self, source, body):
+        content_encoding = source.headers.get('Content-Encoding', 'identity')
+        self.metrics.increment('wire_bytes_total', self.session_pool.transport.wire_bytes(source),
+                               encoding=content_encoding)
+        self.metrics.increment('body_bytes_total', len(body), encoding=content_encoding)
+        self.metrics.increment('http_versions_total', version=self.session_pool.transport.http_version(source))
+
+    def start_request(self, url):
+        self.local.failed_attempts = 0
+        self.local.request_host = pacing.host(url)
+        return time.monotonic()
+
+    # Streamed request is finished when its chunks were read, when reading them failed or when the stream
+    # was closed before its end.
+    def finish_stream(self, url, chunks, request_start_time):
+        outcome = 'failure'
+
+        try:
+            yield from chunks
+            outcome = 'success'
+        except GeneratorExit:
+            outcome = 'closed'
+            raise
+        finally:
+            self.finish_request(request_start_time, outcome)
+
+            if outcome == 'success':
+                self.update_delay_times(url)
+
+    def finish_request(self, request_start_time, outcome):
+        self.metrics.observe('request_seconds', time.monotonic() - request_start_time)
+        self.metrics.observe('failed_attempts_per_request', getattr(self.local, 'failed_attempts', 0))
+        self.metrics.increment('requests_total', outcome=outcome)
+
+    # Errors are counted when their counters go up, errors without counters are counted directly.
+    def count_error(self, error, counter=None):
+        if counter is not None and counter <= getattr(self.local, f'{error}_counter', 0):
+            return
+
+        self.metrics.increment('errors_total', error=error)
+        self.local.failed_attempts = getattr(self.local, 'failed_attempts', 0) + 1
+
+        host_name = getattr(self.local, 'request_host', None)
+        if self.adaptive_delay is not None and host_name is not None:
+            delay_time = self.adaptive_delay.report_error(host_name, error)
+            if delay_time is not None:
+                self.delay_changed(host_name, delay_time)
+
+    # Error counters are per url - they start from zero for every url, whatever happened to the previous one.
+    def start_retries(self):
+        self.reset_error_counters(*self.ERROR_COUNTERS)
+        return self.retry_policy.start()
+
+    def wait_before_retry(self, url, retry_state):
+        time.sleep(self.retry_delay(url, retry_state))
+
+    # Retries are spaced by exponential backoff with jitter. They stop when waiting for the next one would
+    # exceed the deadline of the url or when the retry budget shared by all urls is spent.
+    def retry_delay(self, url, retry_state):
+        retry_state.retries += 1
+        delay_time = self.retry_policy.backoff(retry_state.retries)
+
+        if self.retry_policy.deadline_exceeded(retry_state, delay_time):
+            self.metrics.increment('retries_denied_total', reason='deadline')
+            raise RetryDeadlineExceeded(f'{url} after {retry_state.retries} attempts')
+        if not self.retry_policy.acquire_retry():
+            self.metrics.increment('retries_denied_total', reason='budget')
+            raise RetryBudgetExhausted(f'{url} after {retry_state.retries} attempts')
+
+        self.metrics.increment('retries_total')
+        self.metrics.observe('backoff_seconds', delay_time)
+
+        return delay_time
+
     def handle_connect_timeout(self):
         self.connect_timeout_counter += 1
         self.connect_timeout(f'{self.connect_timeout_counter}/{self.max_connect_timeout}')
@@ -177,7 +516,7 @@ class Scrapper(event.Subject):
         self.chunked_encoding_error_counter += 1
         self.chunked_encoding_error(f'{self.chunked_encoding_error_counter}/{self.max_chunked_encoding_error}')
 
-        if self.connection_error_counter >= self.max_connection_error:
+        if self.chunked_encoding_error_counter >= self.max_chunked_encoding_error:
             self.reset_error_counters('chunked_encoding_error_counter')
             raise ChunkedEncodingError()
 
@@ -206,61 +545,164 @@ class Scrapper(event.Subject):
     def chunked_encoding_error(self, error_info):
         pass
 
+    @event.signal
+    def delay_changed(self, host_name, delay_time):
+        pass
+
 
 class StealthScrapper(Scrapper):
     PROXY_URL = 'https://free-proxy-list.net/'
     PROXY_FILE_DIR = r'files/proxy.txt'
     USER_AGENTS_FILE_DIR = r'files/user_agents.txt'
     WRONG_INDEX = -1
+    ERROR_COUNTERS = Scrapper.ERROR_COUNTERS + ('proxy_ssl_error_counter',)
 
     def __init__(self, min_delay=334, max_delay=500, timeout=3.03, proxy_from_file=False):
         super().__init__(min_delay, max_delay, timeout)
 
+        self.stealth_lock = threading.RLock()
         self.proxy_from_file = proxy_from_file
-        self.used_proxy_index = StealthScrapper.WRONG_INDEX
-        self.proxy = []
+        self.proxy = proxy_pool.ProxyPool()
+        self.used_proxy = None
+        self.proxy_refresher = None
+        self.proxy_wait_timeout = 60.0
+        self.proxy_loader = file_loader.ProxyLoader(Proxy)
+        self.proxy_sites = None
+        self.proxy_provider = None
+        self.user_agent_loader = file_loader.UserAgentLoader()
+        self.user_agents = user_agent_pool.UserAgentPool()
         self.used_user_agent_index = StealthScrapper.WRONG_INDEX
-        self.user_agents = []
         self.max_proxy_ssl_error = 5
         self.proxy_ssl_error_counter = 0
         self.change_stealth = True
+        self.identity_pool = None
+        self.stealth_metrics = False
 
     @property
     def max_proxy_ssl_error(self):
-        return self.__max_proxy_ssl_error
+        return self.retry_policy.attempts('proxy_ssl_error', 5)
 
     @max_proxy_ssl_error.setter
     def max_proxy_ssl_error(self, max_proxy_ssl_error):
         if max_proxy_ssl_error < 1:
-            self.__max_proxy_ssl_error = 1
+            self.retry_policy.max_attempts['proxy_ssl_error'] = 1
+        else:
+            self.retry_policy.max_attempts['proxy_ssl_error'] = max_proxy_ssl_error
+
+    @property
+    def proxy_ssl_error_counter(self):
+        return getattr(self.local, 'proxy_ssl_error_counter', 0)
+
+    @proxy_ssl_error_counter.setter
+    def proxy_ssl_error_counter(self, proxy_ssl_error_counter):
+        self.count_error('proxy_ssl_error', proxy_ssl_error_counter)
+        self.local.proxy_ssl_error_counter = proxy_ssl_error_counter
+
+    # User agents can be given as any iterable, they are kept in a user_agent_pool.UserAgentPool.
+    @property
+    def user_agents(self):
+        return self.__user_agents
+
+    @user_agents.setter
+    def user_agents(self, user_agents):
+        if isinstance(user_agents, user_agent_pool.UserAgentPool):
+            self.__user_agents = user_agents
         else:
-            self.__max_proxy_ssl_error = max_proxy_ssl_error
+            self.__user_agents = user_agent_pool.UserAgentPool(user_agents)
 
-    def scrape(self, url):
-        self.renew_stealth()
+    # Every thread keeps its own proxy and user agent.
+    @property
+    def used_proxy(self):
+        return getattr(self.local, 'used_proxy', None)
+
+    @used_proxy.setter
+    def used_proxy(self, used_proxy):
+        self.local.used_proxy = used_proxy
+
+    @property
+    def used_user_agent(self):
+        return getattr(self.local, 'used_user_agent', None)
+
+    @property
+    def used_identity(self):
+        return getattr(self.local, 'used_identity', None)
+
+    # Positions of user agents change when other ones are removed, the used user agent is kept by value
+    # and its index is looked up in the pool.
+    @property
+    def used_user_agent_index(self):
+        return self.user_agents.position(self.used_user_agent, StealthScrapper.WRONG_INDEX)
+
+    @used_user_agent_index.setter
+    def used_user_agent_index(self, used_user_agent_index):
+        if used_user_agent_index == StealthScrapper.WRONG_INDEX:
+            self.local.used_user_agent = None
+        else:
+            self.local.used_user_agent = self.user_agents[used_user_agent_index]
+
+    def scrape(self, url, parser=parsing.HTML_PARSER, lazy=False, stream=False, sink=None):
+        parsing.validate_parser(parser)
+
+        cached_response = None if stream else self.cached_response(url)
+        if self.is_fresh(cached_response):
+            return self.parse(cached_response.content, parser, lazy)
 
         protocol = url[0:url.find(':')]
-        session = requests.Session()
-        self.prepare_stealth_session(session, protocol)
+        self.renew_stealth(protocol)
+        self.delay(url)
+        self.prepare_stealth(protocol, url)
+
+        request_start_time = self.start_request(url)
+        try:
+            source = self.get_stealth_source(url, protocol, parser, lazy, cached_response, stream, sink)
+        except Exception:
+            self.finish_request(request_start_time, 'failure')
+            raise
+        finally:
+            self.release_identity()
 
-        self.delay()
-        source = self.get_source(url, session, protocol)
-        self.update_delay_times()
+        if stream and sink is None:
+            return self.finish_stream(url, source, request_start_time)
+
+        self.finish_request(request_start_time, 'success')
+        self.update_delay_times(url)
 
         return source
 
-    def renew_stealth(self):
-        if len(self.proxy) == 0:
-            self.refresh_proxy()
-        if len(self.user_agents) == 0:
-            self.refresh_user_agents()
+    def close(self):
+        self.stop_proxy_refresher()
+        super().close()
+
+    # With a proxy refresher proxies are harvested and validated in the background,
+    # so scraping only waits when there is no proxy of a given protocol at all.
+    def start_proxy_refresher(self, check_urls=None, **kwargs):
+        if self.proxy_refresher is None:
+            kwargs.setdefault('session_pool', self.session_pool)
+            self.proxy_refresher = proxy_refresher.ProxyRefresher(self.harvest_proxy, self.proxy, check_urls, **kwargs)
+
+        self.proxy_refresher.start()
+
+    def stop_proxy_refresher(self):
+        if self.proxy_refresher is not None:
+            self.proxy_refresher.stop()
+
+    def renew_stealth(self, protocol=None):
+        if self.proxy_refresher is not None and protocol is not None:
+            if not self.proxy_refresher.wait_for_proxy(protocol, self.proxy_wait_timeout):
+                raise LackOfProxy(protocol)
+
+        with self.stealth_lock:
+            if self.proxy_refresher is None and len(self.proxy) == 0:
+                self.refresh_proxy()
+            if len(self.user_agents) == 0:
+                self.refresh_user_agents()
 
     def refresh_stealth(self):
         self.refresh_proxy()
         self.refresh_user_agents()
 
     def refresh_proxy(self):
-        self.used_proxy_index = StealthScrapper.WRONG_INDEX
+        self.used_proxy = None
         self.provide_proxy()
 
     def refresh_user_agents(self):
@@ -268,143 +710,260 @@ class StealthScrapper(Scrapper):
         self.provide_user_agents()
 
     def provide_proxy(self):
-        if self.proxy_from_file:
-            self.provide_proxy_from_file()
+        proxies = self.harvest_proxy()
+        self.proxy.clear()
+        self.proxy.add_many(proxies)
+
+    # proxy_provider is a callable returning proxies from somewhere else, like leases of a distributed.Worker.
+    def harvest_proxy(self):
+        if self.proxy_provider is not None:
+            return self.proxy_provider()
+        elif self.proxy_from_file:
+            return self.harvest_proxy_from_file()
         else:
-            self.provide_proxy_from_web()
+            return self.harvest_proxy_from_web()
 
-    def provide_proxy_from_file(self):
-        self.proxy.clear()
+    # Proxy file can be in any format of file_loader.ProxyLoader, an unchanged file isn't parsed again.
+    def harvest_proxy_from_file(self):
+        return self.proxy_loader.load(StealthScrapper.PROXY_FILE_DIR)
 
-        with open(StealthScrapper.PROXY_FILE_DIR, 'r') as proxy_file:
-            for line in proxy_file.read().splitlines():
-                proxy_data = line.split(';')
-                protocol = proxy_data[0]
-                ip = proxy_data[1]
-                port = proxy_data[2]
+    # Proxies are harvested from every proxy site, see proxy_sites.ProxySite. A site that failed is skipped
+    # as long as other sites gave some proxies. Proxy lists are scraped without a proxy by the plain Scrapper path.
+    def harvest_proxy_from_web(self):
+        proxies = {}
+        error = None
 
-                if Proxy.is_valid(protocol, ip, int(port)):
-                    self.proxy.append(Proxy(protocol, ip, int(port)))
+        for proxy_site in self.harvested_proxy_sites():
+            try:
+                proxy_source = Scrapper.scrape(self, proxy_site.url, proxy_site.parser)
+                proxies.update(dict.fromkeys(self.extract_proxy_from_site(proxy_source, proxy_site)))
+            except ScrapingException as e:
+                error = e
 
-    def provide_proxy_from_web(self):
-        self.proxy.clear()
-        proxy_source = Scrapper.scrape(super(), StealthScrapper.PROXY_URL)
+        return self.harvested_proxies(proxies, error)
+
+    def harvested_proxy_sites(self):
+        if self.proxy_sites is None:
+            return [proxy_sites.ProxyTableSite(StealthScrapper.PROXY_URL)]
+
+        return self.proxy_sites
 
+    def harvested_proxies(self, proxies, error):
+        if len(proxies) > 0:
+            return list(proxies)
+        elif error is not None:
+            raise error
+
+        raise ProxyScrapingError(debug.debug_info('Proxy list is empty'))
+
+    def extract_proxy_from_site(self, proxy_source, proxy_site):
         try:
-            self.extract_proxy_from_source(proxy_source)
+            return self.extract_proxies(proxy_source, proxy_site)
         except Exception as e:
             raise ProxyScrapingError(debug.debug_info(repr(e)))
 
-        if len(self.proxy) == 0:
-            raise ProxyScrapingError(debug.debug_info('Proxy list is empty'))
+    # Proxy source is the page as text, entries are extracted by a proxy site in a single pass.
+    def extract_proxies(self, proxy_source, proxy_site):
+        proxies = []
+
+        for protocol, ip, port in proxy_site.extract(proxy_source):
+            port = file_loader.parse_port(port)
+
+            if port is not None and Proxy.is_valid(protocol, ip, port):
+                proxies.append(Proxy(protocol, ip, port))
+
+        return proxies
 
+    # Former way of extraction: proxies of the free-proxy-list.net table are added to the proxy pool. The source
+    # can be the page as text or a parsed page, which is turned back into text.
     def extract_proxy_from_source(self, proxy_source):
-        for item in proxy_source.select('tbody tr'):
-            if len(item.select('td')) > 6:
-                ip = item.select('td')[0].text
-                port = item.select('td')[1].text
-                protocol = Proxy.HTTP if item.select('td')[6].text == 'no' else Proxy.HTTPS
+        if not isinstance(proxy_source, str):
+            proxy_source = str(proxy_source)
 
-                if Proxy.is_valid(protocol, ip, int(port)):
-                    self.proxy.append(Proxy(protocol, ip, int(port)))
+        self.proxy.add_many(self.extract_proxies(proxy_source, proxy_sites.ProxyTableSite(StealthScrapper.PROXY_URL)))
 
     def provide_user_agents(self):
         self.user_agents.clear()
+        self.user_agents.add_many(self.user_agent_loader.load(StealthScrapper.USER_AGENTS_FILE_DIR))
 
-        with open(StealthScrapper.USER_AGENTS_FILE_DIR, 'r') as user_agents_file:
-            for line in user_agents_file.read().splitlines():
-                self.user_agents.append(line)
+    def prepare_stealth(self, protocol, url=None):
+        with self.stealth_lock:
+            if self.identity_pool is not None and url is not None:
+                self.prepare_identity(protocol, url)
+                return
+
+            self.local.used_identity = None
+
+            if self.change_stealth or self.stealth_change_required():
+                self.draw_proxy(protocol)
+                self.draw_user_agent()
+
+    # With an identity pool a host is scraped with the same proxy, user agent and session until the identity
+    # is used up or its proxy or user agent is gone, see identity_pool.IdentityPool.
+    # The identity is checked out until release_identity, so another thread that retires it meanwhile doesn't
+    # close its session in the middle of a request.
+    def prepare_identity(self, protocol, url):
+        key = (protocol, pacing.host(url))
+        identity = self.identity_pool.acquire(key)
+
+        if identity is None or identity.proxy not in self.proxy or identity.user_agent not in self.user_agents:
+            if identity is not None:
+                self.identity_pool.release(identity)
 
-    def prepare_stealth_session(self, session, protocol):
-        if self.change_stealth or self.stealth_change_required():
             self.draw_proxy(protocol)
             self.draw_user_agent()
+            identity = self.lease_identity(key)
+        else:
+            self.used_proxy = identity.proxy
+            self.local.used_user_agent = identity.user_agent
+
+        self.local.used_identity = identity
+
+    def lease_identity(self, key):
+        identity, retired_identities = self.identity_pool.lease(key, self.used_proxy, self.used_user_agent)
+        self.metrics.increment('identities_total', protocol=identity.protocol)
+
+        for retired_identity in retired_identities:
+            self.close_identity(retired_identity)
+
+        return identity
+
+    def release_identity(self):
+        identity = self.used_identity
+        self.local.used_identity = None
 
-        session.proxies = {self.proxy[self.used_proxy_index].protocol: self.proxy[self.used_proxy_index].address()}
-        session.headers = {'User-Agent': self.user_agents[self.used_user_agent_index]}
+        if identity is not None and self.identity_pool.release(identity):
+            self.close_identity(identity)
+
+    # Cookies and connections of an identity go away with it, once no request uses it.
+    def close_identity(self, identity):
+        self.session_pool.remove(identity.proxy.address(), identity.protocol, identity.id)
+
+    # Errors change the proxy or the user agent, the identity is changed with them, so its cookies don't follow
+    # another proxy. Returns the id of the identity session or None without an identity.
+    def session_identity(self):
+        identity = self.used_identity
+
+        if identity is None:
+            return None
+
+        if identity.proxy != self.used_proxy or identity.user_agent != self.used_user_agent:
+            with self.stealth_lock:
+                self.release_identity()
+                identity = self.lease_identity(identity.key)
+
+            self.local.used_identity = identity
+
+        return identity.id
 
     def stealth_change_required(self):
-        return self.used_proxy_index == StealthScrapper.WRONG_INDEX or \
-               self.used_user_agent_index == StealthScrapper.WRONG_INDEX
+        return self.used_proxy not in self.proxy or self.used_user_agent not in self.user_agents
 
+    # Proxies are drawn according to their health, see proxy_pool.ProxyPool.
     def draw_proxy(self, protocol):
-        protocol_proxy_indexes = [i for i, x in enumerate(self.proxy) if x.protocol == protocol]
+        proxy = self.proxy.draw(protocol, self.used_proxy)
 
-        if len(protocol_proxy_indexes) == 0:
+        if proxy is None:
             raise LackOfProxy(protocol)
-        elif len(protocol_proxy_indexes) == 1:
-            self.used_proxy_index = protocol_proxy_indexes[0]
-        else:
-            previous_proxy_index = self.used_proxy_index
-            while self.used_proxy_index == previous_proxy_index:
-                self.used_proxy_index = random.choice(protocol_proxy_indexes)
 
-        return {self.proxy[self.used_proxy_index].protocol: self.proxy[self.used_proxy_index].address()}
+        self.used_proxy = proxy
+        return {proxy.protocol: proxy.address()}
 
     def draw_user_agent(self):
-        if len(self.user_agents) == 0:
+        user_agent = self.user_agents.draw(self.used_user_agent)
+
+        if user_agent is None:
             raise LackOfUserAgents()
-        elif len(self.user_agents) == 1:
-            self.used_user_agent_index = 0
-        else:
-            previous_user_agent_index = self.used_user_agent_index
-            while self.used_user_agent_index == previous_user_agent_index:
-                self.used_user_agent_index = random.randint(0, len(self.user_agents)-1)
 
-        return {'User-Agent': self.user_agents[self.used_user_agent_index]}
+        self.local.used_user_agent = user_agent
+        return {'User-Agent': user_agent}
+
+    # Sessions are pooled per proxy (and per identity with an identity pool), so connections to the proxy are kept
+    # alive between requests. User agent is passed with every request, because a session can be shared by many
+    # threads.
+    def get_stealth_source(self, url, protocol, parser=parsing.HTML_PARSER, lazy=False, cached_response=None,
+                           stream=False, sink=None):
+        headers = response_cache.ResponseCache.conditional_headers(cached_response)
+        retry_state = self.start_retries()
 
-    def get_source(self, url, session, protocol):
         while True:
+            proxy = self.used_proxy
+
             try:
-                with session.get(url, timeout=self.timeout) as source:
-                    source.encoding = 'utf-8'
+                request_start_time = time.monotonic()
+                source = self.session_pool.get(url, proxy.address(), protocol, timeout=self.timeout,
+                                               headers={'User-Agent': self.used_user_agent, **headers}, stream=stream,
+                                               identity=self.session_identity())
+
+                if stream:
+                    self.record_response(url, source.status_code, source.headers, request_start_time,
+                                         source.elapsed.total_seconds())
+                    self.report_stealth_success(proxy, source.elapsed.total_seconds())
+                    self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter',
+                                              'connection_error_counter', 'proxy_ssl_error_counter')
+                    return self.stream_source(source, sink,
+                                              lambda: self.handle_proxy_chunked_encoding_error(protocol))
+
+                with source:
+                    body = source.content
+                    self.record_response(url, source.status_code, source.headers, request_start_time,
+                                         source.elapsed.total_seconds())
+                    self.record_transfer(source, body)
+                    self.store_page(url, source.status_code, source.headers, body)
+                    content = self.source_content(url, source.status_code, source.headers, body, cached_response)
+                    self.report_stealth_success(proxy, source.elapsed.total_seconds())
                     self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter',
                                               'connection_error_counter', 'proxy_ssl_error_counter',
                                               'chunked_encoding_error_counter')
-                    return BeautifulSoup(source.text, features="html.parser")
+                    return self.parse(content, parser, lazy)
             except requests.exceptions.ConnectTimeout:
-                self.handle_connect_timeout(session, protocol)
+                self.handle_proxy_connect_timeout(protocol)
             except requests.exceptions.ProxyError:
-                self.handle_proxy_error(session, protocol)
+                self.handle_proxy_error(protocol)
             except requests.exceptions.InvalidHeader:
-                self.handle_invalid_header(session)
+                self.handle_invalid_header()
             except requests.ReadTimeout:
-                self.handle_read_timeout(session, protocol)
+                self.handle_proxy_read_timeout(protocol)
             except requests.exceptions.SSLError:
-                self.handle_ssl_error(url, session, protocol)
+                self.handle_proxy_ssl_error(url, protocol)
             except requests.exceptions.ConnectionError:
-                self.handle_connection_error(session, protocol)
+                self.handle_proxy_connection_error(protocol)
             except requests.exceptions.ChunkedEncodingError:
-                self.handle_chunked_encoding_error(session, protocol)
+                self.handle_proxy_chunked_encoding_error(protocol)
             except requests.exceptions.RequestException as e:
                 raise StealthScrapingException(f'Undefined requests error: {str(e)}')
 
-    def handle_connect_timeout(self, session, protocol):
+            self.wait_before_retry(url, retry_state)
+
+    def handle_proxy_connect_timeout(self, protocol):
         self.connect_timeout_counter += 1
-        self.proxy_connect_timeout(f'{str(self.proxy[self.used_proxy_index])} '
+        self.proxy_connect_timeout(f'{str(self.used_proxy)} '
                                    f'{self.connect_timeout_counter}/{self.max_connect_timeout}')
 
         if self.connect_timeout_counter >= self.max_connect_timeout:
             self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
                                       'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
-            self.remove_proxy(self.used_proxy_index, protocol)
-            session.proxies = self.draw_proxy(protocol)
+            self.penalize_proxy(self.used_proxy, protocol)
+            self.draw_proxy(protocol)
 
-    def handle_proxy_error(self, session, protocol):
-        self.proxy_error(str(self.proxy[self.used_proxy_index]))
-        self.remove_proxy(self.used_proxy_index, protocol)
+    def handle_proxy_error(self, protocol):
+        self.count_error('proxy_error')
+        self.proxy_error(str(self.used_proxy))
+        self.penalize_proxy(self.used_proxy, protocol)
         self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
                                   'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
-        session.proxies = self.draw_proxy(protocol)
+        self.draw_proxy(protocol)
 
-    def handle_invalid_header(self, session):
-        self.invalid_user_agent(self.user_agents[self.used_user_agent_index])
-        self.remove_user_agent(self.used_user_agent_index)
+    def handle_invalid_header(self):
+        self.count_error('invalid_user_agent')
+        self.count_stealth('user_agent_requests_total', 'invalid', user_agent=self.used_user_agent)
+        self.invalid_user_agent(self.used_user_agent)
+        self.remove_user_agent(self.used_user_agent)
         self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
                                   'proxy_ssl_error_counter', 'chunked_encoding_error_counter')
-        session.headers = self.draw_user_agent()
+        self.draw_user_agent()
 
-    def handle_read_timeout(self, session, protocol):
+    def handle_proxy_read_timeout(self, protocol):
         self.read_timeout_counter += 1
         self.proxy_read_timeout(f'{self.read_timeout_counter}/{self.max_read_timeout}')
 
@@ -415,12 +974,12 @@ class StealthScrapper(Scrapper):
 
         self.reset_error_counters('connect_timeout_counter', 'connection_error_counter', 'proxy_ssl_error_counter',
                                   'chunked_encoding_error_counter')
-        self.remove_proxy(self.used_proxy_index, protocol)
-        session.proxies = self.draw_proxy(protocol)
+        self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
 
-    def handle_ssl_error(self, url, session, protocol):
+    def handle_proxy_ssl_error(self, url, protocol):
         self.proxy_ssl_error_counter += 1
-        self.proxy_ssl_error(f'{str(self.proxy[self.used_proxy_index])} {self.proxy_ssl_error_counter}/'
+        self.proxy_ssl_error(f'{str(self.used_proxy)} {self.proxy_ssl_error_counter}/'
                              f'{self.max_proxy_ssl_error}', url)
 
         if self.proxy_ssl_error_counter >= self.max_proxy_ssl_error:
@@ -430,10 +989,10 @@ class StealthScrapper(Scrapper):
 
         self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'connection_error_counter',
                                   'chunked_encoding_error_counter')
-        self.remove_proxy(self.used_proxy_index, protocol)
-        session.proxies = self.draw_proxy(protocol)
+        self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
 
-    def handle_connection_error(self, session, protocol):
+    def handle_proxy_connection_error(self, protocol):
         self.connection_error_counter += 1
         self.proxy_connection_error(f'{self.connection_error_counter}/{self.max_connection_error}')
 
@@ -444,10 +1003,10 @@ class StealthScrapper(Scrapper):
 
         self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'proxy_ssl_error_counter',
                                   'chunked_encoding_error_counter')
-        self.remove_proxy(self.used_proxy_index, protocol)
-        session.proxies = self.draw_proxy(protocol)
+        self.penalize_proxy(self.used_proxy, protocol)
+        self.draw_proxy(protocol)
 
-    def handle_chunked_encoding_error(self, session, protocol):
+    def handle_proxy_chunked_encoding_error(self, protocol):
         self.chunked_encoding_error_counter += 1
         self.proxy_chunked_encoding_error(f'{self.chunked_encoding_error_counter}/{self.max_chunked_encoding_error}')
 
@@ -458,24 +1017,49 @@ class StealthScrapper(Scrapper):
 
         self.reset_error_counters('connect_timeout_counter', 'read_timeout_counter', 'proxy_ssl_error_counter',
                                   'connection_error_counter')
-        session.proxies = self.draw_proxy(protocol)
+        self.draw_proxy(protocol)
+
+    def report_stealth_success(self, proxy, latency):
+        self.proxy.report_success(proxy, latency)
+        self.count_stealth('proxy_requests_total', 'success', proxy=proxy.address())
+        self.count_stealth('user_agent_requests_total', 'success', user_agent=self.used_user_agent)
+
+    # Proxy and user agent labels make a series for every proxy and user agent, there can be hundreds of thousands
+    # of them. They are kept only with stealth_metrics set, otherwise outcomes are counted without them.
+    def count_stealth(self, name, outcome, **labels):
+        if self.stealth_metrics:
+            self.metrics.increment(name, outcome=outcome, **labels)
+        else:
+            self.metrics.increment(name, outcome=outcome)
 
-    def remove_proxy(self, index, protocol):
-        del self.proxy[index]
+    # A failing proxy is put in cooldown, it is removed only when it keeps failing.
+    def penalize_proxy(self, proxy, protocol):
+        self.count_stealth('proxy_requests_total', 'failure', proxy=proxy.address())
 
-        if index == self.used_proxy_index:
-            self.used_proxy_index = StealthScrapper.WRONG_INDEX
+        if self.proxy.report_failure(proxy):
+            self.session_pool.remove(proxy.address(), protocol)
 
-        if len([proxy for proxy in self.proxy if proxy.protocol == protocol]) == 0:
+        if self.proxy_refresher is not None:
+            self.proxy_refresher.wake()
+
+        if self.proxy.count(protocol) == 0:
             self.proxy_exhausted(protocol)
 
-    def remove_user_agent(self, index):
-        del self.user_agents[index]
+    def remove_proxy(self, proxy, protocol):
+        self.proxy.remove(proxy)
+        self.session_pool.remove(proxy.address(), protocol)
+
+        if self.proxy_refresher is not None:
+            self.proxy_refresher.wake()
 
-        if index == self.used_user_agent_index:
-            self.used_user_agent_index = StealthScrapper.WRONG_INDEX
+        if self.proxy.count(protocol) == 0:
+            self.proxy_exhausted(protocol)
 
-        if len(self.user_agents) == 0:
+    def remove_user_agent(self, user_agent):
+        if user_agent == self.used_user_agent:
+            self.local.used_user_agent = None
+
+        if self.user_agents.remove(user_agent) and len(self.user_agents) == 0:
             self.user_agents_exhausted()
 
     @event.signal
@@ -516,6 +1100,9 @@ class StealthScrapper(Scrapper):
 
 
 class Proxy:
+    # Proxy lists can have hundreds of thousands of entries, so proxies have slots instead of dictionaries.
+    # Proxies with the same protocol, ip and port are equal, so a pool keeps every proxy once.
+    __slots__ = ('protocol', 'ip', 'port')
     HTTP = 'http'
     HTTPS = 'https'
     MIN_PORT = 0
@@ -526,6 +1113,15 @@ class Proxy:
         self.ip = ip
         self.port = port
 
+    def __eq__(self, other):
+        if not isinstance(other, Proxy):
+            return NotImplemented
+
+        return self.protocol == other.protocol and self.ip == other.ip and self.port == other.port
+
+    def __hash__(self):
+        return hash((self.protocol, self.ip, self.port))
+
     def __repr__(self):
         return f'{self.protocol}://{self.ip}:{self.port}'
 
@@ -549,11 +1145,7 @@ class Proxy:
 
     @staticmethod
     def ip_valid(ip):
-        try:
-            IPy.IP(ip)
-            return True
-        except ValueError:
-            return False
+        return file_loader.ip_valid(ip)
 
     @staticmethod
     def port_valid(port):
@@ -566,6 +1158,26 @@ class ScrapingException(Exception):
     pass
 
 
+class ContentTooLarge(ScrapingException):
+    pass
+
+
+class ContentTypeNotAllowed(ScrapingException):
+    pass
+
+
+class StreamInterrupted(ScrapingException):
+    pass
+
+
+class RetryDeadlineExceeded(ScrapingException):
+    pass
+
+
+class RetryBudgetExhausted(ScrapingException):
+    pass
+
+
 class NormalScrapingException(ScrapingException):
     pass
 
@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+
+from transport import RequestsTransport
+
+
+class SessionPool:
+    # Sessions are made by a transport, see transport.Transport. Default one is requests. A session of an identity
+    # (see identity_pool.Identity) is separate from other sessions of its proxy, so it has its own connections
+    # and cookies.
+
+    def __init__(self, max_sessions=64, pool_connections=10, pool_maxsize=10, idle_timeout=60.0, transport=None):
+        self.lock = threading.Lock()
+        self.transport = transport or RequestsTransport()
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+
+    @property
+    def max_sessions(self):
+        return self.__max_sessions
+
+    @max_sessions.setter
+    def max_sessions(self, max_sessions):
+        if max_sessions < 1:
+            self.__max_sessions = 1
+        else:
+            self.__max_sessions = max_sessions
+
+    @property
+    def pool_connections(self):
+        return self.__pool_connections
+
+    @pool_connections.setter
+    def pool_connections(self, pool_connections):
+        if pool_connections < 1:
+            self.__pool_connections = 1
+        else:
+            self.__pool_connections = pool_connections
+
+    @property
+    def pool_maxsize(self):
+        return self.__pool_maxsize
+
+    @pool_maxsize.setter
+    def pool_maxsize(self, pool_maxsize):
+        if pool_maxsize < 1:
+            self.__pool_maxsize = 1
+        else:
+            self.__pool_maxsize = pool_maxsize
+
+    @property
+    def idle_timeout(self):
+        return self.__idle_timeout
+
+    @idle_timeout.setter
+    def idle_timeout(self, idle_timeout):
+        if idle_timeout <= 0.0:
+            self.__idle_timeout = 0.0
+        else:
+            self.__idle_timeout = idle_timeout
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Sessions are kept in least recently used order, so both idle and surplus sessions are always at the front
+    # of the dictionary. A session is checked out while a request of it runs and a streamed response is open,
+    # one that was evicted or removed meanwhile is closed when its last user releases it.
+    def acquire(self, proxy=None, protocol=None, identity=None):
+        key = (proxy, protocol, identity)
+
+        with self.lock:
+            now = time.monotonic()
+            pooled_session = self.sessions.get(key)
+
+            if pooled_session is None:
+                pooled_session = PooledSession(self.create_session(proxy), now)
+                self.sessions[key] = pooled_session
+            else:
+                pooled_session.last_used = now
+                self.sessions.move_to_end(key)
+
+            pooled_session.users += 1
+            evicted_sessions = self.evict_sessions(now)
+
+        for evicted_session in evicted_sessions:
+            evicted_session.close()
+
+        return pooled_session
+
+    def release(self, pooled_session):
+        with self.lock:
+            pooled_session.users -= 1
+            closed = pooled_session.retired and pooled_session.users == 0
+
+        if closed:
+            pooled_session.session.close()
+
+    def create_session(self, proxy=None):
+        return self.transport.create_session(proxy, self.pool_connections, self.pool_maxsize)
+
+    def get(self, url, proxy=None, protocol=None, timeout=None, headers=None, stream=False, identity=None):
+        pooled_session = self.acquire(proxy, protocol, identity)
+
+        try:
+            response = self.transport.get(pooled_session.session, url, timeout, headers, stream, proxy, protocol)
+        except BaseException:
+            self.release(pooled_session)
+            raise
+
+        if not stream:
+            self.release(pooled_session)
+            return response
+
+        return PooledResponse(response, self, pooled_session)
+
+    # With idle_timeout of 0 sessions are evicted only when there are more than max_sessions of them.
+    def evict_sessions(self, now):
+        evicted_sessions = []
+
+        while self.sessions:
+            key, pooled_session = next(iter(self.sessions.items()))
+
+            if len(self.sessions) <= self.max_sessions and \
+                    (self.idle_timeout == 0.0 or now - pooled_session.last_used < self.idle_timeout):
+                break
+
+            del self.sessions[key]
+            evicted_sessions += self.retire(pooled_session)
+
+        return evicted_sessions
+
+    def retire(self, pooled_session):
+        pooled_session.retired = True
+
+        return [pooled_session.session] if pooled_session.users == 0 else []
+
+    def remove(self, proxy=None, protocol=None, identity=None):
+        with self.lock:
+            pooled_session = self.sessions.pop((proxy, protocol, identity), None)
+            removed_sessions = [] if pooled_session is None else self.retire(pooled_session)
+
+        for removed_session in removed_sessions:
+            removed_session.close()
+
+    def close(self):
+        with self.lock:
+            closed_sessions = [session for pooled_session in self.sessions.values()
+                               for session in self.retire(pooled_session)]
+            self.sessions.clear()
+
+        for session in closed_sessions:
+            session.close()
+
+
+class PooledSession:
+
+    def __init__(self, session, last_used):
+        self.session = session
+        self.last_used = last_used
+        self.users = 0
+        self.retired = False
+
+
+class PooledResponse:
+    # Streamed response that keeps its session checked out until it is closed. Everything else is the response.
+
+    def __init__(self, response, session_pool, pooled_session):
+        self.response = response
+        self.session_pool = session_pool
+        self.pooled_session = pooled_session
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.response.close()
+
+        if self.pooled_session is not None:
+            self.session_pool.release(self.pooled_session)
+            self.pooled_session = None
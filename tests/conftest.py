@@ -0,0 +1,90 @@
+import os
+import socket
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+
+class PageServer:
+    # Local HTTP server serving pages by path. A page is a body or a (status, headers, body) tuple,
+    # requests and their headers are recorded by path. Requests sent to it as a proxy are served by url.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.requests = {}
+        self.headers = {}
+        self.server = PageHTTPServer(('127.0.0.1', 0), PageRequestHandler)
+        self.server.daemon_threads = True
+        self.server.page_server = self
+        self.thread = None
+
+    def url(self, path='/'):
+        return f'http://127.0.0.1:{self.server.server_address[1]}{path}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def page(self, path, headers):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.headers.setdefault(path, []).append(headers)
+
+        page = self.pages.get(path, (404, {}, b'not found'))
+        if isinstance(page, bytes):
+            return 200, {'Content-Type': 'text/html'}, page
+
+        return page
+
+
+class PageHTTPServer(ThreadingHTTPServer):
+
+    # Clients of tests close connections on purpose, the default handler would print their tracebacks.
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class PageRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, headers, body = self.server.page_server.page(self.path, dict(self.headers))
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def page_server():
+    server = PageServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+# Address nothing listens on, connecting to it is refused at once.
+@pytest.fixture
+def closed_url():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+
+    return f'http://127.0.0.1:{port}/'
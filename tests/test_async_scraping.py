@@ -0,0 +1,74 @@
+import asyncio
+import ssl
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+import async_scraping
+import scraping
+
+PROXIES = [scraping.Proxy(scraping.Proxy.HTTP, '10.0.0.1', 8080), scraping.Proxy(scraping.Proxy.HTTPS, '10.0.0.2', 8080)]
+
+
+class FailingClientSession:
+    # Client session whose requests fail with the given error before anything is sent.
+
+    def __init__(self, error):
+        self.error = error
+        self.closed = False
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        raise self.error
+
+    async def close(self):
+        self.closed = True
+
+
+def stealth_scrapper(error):
+    scrapper = async_scraping.AsyncStealthScrapper(min_delay=1, max_delay=2)
+    scrapper.retry_policy.base_delay = 0.0
+    scrapper.proxy.add_many(PROXIES)
+    scrapper.user_agents = ['Mozilla/5.0 Test']
+    scrapper.client_session = FailingClientSession(error)
+
+    return scrapper
+
+
+async def scrape(scrapper, url):
+    try:
+        return await scrapper.scrape(url)
+    finally:
+        await scrapper.close()
+
+
+def test_certificate_error_is_a_proxy_ssl_error():
+    connection_key = SimpleNamespace(host='example.com', port=443, is_ssl=True, ssl=True)
+    error = aiohttp.ClientConnectorCertificateError(connection_key, ssl.SSLCertVerificationError('bad certificate'))
+    scrapper = stealth_scrapper(error)
+    scrapper.max_proxy_ssl_error = 1
+
+    with pytest.raises(scraping.ProxySSLError):
+        asyncio.run(scrape(scrapper, 'https://example.com/'))
+
+    assert list(scrapper.user_agents) == ['Mozilla/5.0 Test']
+
+
+def test_invalid_url_is_not_an_invalid_user_agent():
+    scrapper = stealth_scrapper(aiohttp.InvalidURL('http://[bad'))
+
+    with pytest.raises(scraping.StealthScrapingException):
+        asyncio.run(scrape(scrapper, 'http://example.com/'))
+
+    assert list(scrapper.user_agents) == ['Mozilla/5.0 Test']
+
+
+def test_refused_header_value_removes_user_agent():
+    scrapper = stealth_scrapper(ValueError('Forbidden control character detected in headers'))
+
+    with pytest.raises(scraping.LackOfUserAgents):
+        asyncio.run(scrape(scrapper, 'http://example.com/'))
+
+    assert len(scrapper.user_agents) == 0
@@ -0,0 +1,217 @@
+import functools
+import time
+
+import pytest
+
+import distributed
+import scraping
+
+SITE = {'/': b'<a href="/a">a</a><a href="/b">b</a>', '/a': b'<a href="/b">b</a><a href="/">home</a>', '/b': b'b'}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        backend = distributed.MemoryBackend()
+    else:
+        backend = distributed.SQLiteBackend(str(tmp_path / 'distributed.sqlite'))
+
+    yield backend
+    backend.close()
+
+
+def claim_expired(backend):
+    backend.add_many(['http://example.com/'])
+    item, = backend.claim('old', 1, -1.0)
+    new_item, = backend.claim('new', 1, 60.0)
+
+    return item, new_item
+
+
+def test_expired_lease_is_claimed_again(backend):
+    item, new_item = claim_expired(backend)
+
+    assert new_item.id == item.id
+    assert backend.in_progress_count() == 1
+
+
+def test_late_done_of_former_lease_holder_is_ignored(backend):
+    item, new_item = claim_expired(backend)
+    backend.done(item, worker_id='old')
+
+    assert backend.in_progress_count() == 1
+
+    backend.done(new_item, worker_id='new')
+
+    assert backend.in_progress_count() == 0
+    assert backend.pending_count() == 0
+
+
+def test_late_retry_of_former_lease_holder_is_ignored(backend):
+    item, _ = claim_expired(backend)
+    backend.retry(item, worker_id='old')
+
+    assert backend.pending_count() == 0
+    assert backend.claim('other', 1, 60.0) == []
+
+
+def test_claim_skips_urls_finished_while_queued():
+    backend = distributed.MemoryBackend()
+    backend.add_many(['http://example.com/', 'http://example.com/other'])
+    item, _ = backend.claim('worker', 2, 60.0)
+    backend.release('worker')
+    backend.done(item)
+
+    assert [claimed.url for claimed in backend.claim('worker', 2, 60.0)] == ['http://example.com/other']
+
+
+def test_backend_needs_all_methods():
+    with pytest.raises(TypeError):
+        distributed.Backend()
+
+
+def serve_site(page_server, proxied=False):
+    for path, page in SITE.items():
+        page_server.pages[page_server.url(path) if proxied else path] = page
+
+    return [page_server.url(path) for path in sorted(SITE)]
+
+
+def make_scrapper(stealth=False):
+    scrapper = (scraping.StealthScrapper if stealth else scraping.Scrapper)(min_delay=1, max_delay=2, timeout=1.0)
+    scrapper.retry_policy.base_delay = 0.0
+
+    if stealth:
+        scrapper.user_agents = ['Mozilla/5.0 (X11; Linux x86_64) Test/1.0']
+
+    return scrapper
+
+
+def page_server_proxy(page_server):
+    return scraping.Proxy(scraping.Proxy.HTTP, '127.0.0.1', page_server.server.server_address[1])
+
+
+@pytest.mark.parametrize('stealth', [False, True])
+def test_worker_crawls_site(backend, page_server, stealth):
+    urls = serve_site(page_server, proxied=stealth)
+    backend.add_many([page_server.url('/')])
+
+    if stealth:
+        backend.add_proxies([page_server_proxy(page_server)])
+
+    with make_scrapper(stealth) as scrapper:
+        results = list(distributed.Worker(backend, scrapper, idle_wait=0.01).crawl(max_workers=2))
+
+    assert sorted(url for url, _, exception in results if exception is None) == urls
+    assert sorted(page_server.requests.values()) == [1, 1, 1]
+    assert (backend.pending_count(), backend.in_progress_count()) == (0, 0)
+
+    if stealth:
+        assert len(backend.lease_proxies('other', scraping.Proxy.HTTP, 10, 60.0)) == 1
+
+
+def test_worker_retries_failed_url_until_max_attempts(backend, closed_url):
+    backend.add_many([closed_url])
+
+    with make_scrapper() as scrapper:
+        scrapper.max_connection_error = 1
+        results = list(distributed.Worker(backend, scrapper, idle_wait=0.01).crawl(max_attempts=2))
+
+    assert [type(exception) for _, _, exception in results] == [scraping.ConnectionErrorOccurred] * 2
+    assert (backend.pending_count(), backend.in_progress_count()) == (0, 0)
+
+
+def test_idle_worker_waits_for_lease_of_stopped_worker_to_end(backend, page_server):
+    serve_site(page_server)
+    backend.add_many([page_server.url('/b')])
+    backend.claim('stopped', 1, 0.2)
+
+    with make_scrapper() as scrapper:
+        results = list(distributed.Worker(backend, scrapper, idle_wait=0.05).crawl())
+
+    assert [url for url, _, _ in results] == [page_server.url('/b')]
+
+
+def test_worker_leases_drops_and_refills_proxies(backend):
+    backend.add_proxies([(scraping.Proxy.HTTP, f'10.0.0.{number}', 8080) for number in range(1, 6)])
+    scrapper = make_scrapper(stealth=True)
+    worker = distributed.Worker(backend, scrapper, proxies_per_worker=4)
+    scrapper.proxy.add_many(worker.provide_proxies())
+
+    assert len(scrapper.proxy) == 4
+
+    for proxy in list(scrapper.proxy)[:3]:
+        scrapper.proxy.remove(proxy)
+
+    worker.refill_proxies()
+
+    assert backend.proxy_count() == 2
+    assert len(scrapper.proxy) == 2
+    assert len(worker.leased_proxies) == 2
+    assert backend.lease_proxies('other', scraping.Proxy.HTTP, 10, 60.0) == []
+
+
+def test_renewed_leases_outlive_their_lease_time(backend):
+    backend.add_many(['http://example.com/'])
+    backend.add_proxies([(scraping.Proxy.HTTP, '10.0.0.1', 8080)])
+    worker = distributed.Worker(backend, make_scrapper(stealth=True), lease_time=0.6)
+    backend.claim(worker.worker_id, 1, worker.lease_time)
+    worker.provide_proxies()
+    time.sleep(0.3)
+    worker.renewal_time = 0.0
+    worker.renew_leases()
+    time.sleep(0.4)
+
+    assert backend.claim('other', 1, 60.0) == []
+    assert backend.lease_proxies('other', scraping.Proxy.HTTP, 1, 60.0) == []
+
+
+def test_pending_count_skips_finished_and_claimed_urls():
+    backend = distributed.MemoryBackend()
+    backend.add_many(['http://example.com/', 'http://example.com/other'])
+    item, _ = backend.claim('worker', 2, 60.0)
+    backend.release('worker')
+    backend.done(item)
+    backend.claim('worker', 1, 60.0)
+    backend.release('worker')
+
+    assert backend.pending_count() == 1
+
+
+def test_shared_rate_limiter_spaces_requests_of_all_workers(backend):
+    assert distributed.SharedRateLimiter(backend).reserve('a.com', 10.0) == 0.0
+    assert distributed.SharedRateLimiter(backend).reserve('a.com', 10.0) == pytest.approx(10.0, abs=0.5)
+    assert distributed.SharedRateLimiter(backend).reserve('b.com', 10.0) == 0.0
+
+
+def test_worker_crawls_through_backend_server(page_server):
+    urls = serve_site(page_server)
+
+    with distributed.BackendServer() as server:
+        backend = distributed.connect_backend(server.address)
+        backend.add_many([page_server.url('/')])
+
+        with make_scrapper() as scrapper:
+            results = list(distributed.Worker(backend, scrapper, idle_wait=0.01).crawl(max_workers=2))
+
+        assert server.backend.seen_count() == 3
+
+    assert sorted(url for url, _, _ in results) == urls
+
+
+def test_coordinator_shares_crawl_between_processes(tmp_path, page_server):
+    serve_site(page_server)
+    path = str(tmp_path / 'distributed.sqlite')
+
+    with distributed.SQLiteBackend(path) as backend:
+        backend.add_many([page_server.url('/')])
+
+    coordinator = distributed.Coordinator(functools.partial(distributed.SQLiteBackend, path),
+                                          functools.partial(scraping.Scrapper, min_delay=1, max_delay=2), 2,
+                                          idle_wait=0.01)
+    coordinator.start()
+    statistics = coordinator.join()
+
+    assert len(statistics) == 2
+    assert sum(scraped for _, scraped, _ in statistics) == 3
+    assert sorted(page_server.requests.values()) == [1, 1, 1]
@@ -0,0 +1,177 @@
+import asyncio
+import gc
+import threading
+
+import pytest
+
+import event
+
+
+class Emitter(event.Subject):
+
+    @event.signal
+    def changed(self, value):
+        pass
+
+    @event.async_signal
+    def async_changed(self, value):
+        pass
+
+
+class BlockedObserver:
+    # Observer that holds the dispatcher thread on its first call until it is released.
+
+    def __init__(self):
+        self.values = []
+        self.called = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, value):
+        self.values.append(value)
+        self.called.set()
+        self.released.wait(5.0)
+
+
+def fill_dispatcher(overflow, values, max_size=2):
+    dispatcher = event.QueuedDispatcher(max_size=max_size, overflow=overflow)
+    emitter = Emitter()
+    observer = BlockedObserver()
+    event.connect(emitter, emitter.changed, observer, delivery=event.QUEUED, dispatcher=dispatcher)
+
+    emitter.changed('first')
+    assert observer.called.wait(5.0)
+    for value in values:
+        emitter.changed(value)
+
+    return dispatcher, emitter, observer
+
+
+def test_sync_observers_take_as_many_arguments_as_they_have_parameters():
+    emitter = Emitter()
+    calls = []
+    event.connect(emitter, emitter.changed, lambda: calls.append('none'))
+    event.connect(emitter, emitter.changed, lambda value: calls.append(value))
+
+    emitter.changed('value')
+
+    assert calls == ['none', 'value']
+
+
+def test_observer_is_connected_once():
+    emitter = Emitter()
+    event.connect(emitter, emitter.changed, print)
+
+    with pytest.raises(event.DuplicateObserver):
+        event.connect(emitter, emitter.changed, print)
+
+
+def test_weak_observer_is_dropped_with_its_object():
+    emitter = Emitter()
+    observer = BlockedObserver()
+    observer.released.set()
+    event.connect(emitter, emitter.changed, observer.__call__, weak=True)
+
+    emitter.changed(1)
+    del observer
+    gc.collect()
+    emitter.changed(2)
+
+    assert emitter.events['changed'].observers == ()
+
+
+def test_drop_policy_drops_new_emissions_when_queue_is_full():
+    dispatcher, _, observer = fill_dispatcher(event.DROP, ['a', 'b', 'c'])
+    observer.released.set()
+    dispatcher.stop()
+
+    assert observer.values == ['first', 'a', 'b']
+    assert dispatcher.stats()['dropped'] == 1
+
+
+def test_coalesce_policy_keeps_latest_emission_of_observer():
+    dispatcher, _, observer = fill_dispatcher(event.COALESCE, ['a', 'b', 'c'])
+    observer.released.set()
+    dispatcher.stop()
+
+    assert observer.values == ['first', 'c']
+    assert dispatcher.stats()['coalesced'] == 2
+
+
+def test_block_policy_waits_for_free_place():
+    dispatcher, emitter, observer = fill_dispatcher(event.BLOCK, ['a'], max_size=1)
+    emitter_thread = threading.Thread(target=emitter.changed, args=('b',))
+    emitter_thread.start()
+    emitter_thread.join(0.2)
+
+    assert emitter_thread.is_alive()
+    observer.released.set()
+    emitter_thread.join(5.0)
+    dispatcher.stop()
+
+    assert observer.values == ['first', 'a', 'b']
+    assert dispatcher.stats()['dropped'] == 0
+
+
+def test_stopped_dispatcher_delivers_later_emissions():
+    dispatcher = event.QueuedDispatcher()
+    emitter = Emitter()
+    values = []
+    event.connect(emitter, emitter.changed, values.append, delivery=event.QUEUED, dispatcher=dispatcher)
+
+    emitter.changed(1)
+    dispatcher.stop()
+    emitter.changed(2)
+    dispatcher.stop()
+
+    assert values == [1, 2]
+
+
+def test_default_dispatcher_works_after_stop():
+    emitter = Emitter()
+    values = []
+    event.connect(emitter, emitter.changed, values.append, delivery=event.QUEUED)
+
+    event.QueuedDispatcher.default().stop()
+    emitter.changed(1)
+    event.QueuedDispatcher.default().stop()
+
+    assert values == [1]
+
+
+def test_coroutine_observer_of_sync_signal_is_rejected():
+    async def observer(value):
+        pass
+
+    emitter = Emitter()
+
+    with pytest.raises(event.AsyncObserverNotAwaited):
+        event.connect(emitter, emitter.changed, observer)
+    with pytest.raises(event.AsyncObserverNotAwaited):
+        event.connect(emitter, emitter.changed, observer, delivery=event.QUEUED,
+                      dispatcher=event.QueuedDispatcher())
+
+
+def test_coroutine_observers_are_awaited_by_async_signals_and_asyncio_delivery():
+    emitter = Emitter()
+    values = []
+
+    async def observer(value):
+        await asyncio.sleep(0)
+        values.append(value)
+
+    async def main():
+        event.connect(emitter, emitter.async_changed, observer)
+        event.connect(emitter, emitter.changed, observer, delivery=event.ASYNCIO)
+
+        await emitter.async_changed('async')
+        emitter.changed('sync')
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+
+    assert values == ['async', 'sync']
+
+
+def test_dispatcher_needs_wake_and_dispatching_thread():
+    with pytest.raises(TypeError):
+        event.Dispatcher()
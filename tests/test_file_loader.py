@@ -0,0 +1,15 @@
+import pytest
+
+import file_loader
+
+
+def test_file_loader_needs_parse():
+    with pytest.raises(TypeError):
+        file_loader.FileLoader()
+
+
+def test_user_agent_loader_skips_blank_and_repeated_lines(tmp_path):
+    path = tmp_path / 'user_agents.txt'
+    path.write_text('first\n\nsecond\nfirst\n')
+
+    assert file_loader.UserAgentLoader().load(str(path)) == ('first', 'second')
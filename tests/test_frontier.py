@@ -0,0 +1,119 @@
+import threading
+
+import frontier
+import parsing
+import scraping
+
+
+def make_frontier(tmp_path, **kwargs):
+    return frontier.Frontier(str(tmp_path / 'frontier.sqlite'), **kwargs)
+
+
+def crawl_scrapper():
+    scrapper = scraping.Scrapper(min_delay=1, max_delay=2, timeout=1.0)
+    scrapper.retry_policy.base_delay = 0.0
+
+    return scrapper
+
+
+def test_canonical_urls_are_added_once(tmp_path):
+    with make_frontier(tmp_path) as queue:
+        assert queue.add('http://Example.com/page#top') is True
+        assert queue.add('HTTP://example.com/page') is False
+        assert queue.add_many(['http://example.com', 'http://example.com/', 'http://example.com/?q=1']) == 2
+
+        assert len(queue) == 3
+        assert 'http://EXAMPLE.com/page#bottom' in queue
+
+
+def test_urls_are_popped_by_priority_then_in_order(tmp_path):
+    with make_frontier(tmp_path) as queue:
+        queue.add_many(['http://a.com/1', 'http://a.com/2'])
+        queue.add_many([('http://a.com/3', 5), 'http://a.com/4'], priority=1)
+
+        assert [queue.pop().url for _ in range(4)] == ['http://a.com/3', 'http://a.com/4', 'http://a.com/1',
+                                                       'http://a.com/2']
+        assert queue.pop() is None
+
+
+def test_links_deeper_than_max_depth_are_dropped(tmp_path):
+    with make_frontier(tmp_path, max_depth=1) as queue:
+        assert queue.add('http://a.com/', depth=2) is False
+        assert queue.add('http://a.com/', depth=1) is True
+
+
+def test_seen_urls_and_unfinished_items_survive_reopening(tmp_path):
+    with make_frontier(tmp_path) as queue:
+        queue.add_many(['http://a.com/1', 'http://a.com/2', 'http://a.com/3'])
+        queue.done(queue.pop())
+        queue.pop()
+
+    with make_frontier(tmp_path) as queue:
+        assert queue.seen_count() == 3
+        assert queue.add('http://a.com/1') is False
+        assert [item.url for item in queue.pop_many(10)] == ['http://a.com/2', 'http://a.com/3']
+
+
+def test_crawl_follows_links_once(tmp_path, page_server):
+    page_server.pages['/'] = b'<a href="/a">a</a><a href="/b">b</a><a href="mailto:x@y.z">mail</a>'
+    page_server.pages['/a'] = b'<a href="/b">b</a><a href="/">home</a>'
+    page_server.pages['/b'] = b'<a href="/a#again">a</a>'
+
+    with make_frontier(tmp_path) as queue, crawl_scrapper() as scrapper:
+        queue.add(page_server.url('/'))
+        results = list(queue.crawl(scrapper, max_workers=2))
+
+    assert sorted(url for url, _, _ in results) == [page_server.url(path) for path in ('/', '/a', '/b')]
+    assert page_server.requests == {'/': 1, '/a': 1, '/b': 1}
+
+
+def test_crawl_retries_failed_urls_with_lower_priority(tmp_path, closed_url):
+    with make_frontier(tmp_path) as queue, crawl_scrapper() as scrapper:
+        scrapper.max_connection_error = 1
+        queue.add(closed_url, priority=3)
+        results = list(queue.crawl(scrapper, max_attempts=2))
+
+        assert [type(exception) for _, _, exception in results] == [scraping.ConnectionErrorOccurred] * 2
+        assert len(queue) == 0
+
+
+def test_urls_in_flight_stay_queued_when_crawl_is_closed(tmp_path, page_server):
+    for number in range(5):
+        page_server.pages[f'/{number}'] = b'page'
+
+    with make_frontier(tmp_path, link_extractors=()) as queue, crawl_scrapper() as scrapper:
+        queue.add_many(page_server.url(f'/{number}') for number in range(5))
+        results = queue.crawl(scrapper, max_workers=2)
+        next(results)
+        results.close()
+
+        assert len(queue) == 4
+        assert queue.pending_count() == 4
+
+
+class SlowPageScrapper:
+    # Pages by url, the slow page is scraped only after the page found last was scraped.
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.last_page_scraped = threading.Event()
+
+    def scrape(self, url, parser, lazy):
+        if url.endswith('/slow'):
+            assert self.last_page_scraped.wait(5.0)
+        elif url.endswith('/last'):
+            self.last_page_scraped.set()
+
+        return parsing.parse(self.pages[url], parser, lazy)
+
+
+def test_crawl_scrapes_links_found_while_other_pages_are_in_flight(tmp_path):
+    scrapper = SlowPageScrapper({'http://a.com/': b'<a href="/slow">slow</a><a href="/fast">fast</a>',
+                                 'http://a.com/slow': b'', 'http://a.com/fast': b'<a href="/last">last</a>',
+                                 'http://a.com/last': b''})
+
+    with make_frontier(tmp_path) as queue:
+        queue.add('http://a.com/')
+        results = [url for url, _, exception in queue.crawl(scrapper, max_workers=2) if exception is None]
+
+    assert sorted(results) == ['http://a.com/', 'http://a.com/fast', 'http://a.com/last', 'http://a.com/slow']
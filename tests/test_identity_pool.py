@@ -0,0 +1,157 @@
+import pytest
+
+import identity_pool
+import scraping
+
+KEY = ('http', 'a.com')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(identity_pool.time, 'monotonic', lambda: now[0])
+
+    return now
+
+
+def lease(pool, key=KEY, proxy='proxy', user_agent='user agent'):
+    identity, retired_identities = pool.lease(key, proxy, user_agent)
+    pool.release(identity)
+
+    return identity, retired_identities
+
+
+def test_identity_is_used_up_after_max_requests(clock):
+    pool = identity_pool.IdentityPool(max_requests=2)
+    identity, _ = lease(pool)
+
+    assert pool.acquire(KEY) is identity
+    assert identity.requests == 2
+    assert pool.acquire(KEY) is None
+
+
+def test_identity_is_used_up_after_max_age(clock):
+    pool = identity_pool.IdentityPool(max_age=10.0)
+    identity, _ = lease(pool)
+    clock[0] += 9.0
+
+    assert pool.acquire(KEY) is identity
+
+    clock[0] += 1.0
+
+    assert pool.acquire(KEY) is None
+
+
+def test_new_identity_retires_the_one_of_its_key(clock):
+    pool = identity_pool.IdentityPool()
+    identity, _ = lease(pool)
+    new_identity, retired_identities = lease(pool)
+
+    assert retired_identities == [identity] and identity.retired
+    assert pool.acquire(KEY) is new_identity
+
+
+def test_least_recently_used_identities_are_evicted(clock):
+    pool = identity_pool.IdentityPool(max_identities=2)
+    first, _ = lease(pool, ('http', 'a.com'))
+    second, _ = lease(pool, ('http', 'b.com'))
+    pool.release(pool.acquire(('http', 'a.com')))
+    _, retired_identities = lease(pool, ('http', 'c.com'))
+
+    assert retired_identities == [second]
+    assert [identity.key[1] for identity in pool.identities.values()] == ['a.com', 'c.com']
+
+
+def test_identity_in_use_is_closed_by_its_last_release(clock):
+    pool = identity_pool.IdentityPool()
+    identity, _ = lease(pool)
+    pool.acquire(KEY)
+    _, retired_identities = lease(pool)
+
+    assert retired_identities == []
+    assert pool.release(identity) is True
+
+
+def test_clear_returns_identities_nobody_uses(clock):
+    pool = identity_pool.IdentityPool()
+    idle, _ = lease(pool, ('http', 'a.com'))
+    pool.lease(('http', 'b.com'), 'proxy', 'user agent')
+
+    assert pool.clear() == [idle]
+    assert len(pool) == 0
+
+
+def test_settings_are_clamped():
+    pool = identity_pool.IdentityPool(max_requests=0, max_age=-1.0, max_identities=0)
+
+    assert (pool.max_requests, pool.max_age, pool.max_identities) == (1, 0.0, 1)
+
+
+def identity_scrapper(page_server, max_requests=20):
+    scrapper = scraping.StealthScrapper(min_delay=1, max_delay=2, timeout=1.0)
+    scrapper.user_agents = ['Mozilla/5.0 (X11; Linux x86_64) Test/1.0', 'Mozilla/5.0 (X11; Linux x86_64) Test/2.0']
+    scrapper.proxy.add_many([scraping.Proxy(scraping.Proxy.HTTP, '127.0.0.1', page_server.server.server_address[1]),
+                             scraping.Proxy(scraping.Proxy.HTTP, 'localhost', page_server.server.server_address[1])])
+    scrapper.identity_pool = identity_pool.IdentityPool(max_requests=max_requests)
+
+    for path in ('/', '/other'):
+        page_server.pages[page_server.url(path)] = b'page'
+
+    return scrapper
+
+
+def identity_sessions(scrapper):
+    return sorted(identity for _, _, identity in scrapper.session_pool.sessions)
+
+
+def test_host_is_scraped_with_its_identity(page_server):
+    with identity_scrapper(page_server) as scrapper:
+        scrapper.scrape(page_server.url('/'))
+        identity = scrapper.identity_pool.acquire(('http', f'127.0.0.1:{page_server.server.server_address[1]}'))
+        scrapper.identity_pool.release(identity)
+        scrapper.scrape(page_server.url('/other'))
+
+        assert identity.requests == 3
+        assert identity_sessions(scrapper) == [identity.id]
+        assert len({tuple(headers['User-Agent'] for headers in page_server.headers[page_server.url(path)])
+                    for path in ('/', '/other')}) == 1
+
+
+def test_identity_is_changed_when_its_proxy_is_gone(page_server):
+    with identity_scrapper(page_server) as scrapper:
+        scrapper.scrape(page_server.url('/'))
+        identity, = scrapper.identity_pool.identities.values()
+        scrapper.proxy.remove(identity.proxy)
+        scrapper.scrape(page_server.url('/'))
+        new_identity, = scrapper.identity_pool.identities.values()
+
+        assert new_identity.id != identity.id and new_identity.proxy != identity.proxy
+        assert identity_sessions(scrapper) == [new_identity.id]
+
+
+def test_session_of_identity_in_use_is_closed_when_it_is_released(page_server):
+    with identity_scrapper(page_server, max_requests=2) as scrapper:
+        scrapper.scrape(page_server.url('/'))
+        identity, = scrapper.identity_pool.identities.values()
+        scrapper.identity_pool.acquire(identity.key)
+        scrapper.scrape(page_server.url('/'))
+        new_identity, = scrapper.identity_pool.identities.values()
+
+        assert identity_sessions(scrapper) == [identity.id, new_identity.id]
+
+        scrapper.local.used_identity = identity
+        scrapper.release_identity()
+
+        assert identity_sessions(scrapper) == [new_identity.id]
+
+
+def test_identity_is_changed_when_its_user_agent_is_gone(page_server):
+    with identity_scrapper(page_server) as scrapper:
+        scrapper.scrape(page_server.url('/'))
+        identity, = scrapper.identity_pool.identities.values()
+        scrapper.user_agents.remove(identity.user_agent)
+        scrapper.scrape(page_server.url('/'))
+        new_identity, = scrapper.identity_pool.identities.values()
+
+        assert new_identity.id != identity.id and new_identity.user_agent != identity.user_agent
+        assert identity_sessions(scrapper) == [new_identity.id]
@@ -0,0 +1,90 @@
+import pytest
+
+import metrics
+
+
+def histogram(*values):
+    histogram = metrics.Histogram((1, 2, 5))
+
+    for value in values:
+        histogram.observe(value)
+
+    return histogram
+
+
+def test_values_fall_into_bucket_of_their_upper_bound():
+    assert histogram(0.5, 1, 1.5, 7).counts == [2, 1, 0, 1]
+
+
+def test_quantiles_are_interpolated_inside_their_bucket():
+    values = histogram(0.5, 1, 1.5, 7)
+
+    assert values.quantile(0.5) == 1.0
+    assert values.quantile(0.75) == 2.0
+    assert values.quantile(1.0) == 7.0
+    assert histogram().quantile(0.5) is None
+
+
+def test_default_buckets_follow_name():
+    registry = metrics.Metrics(buckets={'page_bytes': (1024,)})
+    registry.observe('request_seconds', 0.2)
+    registry.observe('attempts', 2)
+    registry.observe('page_bytes', 10)
+
+    assert registry.histogram('request_seconds').upper_bounds == metrics.SECONDS_BUCKETS
+    assert registry.histogram('attempts').upper_bounds == metrics.COUNT_BUCKETS
+    assert registry.histogram('page_bytes').upper_bounds == (1024,)
+    assert registry.histogram('missing') is None
+
+
+def test_snapshot_groups_series_by_name_and_labels():
+    registry = metrics.Metrics(buckets={'size': (1, 2, 5)})
+    registry.increment('requests_total', outcome='success')
+    registry.increment('requests_total', 2, outcome='failure')
+    registry.increment('errors_total', error='read_timeout', host='a.com')
+    registry.observe('size', 0.5)
+    registry.observe('size', 7)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot['counters'] == {'errors_total': {'error=read_timeout,host=a.com': 1},
+                                    'requests_total': {'outcome=failure': 2, 'outcome=success': 1}}
+    assert snapshot['histograms']['size'][''] == {'count': 2, 'sum': 7.5, 'mean': 3.75, 'max': 7, 'p50': 1.0,
+                                                  'p90': pytest.approx(5.0 + 2.0 * 0.8), 'p99': pytest.approx(6.96),
+                                                  'buckets': {'1.0': 1, '2.0': 0, '5.0': 0, '+Inf': 1}}
+
+
+def test_prometheus_text_format():
+    registry = metrics.Metrics(buckets={'request_seconds': (0.1, 1)})
+    registry.increment('requests_total', outcome='success')
+    registry.increment('requests_total', outcome='fail"ure')
+    registry.observe('request_seconds', 0.05)
+    registry.observe('request_seconds', 2.5)
+
+    assert registry.prometheus(prefix='test') == (
+        '# TYPE test_requests_total counter\n'
+        'test_requests_total{outcome="fail\\"ure"} 1\n'
+        'test_requests_total{outcome="success"} 1\n'
+        '# TYPE test_request_seconds histogram\n'
+        'test_request_seconds_bucket{le="0.1"} 1\n'
+        'test_request_seconds_bucket{le="1.0"} 1\n'
+        'test_request_seconds_bucket{le="+Inf"} 2\n'
+        'test_request_seconds_sum 2.55\n'
+        'test_request_seconds_count 2\n')
+
+
+def test_timer_observes_elapsed_time_and_reset_clears_everything(monkeypatch):
+    times = iter([10.0, 10.25])
+    monkeypatch.setattr(metrics.time, 'monotonic', lambda: next(times))
+    registry = metrics.Metrics()
+
+    with registry.timer('parse_seconds', parser='lxml'):
+        pass
+
+    assert registry.histogram('parse_seconds', parser='lxml').sum == 0.25
+
+    registry.increment('requests_total')
+    registry.reset()
+
+    assert registry.snapshot() == {'counters': {}, 'histograms': {}}
+    assert registry.counter('requests_total') == 0
@@ -0,0 +1,139 @@
+import datetime
+import email.utils
+
+import pytest
+
+import pacing
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pacing.time, 'monotonic', lambda: now[0])
+
+    return now
+
+
+def test_host_is_lower_case_network_location():
+    assert pacing.host('https://User@Example.COM:8080/path?q=1') == 'user@example.com:8080'
+
+
+def test_reservations_of_host_are_spaced_by_delay(clock):
+    rate_limiter = pacing.HostRateLimiter()
+
+    assert rate_limiter.reserve('a.com', 2.0) == 0.0
+    assert rate_limiter.reserve('a.com', 3.0) == 2.0
+    assert rate_limiter.reserve('a.com', 1.0) == 5.0
+
+    clock[0] += 4.0
+
+    assert rate_limiter.reserve('a.com', 1.0) == 2.0
+
+
+def test_hosts_have_their_own_delays(clock):
+    rate_limiter = pacing.HostRateLimiter()
+    rate_limiter.reserve('a.com', 10.0)
+
+    assert rate_limiter.reserve('b.com', 10.0) == 0.0
+    assert rate_limiter.reserve('a.com', 10.0) == 10.0
+
+
+def test_update_starts_delay_when_request_is_done(clock):
+    rate_limiter = pacing.HostRateLimiter()
+    rate_limiter.reserve('a.com', 1.0)
+    clock[0] += 5.0
+    rate_limiter.update('a.com', 2.0)
+
+    assert rate_limiter.reserve('a.com', 2.0) == 2.0
+
+
+def test_idle_hosts_are_evicted(clock, monkeypatch):
+    monkeypatch.setattr(pacing.HostRateLimiter, 'CLEANUP_INTERVAL', 3)
+    rate_limiter = pacing.HostRateLimiter()
+    rate_limiter.reserve('idle.com', 1.0)
+    rate_limiter.reserve('busy.com', 60.0)
+    clock[0] += 2.0
+    rate_limiter.reserve('busy.com', 60.0)
+
+    assert list(rate_limiter.hosts) == ['busy.com']
+
+
+def adaptive_delay(**kwargs):
+    return pacing.AdaptiveDelay(min_delay=0.1, max_delay=10.0, initial_delay=1.0, decrease_step=0.2, **kwargs)
+
+
+def test_fast_responses_decrease_delay_down_to_min_delay(clock):
+    delay = adaptive_delay()
+
+    assert delay.report_response('a.com', 200, 0.1) == pytest.approx(0.8)
+
+    for _ in range(10):
+        delay.report_response('a.com', 200, 0.1)
+
+    assert delay.delay('a.com') == 0.1
+    assert delay.report_response('a.com', 200, 0.1) is None
+
+
+def test_errors_and_backoff_status_codes_multiply_delay_up_to_max_delay(clock):
+    delay = adaptive_delay()
+
+    assert delay.report_error('a.com', 'read_timeout') == 2.0
+    assert delay.report_response('a.com', 429, 0.1) == 4.0
+    assert delay.report_error('a.com', 'proxy_ssl_error') is None
+
+    for _ in range(5):
+        delay.report_response('a.com', 503, 0.1)
+
+    assert delay.delay('a.com') == 10.0
+    assert delay.current_delays() == {'a.com': 10.0}
+
+
+def test_slow_response_holds_delay(clock):
+    delay = adaptive_delay()
+    delay.report_response('a.com', 200, 0.1)
+
+    assert delay.report_response('a.com', 200, 0.5) is None
+    assert delay.delay('a.com') == pytest.approx(0.8)
+
+
+def test_retry_after_is_lower_bound_until_it_passes(clock):
+    delay = adaptive_delay()
+    delay.report_response('a.com', 200, 0.1, retry_after=30.0)
+
+    assert delay.delay('a.com') == 30.0
+
+    clock[0] += 29.5
+
+    assert delay.delay('a.com') == pytest.approx(0.8)
+
+
+def test_retry_after_is_capped(clock):
+    delay = adaptive_delay(max_retry_after=5.0)
+    delay.report_response('a.com', 503, 0.1, retry_after=3600.0)
+
+    assert delay.delay('a.com') == 5.0
+
+
+def test_idle_hosts_are_forgotten(clock, monkeypatch):
+    monkeypatch.setattr(pacing.AdaptiveDelay, 'CLEANUP_INTERVAL', 3)
+    delay = adaptive_delay(idle_time=60.0)
+    delay.report_error('idle.com', 'read_timeout')
+    delay.report_response('waiting.com', 503, 0.1, retry_after=120.0)
+    clock[0] += 60.0
+    delay.delay('busy.com')
+
+    assert sorted(delay.hosts) == ['busy.com', 'waiting.com']
+    assert delay.delay('idle.com') == 1.0
+
+
+@pytest.mark.parametrize('value, seconds', [(None, None), ('120', 120.0), (' 5 ', 5.0), ('soon', None),
+                                            ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0)])
+def test_retry_after_values(value, seconds):
+    assert pacing.retry_after(value) == seconds
+
+
+def test_retry_after_http_date_in_future():
+    retry_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=90)
+    value = email.utils.format_datetime(retry_time, usegmt=True)
+
+    assert 85.0 < pacing.retry_after(value) <= 90.0
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import page_store
+
+
+def open_store(tmp_path, **kwargs):
+    return page_store.PageStore(str(tmp_path), compression=page_store.NONE, **kwargs)
+
+
+def segment_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(page_store.PageStore.SEGMENT_EXTENSION))
+
+
+def test_pages_are_read_back(tmp_path):
+    with page_store.PageStore(str(tmp_path)) as store:
+        store.put('http://a.com/', 200, {'Content-Type': 'text/html'}, b'<html>a</html>')
+        store.put('http://a.com/', 404, {}, b'gone')
+
+        page = store.get('http://a.com/')
+        assert (page.status_code, page.headers, bytes(page.content)) == (404, [], b'gone')
+        assert store.get('http://b.com/') is None
+        assert [page.status_code for page in store] == [200, 404]
+
+
+def test_repeated_headers_are_all_kept(tmp_path):
+    multidict = pytest.importorskip('multidict')
+    headers = multidict.CIMultiDict([('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2'), ('Content-Type', 'text/html')])
+
+    with open_store(tmp_path) as store:
+        store.put('http://a.com/', 200, headers, b'page')
+
+        assert store.get('http://a.com/').headers == [('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2'),
+                                                      ('Content-Type', 'text/html')]
+
+
+def test_headers_of_old_records_are_read_as_pairs():
+    assert page_store.stored_headers({'ETag': '"v1"'}) == [('ETag', '"v1"')]
+
+
+# Index entries that were still buffered when the process died are lost, records in every segment are indexed again.
+def test_crash_loses_no_index_entries_of_any_segment(tmp_path):
+    store = open_store(tmp_path, max_segment_size=4096)
+    for number in range(200):
+        store.put(f'http://a.com/{number}', 200, {}, b'x' * 100)
+
+    assert len(segment_files(tmp_path)) > 3
+
+    with open_store(tmp_path, max_segment_size=4096) as recovered_store:
+        assert len(recovered_store) == 200
+        assert all(bytes(recovered_store.get(f'http://a.com/{number}').content) == b'x' * 100
+                   for number in range(200))
+
+
+# The old record is the only one of its segment, so the segment has no index entries and is scanned again.
+def test_recovery_keeps_latest_record_of_url(tmp_path):
+    with open_store(tmp_path, max_segment_size=1024) as store:
+        store.put('http://a.com/', 200, {}, b'old')
+        store.put('http://a.com/large', 200, {}, b'x' * 2000)
+        store.put('http://a.com/', 200, {}, b'new')
+
+    assert len(segment_files(tmp_path)) == 3
+
+    with open_store(tmp_path, max_segment_size=1024) as reopened_store:
+        assert len(reopened_store) == 2
+        assert bytes(reopened_store.get('http://a.com/').content) == b'new'
+
+
+def test_record_cut_off_by_crash_is_truncated(tmp_path):
+    with open_store(tmp_path) as store:
+        store.put('http://a.com/', 200, {}, b'page')
+
+    segment_path = os.path.join(tmp_path, segment_files(tmp_path)[-1])
+    segment_size = os.path.getsize(segment_path)
+    with open(segment_path, 'ab') as segment_file:
+        segment_file.write(page_store.RECORD_MAGIC + b'cut off')
+
+    with open_store(tmp_path) as store:
+        assert os.path.getsize(segment_path) == segment_size
+        store.put('http://b.com/', 200, {}, b'next')
+
+        assert [page.url for page in store] == ['http://a.com/', 'http://b.com/']
+
+
+def test_iterate_filters_by_time_of_storing(tmp_path):
+    with open_store(tmp_path) as store:
+        store.put('http://a.com/', 200, {}, b'a')
+        since = [page.stored_at for page in store][0]
+        store.put('http://b.com/', 200, {}, b'b')
+
+        assert [page.url for page in store.iterate(until=since)] == []
+        assert [page.url for page in store.iterate(since=since)] == ['http://a.com/', 'http://b.com/']
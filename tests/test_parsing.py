@@ -0,0 +1,40 @@
+import pytest
+from bs4 import BeautifulSoup
+
+import parsing
+
+PAGE = '<html><body><p class="price">10 €</p></body></html>'.encode()
+
+
+@pytest.mark.parametrize('parser, page_type', [(parsing.RAW, bytes), (parsing.TEXT, str),
+                                               (parsing.HTML_PARSER, BeautifulSoup), (parsing.LXML, BeautifulSoup)])
+def test_parse_returns_type_of_parser(parser, page_type):
+    if parser == parsing.LXML:
+        pytest.importorskip('lxml')
+
+    assert isinstance(parsing.parse(PAGE, parser), page_type)
+
+
+def test_parse_rejects_unknown_parser():
+    with pytest.raises(parsing.UnknownParser):
+        parsing.parse(PAGE, 'xml')
+
+
+def test_raw_content_is_not_decoded(monkeypatch):
+    def decode(content):
+        raise AssertionError('decoded')
+
+    monkeypatch.setattr(parsing, 'decode', decode)
+
+    assert parsing.parse(b'\xff\xfe', parsing.RAW) == b'\xff\xfe'
+
+
+def test_lazy_soup_is_parsed_on_first_attribute_access():
+    page = parsing.parse(PAGE, lazy=True)
+
+    assert isinstance(page, parsing.LazySoup)
+    assert not page.is_parsed()
+    assert page
+    assert not page.is_parsed()
+    assert page.find('p', class_='price').text == '10 €'
+    assert page.is_parsed()
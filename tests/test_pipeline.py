@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import metrics
+import pipeline
+import scraping
+
+
+def extract_title(url, page):
+    return page.title.string
+
+
+def extract_missing(url, page):
+    return page.find('h1').string
+
+
+class PageScrapper:
+    # Raw pages by url, urls without a page fail. Urls of blocked are scraped only after release is set.
+
+    def __init__(self, pages, blocked=()):
+        self.pages = pages
+        self.blocked = blocked
+        self.release = threading.Event()
+        self.metrics = metrics.Metrics()
+        self.scraped = []
+
+    def scrape(self, url, parser):
+        assert parser == pipeline.parsing.RAW
+        self.scraped.append(url)
+
+        if url in self.blocked:
+            self.release.wait(5.0)
+        if url not in self.pages:
+            raise scraping.ConnectionErrorOccurred(f'{url} not found')
+
+        return self.pages[url]
+
+
+def page(title):
+    return f'<html><head><title>{title}</title></head></html>'.encode()
+
+
+def test_results_and_errors_of_both_stages():
+    scrapper = PageScrapper({'a': page('A'), 'b': b'<html></html>'})
+
+    with pipeline.ParsePipeline(scrapper, extract_title, max_parse_workers=1) as parse_pipeline:
+        results = {url: (result, exception) for url, result, exception in parse_pipeline.run(['a', 'b', 'c'])}
+
+    assert results['a'] == ('A', None)
+    assert results['b'][0] is None and isinstance(results['b'][1], pipeline.ExtractionError)
+    assert results['c'][0] is None and isinstance(results['c'][1], scraping.ConnectionErrorOccurred)
+    assert scrapper.metrics.snapshot()['histograms']['parse_seconds']['parser=html.parser']['count'] == 1
+
+
+def test_extraction_error_keeps_its_cause():
+    scrapper = PageScrapper({'a': page('A')})
+
+    with pipeline.ParsePipeline(scrapper, extract_missing, max_parse_workers=1) as parse_pipeline:
+        (_, _, exception), = parse_pipeline.run(['a'])
+
+    assert isinstance(exception.__cause__, AttributeError)
+
+
+def test_pending_urls_are_bounded_by_max_pending():
+    scrapper = PageScrapper({str(number): page(number) for number in range(10)})
+    pulled = []
+
+    def urls():
+        for number in range(10):
+            pulled.append(number)
+            yield str(number)
+
+    with pipeline.ParsePipeline(scrapper, extract_title, max_fetch_workers=2, max_parse_workers=1,
+                                max_pending=3) as parse_pipeline:
+        for number, _ in enumerate(parse_pipeline.run(urls()), 1):
+            assert len(pulled) - number < 3
+
+    assert len(pulled) == 10
+
+
+def test_closing_run_cancels_pending_fetches():
+    scrapper = PageScrapper({'first': page('first'), 'second': page('second'), 'third': page('third')},
+                            blocked=('second',))
+
+    with pipeline.ParsePipeline(scrapper, extract_title, max_fetch_workers=1, max_parse_workers=1,
+                                max_pending=3) as parse_pipeline:
+        results = parse_pipeline.run(['first', 'second', 'third'])
+
+        assert next(results) == ('first', 'first', None)
+
+        results.close()
+        scrapper.release.set()
+
+    assert scrapper.scraped == ['first', 'second']
+
+
+def test_max_pending_is_at_least_one():
+    with pipeline.ParsePipeline(PageScrapper({}), extract_title, max_parse_workers=1, max_pending=0) as parse_pipeline:
+        assert parse_pipeline.max_pending == 1
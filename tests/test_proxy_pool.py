@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+import proxy_pool
+import scraping
+
+
+def make_proxies(count, protocol=scraping.Proxy.HTTP):
+    return [scraping.Proxy(protocol, f'10.0.0.{number + 1}', 8080) for number in range(count)]
+
+
+def draw_counts(pool, protocol, draws, previous_proxy=None):
+    counts = {}
+
+    for _ in range(draws):
+        proxy = pool.draw(protocol, previous_proxy)
+        counts[proxy] = counts.get(proxy, 0) + 1
+
+    return counts
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(proxy_pool.time, 'monotonic', lambda: clock[0])
+
+    return clock
+
+
+def test_bucket_prefix_sums_follow_adds_updates_and_removes():
+    generator = random.Random(7)
+    bucket = proxy_pool.WeightedBucket()
+    weights = {}
+
+    for item in range(50):
+        weights[item] = generator.random()
+        bucket.add(item, weights[item])
+    for item in generator.sample(range(50), 20):
+        weights[item] = generator.choice([0.0, generator.random() * 10])
+        bucket.update(item, weights[item])
+    for item in generator.sample(range(50), 15):
+        del weights[item]
+        bucket.remove(item)
+
+    assert sorted(bucket.items) == sorted(weights)
+    for end in range(len(bucket) + 1):
+        assert bucket.prefix_sum(end) == pytest.approx(sum(weights[item] for item in bucket.items[:end]))
+
+
+def test_bucket_find_returns_item_covering_value():
+    bucket = proxy_pool.WeightedBucket()
+    bucket.extend([('a', 1.0), ('b', 0.0), ('c', 2.0), ('d', 0.0)])
+
+    assert [bucket.find(value) for value in (0.0, 0.99, 1.0, 2.5, 2.99)] == ['a', 'a', 'c', 'c', 'c']
+
+
+def test_draw_follows_weights_and_skips_previous_proxy():
+    pool = proxy_pool.ProxyPool()
+    fast, slow = make_proxies(2)
+    pool.add_many([fast, slow])
+    pool.report_success(fast, 0.1)
+    pool.report_success(slow, 1.0)
+
+    counts = draw_counts(pool, scraping.Proxy.HTTP, 2000)
+
+    assert counts[fast] > 5 * counts[slow]
+    assert draw_counts(pool, scraping.Proxy.HTTP, 100, previous_proxy=fast) == {slow: 100}
+    assert pool.draw(scraping.Proxy.HTTPS) is None
+
+
+def test_failing_proxy_cools_down_until_released(clock):
+    pool = proxy_pool.ProxyPool(base_cooldown=30.0)
+    failing, healthy = make_proxies(2)
+    pool.add_many([failing, healthy])
+
+    assert pool.report_failure(failing) is False
+    assert draw_counts(pool, scraping.Proxy.HTTP, 100) == {healthy: 100}
+
+    clock[0] += 30.0
+    assert failing in draw_counts(pool, scraping.Proxy.HTTP, 200)
+
+
+def test_earliest_cooldown_is_released_when_all_proxies_cool_down(clock):
+    pool = proxy_pool.ProxyPool(base_cooldown=30.0)
+    first, second = make_proxies(2)
+    pool.add_many([first, second])
+    pool.report_failure(first)
+    clock[0] += 1.0
+    pool.report_failure(second)
+
+    assert pool.draw(scraping.Proxy.HTTP) == first
+    assert pool.proxy_health(second).cooldown_until is not None
+
+
+def test_stale_cooldown_doesnt_release_proxy_early(clock):
+    pool = proxy_pool.ProxyPool(base_cooldown=30.0)
+    proxy, other = make_proxies(2)
+    pool.add_many([proxy, other])
+    pool.report_failure(proxy)
+    pool.report_success(proxy, 0.5)
+    clock[0] += 10.0
+    pool.report_failure(proxy)
+
+    clock[0] += 25.0
+    assert draw_counts(pool, scraping.Proxy.HTTP, 100) == {other: 100}
+
+
+def test_proxy_failing_too_many_times_is_removed(clock):
+    pool = proxy_pool.ProxyPool(max_failures=2)
+    proxy, = make_proxies(1)
+    pool.add(proxy)
+
+    assert pool.report_failure(proxy) is False
+    assert pool.report_failure(proxy) is True
+    assert proxy not in pool
+    assert pool.count(scraping.Proxy.HTTP) == 0
+    assert pool.draw(scraping.Proxy.HTTP) is None
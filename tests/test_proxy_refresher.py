@@ -0,0 +1,90 @@
+import threading
+import time
+
+import proxy_pool
+import proxy_refresher
+import scraping
+
+CHECK_URL = 'http://check.local/'
+
+
+def proxy_at(url):
+    host, port = url.split('//')[1].strip('/').split(':')
+    return scraping.Proxy(scraping.Proxy.HTTP, host, int(port))
+
+
+# The page server answers requests sent to it as a proxy, so it is a working proxy for the check url.
+def make_refresher(page_server, harvest, **kwargs):
+    page_server.pages[CHECK_URL] = b'ok'
+
+    return proxy_refresher.ProxyRefresher(harvest, proxy_pool.ProxyPool(), {'http': CHECK_URL}, check_timeout=1.0,
+                                          low_water_mark=0, refresh_interval=60.0, **kwargs)
+
+
+def test_refill_adds_only_proxies_that_answered(page_server, closed_url):
+    working, dead = proxy_at(page_server.url()), proxy_at(closed_url)
+    harvests = []
+    refresher = make_refresher(page_server, lambda: harvests.append(1) or [working, dead])
+
+    refresher.refill()
+    refresher.refill()
+
+    assert list(refresher.pool) == [working]
+    assert refresher.pool.proxy_health(working).latency is not None
+    assert page_server.requests == {CHECK_URL: 1}
+    assert len(harvests) == 2
+
+
+def test_checks_keep_sessions_of_working_proxies(page_server, closed_url):
+    working, dead = proxy_at(page_server.url()), proxy_at(closed_url)
+    refresher = make_refresher(page_server, lambda: [working, dead])
+
+    refresher.refill()
+
+    assert list(refresher.session_pool.sessions) == [(working.address(), scraping.Proxy.HTTP, None)]
+
+
+def test_wait_for_proxy_waits_for_refill_started_after_the_call(page_server):
+    working = proxy_at(page_server.url())
+    harvest_started = threading.Event()
+    harvest_released = threading.Event()
+    harvests = []
+
+    def harvest():
+        harvests.append(1)
+        if len(harvests) == 1:
+            harvest_started.set()
+            harvest_released.wait(5.0)
+            return []
+
+        return [working]
+
+    refresher = make_refresher(page_server, harvest)
+    refresher.start()
+    results = []
+
+    try:
+        assert harvest_started.wait(5.0)
+        waiter = threading.Thread(target=lambda: results.append(refresher.wait_for_proxy(scraping.Proxy.HTTP, 5.0)))
+        waiter.start()
+
+        while refresher.waiting == 0:
+            time.sleep(0.01)
+        harvest_released.set()
+        waiter.join()
+    finally:
+        refresher.stop()
+
+    assert results == [True]
+    assert len(harvests) >= 2
+
+
+def test_wait_for_proxy_gives_up_after_refill_without_proxies(page_server):
+    refresher = make_refresher(page_server, lambda: [])
+    refresher.start()
+
+    try:
+        assert refresher.wait_for_proxy(scraping.Proxy.HTTP, 5.0) is False
+        assert refresher.wait_for_proxy(scraping.Proxy.HTTPS, 5.0) is False
+    finally:
+        refresher.stop()
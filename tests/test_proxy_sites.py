@@ -0,0 +1,52 @@
+import pytest
+
+import proxy_sites
+import scraping
+
+
+def rows(source):
+    return list(proxy_sites.table_rows(source))
+
+
+def test_table_rows_skips_comments_and_scripts():
+    source = ('<table><tbody>'
+              '<!-- <tr><td>10.0.0.9</td></tr> -->'
+              '<script>document.write("<tr><td>10.0.0.8</td></tr>")</script>'
+              '<tr><td>10.0.0.1</td><td>80<style>td { color: red }</style>80</td></tr>'
+              '</tbody></table>')
+
+    assert rows(source) == [['10.0.0.1', '8080']]
+
+
+def test_table_rows_keeps_nested_tables_apart():
+    source = ('<table><tbody>'
+              '<tr><td>outer</td><td><table><tbody><tr><td>inner</td></tr></tbody></table></td><td>last</td></tr>'
+              '</tbody></table>')
+
+    assert rows(source) == [['inner'], ['outer', '', 'last']]
+
+
+def test_table_rows_ends_cells_and_rows_that_are_not_closed():
+    source = '<table><tbody><tr><td>a<td>b &amp; c<tr><td>d</tbody></table>'
+
+    assert rows(source) == [['a', 'b & c'], ['d']]
+
+
+def test_table_rows_skips_rows_outside_table_body():
+    assert rows('<table><thead><tr><td>ip</td></tr></thead><tbody><tr><td>1</td></tr></tbody></table>') == [['1']]
+
+
+def test_proxy_site_needs_extract():
+    with pytest.raises(TypeError):
+        proxy_sites.ProxySite('http://example.com/')
+
+
+def test_extract_proxy_from_source_adds_proxies_of_parsed_page():
+    bs4 = pytest.importorskip('bs4')
+    source = ('<table><tbody>'
+              '<tr><td>10.0.0.1</td><td>8080</td><td></td><td></td><td></td><td></td><td>yes</td></tr>'
+              '</tbody></table>')
+    scrapper = scraping.StealthScrapper()
+    scrapper.extract_proxy_from_source(bs4.BeautifulSoup(source, 'html.parser'))
+
+    assert list(scrapper.proxy) == [scraping.Proxy(scraping.Proxy.HTTPS, '10.0.0.1', 8080)]
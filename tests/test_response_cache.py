@@ -0,0 +1,104 @@
+import os
+import time
+
+import response_cache
+
+URL = 'http://example.com/page'
+HEADERS = {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+
+def disk_files(directory):
+    return sorted(os.path.splitext(name)[1] for name in os.listdir(directory))
+
+
+def test_disk_tier_keeps_entry_for_new_cache(tmp_path):
+    response_cache.ResponseCache(directory=str(tmp_path)).put(URL, b'<html>page</html>', HEADERS)
+
+    entry = response_cache.ResponseCache(directory=str(tmp_path)).get(URL)
+
+    assert entry.content == b'<html>page</html>'
+    assert (entry.etag, entry.last_modified) == (HEADERS['ETag'], HEADERS['Last-Modified'])
+    assert disk_files(tmp_path) == ['.body', '.json']
+
+
+def test_revalidation_touches_entry_without_writing_body(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path))
+    entry = cache.put(URL, b'<html>page</html>', HEADERS)
+    body_path = cache.disk.path(URL) + response_cache.DiskTier.BODY_EXTENSION
+    os.utime(body_path, (1, 1))
+    entry.stored_at -= 1000
+
+    assert cache.resolve(URL, entry, 304, {}, b'') == b'<html>page</html>'
+
+    assert os.stat(body_path).st_mtime == 1
+    assert time.time() - response_cache.ResponseCache(directory=str(tmp_path)).get(URL).stored_at < 60
+    assert cache.stats()['revalidations'] == 1
+
+
+def test_body_not_matching_its_digest_is_a_miss(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path))
+    cache.put(URL, b'<html>page</html>', HEADERS)
+
+    with open(cache.disk.path(URL) + response_cache.DiskTier.BODY_EXTENSION, 'wb') as body_file:
+        body_file.write(b'<html>another write</html>')
+
+    assert response_cache.ResponseCache(directory=str(tmp_path)).get(URL) is None
+
+
+def test_expired_entries_are_removed_when_loaded(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path), ttl=60)
+    cache.put(URL, b'<html>page</html>', HEADERS)
+    os.utime(cache.disk.path(URL) + response_cache.DiskTier.EXTENSION, (1, 1))
+
+    assert response_cache.ResponseCache(directory=str(tmp_path), ttl=60).get(URL) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_disk_tier_evicts_oldest_entries(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path), max_disk_size=300)
+
+    for number in range(3):
+        cache.put(f'{URL}/{number}', bytes(100), HEADERS)
+
+    assert cache.disk.size <= 300
+    assert response_cache.ResponseCache(directory=str(tmp_path)).get(f'{URL}/0') is None
+    assert response_cache.ResponseCache(directory=str(tmp_path)).get(f'{URL}/2').content == bytes(100)
+
+
+def test_no_store_and_private_responses_are_not_cached(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path))
+    entry = cache.put(URL, b'<html>page</html>', HEADERS)
+
+    assert cache.resolve(URL, entry, 200, {'Cache-Control': 'no-store'}, b'<html>new</html>') == b'<html>new</html>'
+    assert cache.get(URL) is None
+
+    cache.resolve(URL, None, 200, {'Cache-Control': 'private, max-age=60'}, b'<html>new</html>')
+
+    assert cache.get(URL) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_max_age_takes_place_of_fresh_time(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path), fresh_time=0)
+    cache.resolve(URL, None, 200, {'Cache-Control': 'public, max-age="60"'}, b'<html>page</html>')
+    entry = response_cache.ResponseCache(directory=str(tmp_path)).get(URL)
+
+    assert entry.max_age == 60
+    assert cache.is_fresh(entry)
+
+    entry.stored_at -= 60
+
+    assert not cache.is_fresh(entry)
+
+
+def test_no_cache_response_is_never_fresh(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path), fresh_time=60)
+    entry = cache.put(URL, b'<html>page</html>', {'Cache-Control': 'no-cache'})
+
+    assert not cache.is_fresh(entry)
+
+
+def test_invalid_max_age_falls_back_to_fresh_time(tmp_path):
+    cache = response_cache.ResponseCache(directory=str(tmp_path), fresh_time=60)
+
+    assert cache.is_fresh(cache.put(URL, b'<html>page</html>', {'Cache-Control': 'max-age=soon'}))
@@ -0,0 +1,107 @@
+import pytest
+
+import retry
+import scraping
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+
+    return now
+
+
+def test_backoff_grows_by_multiplier_up_to_max_delay():
+    policy = retry.RetryPolicy(base_delay=0.5, multiplier=3.0, max_delay=10.0, jitter=retry.NO_JITTER)
+
+    assert [policy.backoff(number) for number in range(1, 6)] == [0.5, 1.5, 4.5, 10.0, 10.0]
+
+
+def test_full_jitter_is_up_to_backoff(monkeypatch):
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: (low, high))
+    policy = retry.RetryPolicy(base_delay=1.0, jitter=retry.FULL_JITTER)
+
+    assert policy.backoff(3) == (0.0, 4.0)
+
+
+def test_equal_jitter_is_at_least_half_of_backoff():
+    policy = retry.RetryPolicy(base_delay=1.0, jitter=retry.EQUAL_JITTER)
+
+    assert all(2.0 <= policy.backoff(3) <= 4.0 for _ in range(100))
+
+
+def test_unknown_jitter_is_rejected():
+    with pytest.raises(retry.UnknownJitter):
+        retry.RetryPolicy(jitter='random')
+
+
+def test_settings_are_clamped():
+    policy = retry.RetryPolicy(base_delay=-1.0, multiplier=0.5)
+
+    assert (policy.base_delay, policy.multiplier) == (0.0, 1.0)
+
+
+def test_deadline_is_exceeded_when_next_retry_would_end_after_it(clock):
+    policy = retry.RetryPolicy(deadline=10.0)
+    retry_state = policy.start()
+    clock[0] += 8.0
+
+    assert not policy.deadline_exceeded(retry_state, 2.0)
+    assert policy.deadline_exceeded(retry_state, 2.5)
+    assert not retry.RetryPolicy().deadline_exceeded(retry_state, 1000.0)
+
+
+def test_budget_allows_ratio_of_requests(clock):
+    budget = retry.RetryBudget(ratio=0.5, min_retries_per_second=0.0, max_tokens=1.0)
+
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+
+    assert budget.withdraw()
+    assert budget.stats() == {'tokens': 0.0, 'granted': 2, 'denied': 1}
+
+
+def test_budget_is_refilled_over_time_up_to_max_tokens(clock):
+    budget = retry.RetryBudget(ratio=0.0, min_retries_per_second=2.0, max_tokens=3.0)
+
+    for _ in range(3):
+        budget.withdraw()
+
+    clock[0] += 1.0
+
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+
+    clock[0] += 60.0
+    budget.deposit()
+
+    assert budget.stats()['tokens'] == 3.0
+
+
+def test_policy_deposits_requests_into_budget(clock):
+    budget = retry.RetryBudget(ratio=0.5, min_retries_per_second=0.0, max_tokens=10.0)
+    budget.tokens = 0.0
+    policy = retry.RetryPolicy(budget=budget)
+    policy.start()
+    policy.start()
+
+    assert policy.acquire_retry()
+    assert not policy.acquire_retry()
+
+
+def test_scrapper_stops_retrying_when_budget_is_spent(closed_url):
+    budget = retry.RetryBudget(ratio=0.0, min_retries_per_second=0.0, max_tokens=1.0)
+
+    with scraping.Scrapper(min_delay=1, max_delay=2, timeout=1.0) as scrapper:
+        scrapper.retry_policy = retry.RetryPolicy(base_delay=0.0, budget=budget)
+        scrapper.max_connection_error = 5
+
+        with pytest.raises(scraping.RetryBudgetExhausted):
+            scrapper.scrape(closed_url)
+
+        assert budget.stats()['granted'] == 1
+        assert scrapper.metrics.snapshot()['counters']['retries_denied_total'] == {'reason=budget': 1}
@@ -0,0 +1,109 @@
+import pytest
+
+import proxy_sites
+import scraping
+
+PROXY_TABLE = (b'<table><tbody>'
+               b'<tr><td>10.0.0.1</td><td>8080</td><td></td><td></td><td></td><td></td><td>no</td></tr>'
+               b'<tr><td>10.0.0.2</td><td>3128</td><td></td><td></td><td></td><td></td><td>yes</td></tr>'
+               b'</tbody></table>')
+
+
+def stealth_scrapper(*urls):
+    scrapper = scraping.StealthScrapper(min_delay=1, max_delay=2, timeout=1.0)
+    scrapper.retry_policy.base_delay = 0.0
+    scrapper.proxy_sites = [proxy_sites.ProxyTableSite(url) for url in urls]
+
+    return scrapper
+
+
+def test_harvest_proxy_from_web_scrapes_proxy_list_directly(page_server):
+    page_server.pages['/proxies'] = PROXY_TABLE
+
+    with stealth_scrapper(page_server.url('/proxies')) as scrapper:
+        proxies = scrapper.harvest_proxy_from_web()
+
+    assert proxies == [scraping.Proxy(scraping.Proxy.HTTP, '10.0.0.1', 8080),
+                       scraping.Proxy(scraping.Proxy.HTTPS, '10.0.0.2', 3128)]
+    assert page_server.requests == {'/proxies': 1}
+    assert scrapper.metrics.snapshot()['counters']['requests_total'] == {'outcome=success': 1}
+
+
+def test_harvest_proxy_from_web_retries_with_plain_scrapper_handlers(closed_url):
+    connection_errors = []
+
+    with stealth_scrapper(closed_url) as scrapper:
+        scrapper.add_event_observer(scrapper.connection_error, connection_errors.append)
+
+        with pytest.raises(scraping.ConnectionErrorOccurred):
+            scrapper.harvest_proxy_from_web()
+
+    assert connection_errors == ['1/3', '2/3', '3/3']
+
+
+def test_harvest_proxy_from_web_skips_failing_site(page_server, closed_url):
+    page_server.pages['/proxies'] = PROXY_TABLE
+
+    with stealth_scrapper(closed_url, page_server.url('/proxies')) as scrapper:
+        assert len(scrapper.harvest_proxy_from_web()) == 2
+
+
+def requests_total(scrapper):
+    return scrapper.metrics.snapshot()['counters'].get('requests_total', {})
+
+
+def test_streamed_request_is_finished_when_stream_was_read(page_server):
+    page_server.pages['/file'] = (200, {'Content-Type': 'application/octet-stream'}, bytes(10000))
+
+    with scraping.Scrapper(min_delay=1, max_delay=2) as scrapper:
+        scrapper.stream_chunk_size = 1024
+        chunks = scrapper.scrape(page_server.url('/file'), stream=True)
+        assert requests_total(scrapper) == {}
+
+        assert sum(len(chunk) for chunk in chunks) == 10000
+        assert requests_total(scrapper) == {'outcome=success': 1}
+
+
+def test_streamed_request_that_broke_off_is_a_failure(page_server):
+    page_server.pages['/file'] = (200, {'Content-Length': '10000', 'Connection': 'close'}, bytes(5000))
+
+    with scraping.Scrapper(min_delay=1, max_delay=2) as scrapper:
+        chunks = scrapper.scrape(page_server.url('/file'), stream=True)
+
+        with pytest.raises(scraping.StreamInterrupted):
+            list(chunks)
+
+        assert requests_total(scrapper) == {'outcome=failure': 1}
+
+
+def test_streamed_request_closed_early_is_not_a_success(page_server):
+    page_server.pages['/file'] = bytes(10000)
+
+    with scraping.Scrapper(min_delay=1, max_delay=2) as scrapper:
+        scrapper.stream_chunk_size = 1024
+        chunks = scrapper.scrape(page_server.url('/file'), stream=True)
+        next(chunks)
+        chunks.close()
+
+        assert requests_total(scrapper) == {'outcome=closed': 1}
+
+
+def proxy_requests_total(scrapper):
+    return scrapper.metrics.snapshot()['counters']['proxy_requests_total']
+
+
+def test_proxy_metrics_are_not_labelled_with_proxy_by_default():
+    scrapper = stealth_scrapper()
+    scrapper.report_stealth_success(scraping.Proxy(scraping.Proxy.HTTP, '10.0.0.1', 8080), 0.1)
+    scrapper.report_stealth_success(scraping.Proxy(scraping.Proxy.HTTP, '10.0.0.2', 8080), 0.1)
+
+    assert proxy_requests_total(scrapper) == {'outcome=success': 2}
+
+
+def test_proxy_metrics_are_labelled_with_proxy_when_stealth_metrics_are_set():
+    scrapper = stealth_scrapper()
+    scrapper.stealth_metrics = True
+    proxy = scraping.Proxy(scraping.Proxy.HTTP, '10.0.0.1', 8080)
+    scrapper.report_stealth_success(proxy, 0.1)
+
+    assert proxy_requests_total(scrapper) == {f'outcome=success,proxy={proxy.address()}': 1}
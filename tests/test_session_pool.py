@@ -0,0 +1,128 @@
+import pytest
+
+import session_pool
+import transport
+
+
+class FakeSession:
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeResponse:
+
+    def __init__(self, session):
+        self.session = session
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport(transport.Transport):
+
+    def __init__(self):
+        super().__init__()
+
+        self.sessions = []
+
+    def create_session(self, proxy, pool_connections, pool_maxsize):
+        self.sessions.append(FakeSession(proxy))
+        return self.sessions[-1]
+
+    def get(self, session, url, timeout, headers, stream, proxy=None, protocol=None):
+        assert not session.closed
+        return FakeResponse(session)
+
+    def wire_bytes(self, response):
+        return 0
+
+    def http_version(self, response):
+        return 'HTTP/1.1'
+
+
+def test_least_recently_used_session_is_evicted():
+    fake_transport = FakeTransport()
+    pool = session_pool.SessionPool(max_sessions=2, transport=fake_transport)
+    first = pool.get('http://example.com/', 'first').session
+    second = pool.get('http://example.com/', 'second').session
+    pool.get('http://example.com/', 'first')
+    pool.get('http://example.com/', 'third')
+
+    assert second.closed and not first.closed
+    assert [key[0] for key in pool.sessions] == ['first', 'third']
+
+
+def test_idle_session_is_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(session_pool.time, 'monotonic', lambda: now[0])
+    pool = session_pool.SessionPool(idle_timeout=10.0, transport=FakeTransport())
+    idle = pool.get('http://example.com/', 'idle').session
+    now[0] += 10.0
+    pool.get('http://example.com/', 'other')
+
+    assert idle.closed
+    assert len(pool) == 1
+
+
+def test_zero_idle_timeout_keeps_sessions():
+    pool = session_pool.SessionPool(idle_timeout=0, transport=FakeTransport())
+    session = pool.get('http://example.com/').session
+    pool.get('http://example.com/', 'other')
+
+    assert not session.closed
+    assert len(pool) == 2
+
+
+def test_session_evicted_while_in_use_is_closed_when_released():
+    pool = session_pool.SessionPool(max_sessions=1, transport=FakeTransport())
+    response = pool.get('http://example.com/', 'first', stream=True)
+    pool.get('http://example.com/', 'second')
+
+    assert not response.session.closed
+
+    response.close()
+
+    assert response.session.closed
+
+
+def test_removed_session_is_closed_when_released():
+    pool = session_pool.SessionPool(transport=FakeTransport())
+
+    with pool.get('http://example.com/', 'first', stream=True) as response:
+        pool.remove('first')
+        assert not response.session.closed
+
+    assert response.session.closed
+    assert len(pool) == 0
+
+
+def test_session_is_released_when_request_fails():
+    class FailingTransport(FakeTransport):
+        def get(self, session, url, timeout, headers, stream, proxy=None, protocol=None):
+            raise OSError('refused')
+
+    pool = session_pool.SessionPool(transport=FailingTransport())
+
+    with pytest.raises(OSError):
+        pool.get('http://example.com/', 'first')
+
+    pool.remove('first')
+
+    assert pool.transport.sessions[0].closed
+
+
+def test_httpx_session_is_not_closed_before_its_request(page_server):
+    pytest.importorskip('httpx')
+    page_server.pages['/'] = b'page'
+    page_server.pages[page_server.url('/')] = b'proxied page'
+    httpx_transport = transport.HttpxTransport(http2=False)
+
+    with session_pool.SessionPool(idle_timeout=0, max_sessions=1, transport=httpx_transport) as pool:
+        assert pool.get(page_server.url('/'), timeout=5.0).content == b'page'
+        assert pool.get(page_server.url('/'), page_server.url(''), 'http', timeout=5.0).content == b'proxied page'
@@ -0,0 +1,130 @@
+import contextlib
+import gzip
+import ssl
+
+import pytest
+import requests
+
+import session_pool
+import transport
+
+
+def test_transport_needs_every_method():
+    class PartialTransport(transport.Transport):
+
+        def create_session(self, proxy, pool_connections, pool_maxsize):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialTransport()
+
+
+def test_requests_transport_counts_bytes_on_the_wire(page_server):
+    body = b'page ' * 1000
+    page_server.pages['/'] = (200, {'Content-Encoding': 'gzip'}, gzip.compress(body))
+    requests_transport = transport.RequestsTransport()
+
+    with session_pool.SessionPool(transport=requests_transport) as pool:
+        with pool.get(page_server.url('/'), timeout=1.0) as response:
+            assert response.content == body
+            assert requests_transport.wire_bytes(response) == len(gzip.compress(body))
+            assert requests_transport.http_version(response) == 'HTTP/1.1'
+
+    assert 'gzip' in page_server.headers['/'][0]['Accept-Encoding']
+
+
+def test_accepted_encodings_follow_installed_packages(monkeypatch):
+    monkeypatch.setattr(transport, 'brotli', None)
+    monkeypatch.setattr(transport, 'zstandard', None)
+
+    assert transport.accepted_encodings() == 'gzip, deflate'
+
+    monkeypatch.setattr(transport, 'brotli', object())
+    monkeypatch.setattr(transport, 'zstandard', object())
+
+    assert transport.accepted_encodings() == 'gzip, deflate, br, zstd'
+
+
+def test_httpx_transport_needs_httpx(monkeypatch):
+    monkeypatch.setattr(transport, 'httpx', None)
+
+    with pytest.raises(transport.TransportUnavailable):
+        transport.HttpxTransport()
+
+
+@pytest.fixture
+def httpx():
+    return pytest.importorskip('httpx')
+
+
+def raise_error(errors, error, cause=None):
+    with errors:
+        raise error from cause
+
+
+@pytest.mark.parametrize('error_name, through_proxy, expected_error', [
+    ('ConnectTimeout', False, requests.exceptions.ConnectTimeout),
+    ('ReadTimeout', False, requests.exceptions.ReadTimeout),
+    ('WriteTimeout', False, requests.exceptions.ReadTimeout),
+    ('ProxyError', False, requests.exceptions.ProxyError),
+    ('ConnectError', False, requests.exceptions.ConnectionError),
+    ('ConnectError', True, requests.exceptions.ProxyError),
+    ('LocalProtocolError', False, requests.exceptions.InvalidHeader),
+    ('ReadError', False, requests.exceptions.ConnectionError),
+    ('TooManyRedirects', False, requests.exceptions.RequestException)])
+def test_request_errors_are_raised_as_requests_exceptions(httpx, error_name, through_proxy, expected_error):
+    with pytest.raises(expected_error) as error_info:
+        raise_error(transport.request_errors(through_proxy), getattr(httpx, error_name)('failed'))
+
+    assert isinstance(error_info.value.__cause__, getattr(httpx, error_name))
+
+
+def test_connect_error_caused_by_ssl_error_is_ssl_error(httpx):
+    with pytest.raises(requests.exceptions.SSLError):
+        raise_error(transport.request_errors(True), httpx.ConnectError('failed'), ssl.SSLError('certificate'))
+
+
+@pytest.mark.parametrize('error_name, expected_error', [
+    ('RemoteProtocolError', requests.exceptions.ChunkedEncodingError),
+    ('ReadError', requests.exceptions.ChunkedEncodingError),
+    ('ReadTimeout', requests.exceptions.ConnectionError),
+    ('DecodingError', requests.exceptions.RequestException)])
+def test_body_errors_are_raised_as_requests_exceptions(httpx, error_name, expected_error):
+    with pytest.raises(expected_error):
+        raise_error(transport.body_errors(), getattr(httpx, error_name)('failed'))
+
+
+def httpx_get(page_server, path, stream):
+    httpx_transport = transport.HttpxTransport(http2=False)
+    session = httpx_transport.create_session(None, 1, 1)
+
+    return httpx_transport, session, httpx_transport.get(session, page_server.url(path), 1.0, {}, stream)
+
+
+def test_httpx_get_reads_body_unless_streamed(httpx, page_server):
+    body = b'page ' * 1000
+    page_server.pages['/'] = (200, {'Content-Encoding': 'gzip'}, gzip.compress(body))
+    httpx_transport, session, response = httpx_get(page_server, '/', False)
+
+    with contextlib.closing(session):
+        assert response.response.is_closed
+        assert (response.status_code, response.url, response.content) == (200, page_server.url('/'), body)
+        assert httpx_transport.wire_bytes(response) == len(gzip.compress(body))
+        assert httpx_transport.http_version(response) == 'HTTP/1.1'
+        assert response.elapsed.total_seconds() > 0.0
+
+
+def test_httpx_get_streams_body(httpx, page_server):
+    page_server.pages['/'] = b'x' * 10000
+    _, session, response = httpx_get(page_server, '/', True)
+
+    with contextlib.closing(session), response:
+        assert not response.response.is_closed
+        assert b''.join(response.iter_content(1024)) == b'x' * 10000
+
+
+def test_httpx_body_that_broke_off_is_chunked_encoding_error(httpx, page_server):
+    page_server.pages['/'] = (200, {'Content-Length': '100', 'Connection': 'close'}, b'short')
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        httpx_get(page_server, '/', False)
@@ -0,0 +1,224 @@
+import datetime
+import ssl
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HTTP_VERSIONS = {10: 'HTTP/1.0', 11: 'HTTP/1.1'}
+
+
+# br and zstd are offered only when a package that decodes them is installed.
+def accepted_encodings():
+    encodings = ['gzip', 'deflate']
+
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+
+    return ', '.join(encodings)
+
+
+class Transport(ABC):
+    # Sessions of a transport are pooled by session_pool.SessionPool, one per proxy. Responses have
+    # the part of requests.Response interface that scrappers use and errors are raised as requests exceptions,
+    # so scrappers handle them the same whatever transport is used.
+
+    def __init__(self, accept_encoding=None):
+        self.accept_encoding = accept_encoding or self.default_accept_encoding()
+
+    def default_accept_encoding(self):
+        return accepted_encodings()
+
+    @abstractmethod
+    def create_session(self, proxy, pool_connections, pool_maxsize):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, session, url, timeout, headers, stream, proxy=None, protocol=None):
+        raise NotImplementedError
+
+    # Bytes received for a body before it was decompressed.
+    @abstractmethod
+    def wire_bytes(self, response):
+        raise NotImplementedError
+
+    @abstractmethod
+    def http_version(self, response):
+        raise NotImplementedError
+
+
+class RequestsTransport(Transport):
+    # HTTP/1.1 over requests, a connection serves one request at a time.
+
+    def default_accept_encoding(self):
+        return urllib3.util.make_headers(accept_encoding=True)['accept-encoding'].replace(',', ', ')
+
+    def create_session(self, proxy, pool_connections, pool_maxsize):
+        session = requests.Session()
+        session.headers['Accept-Encoding'] = self.accept_encoding
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def get(self, session, url, timeout, headers, stream, proxy=None, protocol=None):
+        proxies = None if proxy is None else {protocol: proxy}
+
+        return session.get(url, timeout=timeout, headers=headers, stream=stream, proxies=proxies)
+
+    def wire_bytes(self, response):
+        return response.raw.tell()
+
+    def http_version(self, response):
+        return HTTP_VERSIONS.get(response.raw.version, 'HTTP/1.1')
+
+
+class HttpxTransport(Transport):
+    # With http2=True requests to a host are multiplexed over one connection, when the server agrees to HTTP/2
+    # (over TLS). Proxies are set per client, so every proxy gets its own client.
+
+    def __init__(self, http2=True, accept_encoding=None, verify=True):
+        if httpx is None:
+            raise TransportUnavailable('httpx transport needs httpx package')
+        if http2 and h2 is None:
+            raise TransportUnavailable('HTTP/2 needs h2 package, install httpx[http2]')
+
+        super().__init__(accept_encoding)
+
+        self.http2 = http2
+        self.verify = ssl.create_default_context(cafile=verify) if isinstance(verify, str) else verify
+
+    def create_session(self, proxy, pool_connections, pool_maxsize):
+        limits = httpx.Limits(max_connections=pool_connections * pool_maxsize,
+                              max_keepalive_connections=pool_connections * pool_maxsize)
+
+        return httpx.Client(http2=self.http2, proxy=proxy, limits=limits, verify=self.verify, follow_redirects=True,
+                            headers={'Accept-Encoding': self.accept_encoding})
+
+    # Body is always streamed, so errors of reading it can be told apart from errors of sending the request.
+    def get(self, session, url, timeout, headers, stream, proxy=None, protocol=None):
+        request_start_time = time.monotonic()
+
+        with request_errors(proxy is not None):
+            request = session.build_request('GET', url, headers=headers, timeout=timeout)
+            response = HttpxResponse(session.send(request, stream=True), time.monotonic() - request_start_time)
+
+        if not stream:
+            with response:
+                response.content
+
+        return response
+
+    def wire_bytes(self, response):
+        return response.response.num_bytes_downloaded
+
+    def http_version(self, response):
+        return response.response.http_version
+
+
+class HttpxResponse:
+
+    def __init__(self, response, elapsed_time):
+        self.response = response
+        self.url = str(response.url)
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.elapsed = datetime.timedelta(seconds=elapsed_time)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def content(self):
+        with body_errors():
+            return self.response.read()
+
+    def iter_content(self, chunk_size=1):
+        with body_errors():
+            yield from self.response.iter_bytes(chunk_size)
+
+    def close(self):
+        self.response.close()
+
+
+@contextmanager
+def request_errors(through_proxy):
+    try:
+        yield
+    except httpx.ConnectTimeout as e:
+        raise requests.exceptions.ConnectTimeout(str(e)) from e
+    except (httpx.ReadTimeout, httpx.WriteTimeout) as e:
+        raise requests.exceptions.ReadTimeout(str(e)) from e
+    except httpx.ProxyError as e:
+        raise requests.exceptions.ProxyError(str(e)) from e
+    except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+        if caused_by(e, ssl.SSLError):
+            raise requests.exceptions.SSLError(str(e)) from e
+        if through_proxy:
+            raise requests.exceptions.ProxyError(str(e)) from e
+        raise requests.exceptions.ConnectionError(str(e)) from e
+    except httpx.LocalProtocolError as e:
+        raise requests.exceptions.InvalidHeader(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.exceptions.RequestException(str(e)) from e
+
+
+# Like with requests, a body that broke off is a chunked encoding error and a read timeout is a connection error.
+@contextmanager
+def body_errors():
+    try:
+        yield
+    except (httpx.RemoteProtocolError, httpx.ReadError) as e:
+        raise requests.exceptions.ChunkedEncodingError(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.exceptions.RequestException(str(e)) from e
+
+
+def caused_by(exception, exception_class):
+    while exception is not None:
+        if isinstance(exception, exception_class):
+            return True
+
+        exception = exception.__cause__ or exception.__context__
+
+    return False
+
+
+class TransportUnavailable(Exception):
+    pass
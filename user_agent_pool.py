@@ -0,0 +1,79 @@
+import random
+import threading
+
+
+class UserAgentPool:
+    # User agents kept in a list with their positions in a dictionary, so drawing, checking and removing
+    # (the last user agent takes place of the removed one) are all O(1). Every user agent is kept once.
+
+    def __init__(self, user_agents=()):
+        self.lock = threading.RLock()
+        self.user_agents = []
+        self.positions = {}
+
+        self.add_many(user_agents)
+
+    def __len__(self):
+        return len(self.user_agents)
+
+    def __contains__(self, user_agent):
+        return user_agent in self.positions
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.user_agents))
+
+    def __getitem__(self, position):
+        return self.user_agents[position]
+
+    def position(self, user_agent, default=None):
+        return self.positions.get(user_agent, default)
+
+    def add(self, user_agent):
+        with self.lock:
+            if user_agent in self.positions:
+                return False
+
+            self.positions[user_agent] = len(self.user_agents)
+            self.user_agents.append(user_agent)
+            return True
+
+    def add_many(self, user_agents):
+        with self.lock:
+            for user_agent in user_agents:
+                self.add(user_agent)
+
+    def remove(self, user_agent):
+        with self.lock:
+            position = self.positions.pop(user_agent, None)
+
+            if position is None:
+                return False
+
+            last_user_agent = self.user_agents.pop()
+            if position < len(self.user_agents):
+                self.user_agents[position] = last_user_agent
+                self.positions[last_user_agent] = position
+
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.user_agents.clear()
+            self.positions.clear()
+
+    # The previous user agent is skipped if there is any other to choose from.
+    def draw(self, previous_user_agent=None):
+        with self.lock:
+            if not self.user_agents:
+                return None
+
+            previous_position = self.positions.get(previous_user_agent)
+            if previous_position is None or len(self.user_agents) == 1:
+                return random.choice(self.user_agents)
+
+            position = random.randrange(len(self.user_agents) - 1)
+            if position >= previous_position:
+                position += 1
+
+            return self.user_agents[position]